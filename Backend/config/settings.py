@@ -16,6 +16,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 THIRD_PARTY_APPS = [
@@ -34,6 +35,8 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'starwars.metrics.MetricsMiddleware',
+    'starwars.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,6 +87,14 @@ CACHES = {
     }
 }
 
+# Seconds a cached REST response is kept; 0 disables the response cache
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Request metrics served at /api/starwars/metrics/ (see starwars/metrics.py);
+# each worker adds its counts to the shared cache at most this often (seconds)
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=float)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -148,6 +159,29 @@ REDOC_SETTINGS = {
     'LAZY_RENDERING': False,
 }
 
+# Parsed/validated GraphQL documents kept per worker (LRU)
+GRAPHQL_DOCUMENT_CACHE_SIZE = config('GRAPHQL_DOCUMENT_CACHE_SIZE', default=500, cast=int)
+
+# Seconds a registered persisted query text is kept; clients re-register expired hashes
+GRAPHQL_PERSISTED_QUERY_TIMEOUT = config('GRAPHQL_PERSISTED_QUERY_TIMEOUT', default=86400, cast=int)
+
+# Seconds a GraphQL query result is cached; 0 (default) disables the result cache
+GRAPHQL_RESULT_CACHE_TIMEOUT = config('GRAPHQL_RESULT_CACHE_TIMEOUT', default=0, cast=int)
+
+# Static limits checked before a GraphQL operation executes (see starwars/complexity.py).
+# The default cost admits the frontend's heaviest query (allPlanets, first: 100).
+GRAPHQL_MAX_DEPTH = config('GRAPHQL_MAX_DEPTH', default=10, cast=int)
+GRAPHQL_MAX_COST = config('GRAPHQL_MAX_COST', default=25000, cast=int)
+
+# Opt-in request profiling (see starwars/profiling.py): PROFILING profiles every
+# request; PROFILING_ALLOW_HEADER lets a client ask for it with `X-Profile: 1`.
+PROFILING = config('PROFILING', default=False, cast=bool)
+PROFILING_ALLOW_HEADER = config('PROFILING_ALLOW_HEADER', default=DEBUG, cast=bool)
+
+# Seconds a worker trusts its autocomplete index before re-reading the model's
+# cache version (see starwars/autocomplete.py); writes elsewhere show up within it.
+AUTOCOMPLETE_VERSION_CHECK_INTERVAL = config('AUTOCOMPLETE_VERSION_CHECK_INTERVAL', default=1, cast=float)
+
 GRAPHENE = {
     'SCHEMA': 'starwars.schema.schema',
     'MIDDLEWARE': [
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.views.decorators.csrf import csrf_exempt
-from graphene_django.views import GraphQLView
+from starwars.graphql_views import PersistedQueryGraphQLView
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -55,7 +55,7 @@ GET /api/starwars/characters/550e8400-e29b-41d4-a716-446655440000/films/
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('graphql/', csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path('graphql/', csrf_exempt(PersistedQueryGraphQLView.as_view(graphiql=True))),
     path('api/starwars/', include('starwars.urls')),
     
     path('docs/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
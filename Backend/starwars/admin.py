@@ -1,9 +1,26 @@
 from django.contrib import admin
+from django.db.models import Q
+from django.contrib.postgres.search import SearchQuery
 from .models import Person, Film, Planet, Species
+from .search import SEARCH_CONFIG, contains_filter, full_text_supported
+
+
+class FullTextSearchMixin:
+    """
+    On PostgreSQL, search the indexed search_vector (plus a name substring)
+    instead of an unindexed icontains over every search field.
+    """
+    name_field = 'name'
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term and full_text_supported():
+            query = SearchQuery(search_term, config=SEARCH_CONFIG, search_type='websearch')
+            return queryset.filter(contains_filter(self.name_field, search_term) | Q(search_vector=query)), False
+        return super().get_search_results(request, queryset, search_term)
 
 
 @admin.register(Planet)
-class PlanetAdmin(admin.ModelAdmin):
+class PlanetAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ['name', 'climate', 'terrain', 'population', 'created']
     list_filter = ['climate', 'created']
     search_fields = ['name', 'climate', 'terrain']
@@ -31,7 +48,8 @@ class PlanetAdmin(admin.ModelAdmin):
 
 
 @admin.register(Film)
-class FilmAdmin(admin.ModelAdmin):
+class FilmAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    name_field = 'title'
     list_display = ['title', 'episode_id', 'director', 'release_date', 'created']
     list_filter = ['director', 'release_date', 'created']
     search_fields = ['title', 'director', 'producer', 'opening_crawl']
@@ -94,7 +112,7 @@ class PersonAdmin(admin.ModelAdmin):
 
 
 @admin.register(Species)
-class SpeciesAdmin(admin.ModelAdmin):
+class SpeciesAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ['name', 'classification', 'designation', 'homeworld', 'created']
     list_filter = ['classification', 'designation', 'homeworld', 'created']
     search_fields = ['name', 'classification', 'language']
@@ -0,0 +1,127 @@
+"""
+In-process autocomplete index for name typeahead.
+
+Each worker lazily builds, per kind, two sorted arrays of casefolded keys:
+whole names, and the rest of the name from every later word ("skywalker"
+for "Luke Skywalker"). A prefix is a bisect into each array followed by a
+short forward scan, so a lookup costs O(log n + k) without touching the
+database. Whole-name matches come before word matches.
+
+An index is rebuilt when its model's version tag in the cache (bumped by
+the model signals and after bulk imports, see caching.py) changes. The
+tag is checked at most every AUTOCOMPLETE_VERSION_CHECK_INTERVAL seconds;
+writes made in this worker invalidate as soon as they commit. While the
+cache is unreachable the current index keeps answering (a missing one is
+built from the database) and the tag is checked again after the interval.
+"""
+import bisect
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .caching import get_versions
+from .search import SEARCH_MODELS, check_kinds
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+class PrefixIndex:
+    """Sorted (key, name, pk) arrays of one kind"""
+
+    def __init__(self, rows):
+        starts, words = [], []
+        for pk, name in rows:
+            key = normalize(name)
+            starts.append((key, name, pk))
+            position = key.find(' ')
+            while position != -1:
+                words.append((key[position + 1:], name, pk))
+                position = key.find(' ', position + 1)
+        starts.sort()
+        words.sort()
+        self.arrays = [
+            ([entry[0] for entry in entries], entries) for entries in (starts, words)
+        ]
+
+    def __len__(self):
+        return len(self.arrays[0][0])
+
+    def lookup(self, prefix, limit):
+        """Up to `limit` distinct (name, pk), whole-name matches first"""
+        found = {}
+        for keys, entries in self.arrays:
+            index = bisect.bisect_left(keys, prefix)
+            while index < len(keys) and len(found) < limit and keys[index].startswith(prefix):
+                _, name, pk = entries[index]
+                found.setdefault(pk, name)
+                index += 1
+        return [(name, pk) for pk, name in found.items()]
+
+
+class Autocomplete:
+    """The indexes of this worker, one per kind, with their versions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {}  # kind -> (version, index)
+        self._checked = {}  # kind -> monotonic time of the last version check
+
+    def clear(self):
+        self._indexes.clear()
+        self._checked.clear()
+
+    def invalidate(self, model):
+        for kind, (kind_model, _) in SEARCH_MODELS.items():
+            if kind_model is model:
+                self._indexes.pop(kind, None)
+
+    def index(self, kind):
+        model, field = SEARCH_MODELS[kind]
+        entry = self._indexes.get(kind)
+        now = time.monotonic()
+        if entry is not None and now - self._checked.get(kind, 0) < settings.AUTOCOMPLETE_VERSION_CHECK_INTERVAL:
+            return entry[1]
+
+        self._checked[kind] = now
+        try:
+            version = get_versions([model])[0]
+        except Exception:
+            logger.exception('Could not check the %s autocomplete version', kind)
+            if entry is not None:
+                return entry[1]
+            version = None  # never matches a real version, so rebuilt once the cache is back
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        with self._lock:
+            entry = self._indexes.get(kind)
+            if entry is None or entry[0] != version:
+                entry = (version, PrefixIndex(model.objects.values_list('pk', field).iterator()))
+                self._indexes[kind] = entry
+        return entry[1]
+
+    def complete(self, text, kinds=None, limit=DEFAULT_LIMIT):
+        """Up to `limit` (kind, name, pk) whose names start with `text`, or a word in them does"""
+        check_kinds(kinds, SEARCH_MODELS)
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        limit = max(1, min(limit, MAX_LIMIT))
+        hits = []
+        for kind in kinds or SEARCH_MODELS:
+            hits += [(kind, name, pk) for name, pk in self.index(kind).lookup(prefix, limit - len(hits))]
+            if len(hits) >= limit:
+                break
+        return hits
+
+
+autocomplete = Autocomplete()
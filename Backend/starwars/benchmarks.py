@@ -0,0 +1,396 @@
+"""
+Benchmark harness for the REST routes and the frontend's GraphQL operations.
+
+Every case is a request made through the Django test client against the
+current database. A measurement records the median wall time, the number
+of SQL queries and rows fetched, and peak Python memory (tracemalloc) of
+one request; query counts must not grow with the dataset, so they are the
+budget that catches N+1 regressions. Budgets live in
+benchmark_budgets.json next to this module.
+
+Wall time depends on the machine, so it has no absolute budget: it is
+checked against a baseline (the --output of an earlier run on the same
+machine) and fails when slower by more than a tolerance.
+
+compare_plans() EXPLAINs the list/filter queries the composite indexes of
+migrations 0007 and 0008 were added for, with each index and without it (dropped
+inside a rolled-back transaction), to show the plan switching to it.
+"""
+import itertools
+import json
+import os
+import re
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from graphql_relay import to_global_id
+
+from .models import Person, Film, Planet, Species
+
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_budgets.json')
+
+# Slowdown over the baseline wall time tolerated before it counts as a regression
+WALL_TOLERANCE = 0.5
+
+# Dataset presets for generate_synthetic
+SIZES = {
+    'small': {'people': 1000, 'films': 50, 'planets': 200, 'species': 20},
+    'medium': {'people': 10000, 'films': 200, 'planets': 2000, 'species': 50},
+    'large': {'people': 100000, 'films': 1000, 'planets': 10000, 'species': 100},
+}
+
+# Operations from Frontend/src/graphql/queries.js
+GRAPHQL_OPERATIONS = {
+    'GetAllPeople': '''
+        query GetAllPeople($first: Int, $after: String) {
+          allPeople(first: $first, after: $after) {
+            pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+            edges { node {
+              id name height mass hairColor skinColor eyeColor birthYear gender filmCount
+              homeworld { id name climate terrain }
+              films { edges { node { id title episodeId } } }
+            } }
+          }
+        }
+    ''',
+    'GetAllFilms': '''
+        query GetAllFilms($first: Int, $after: String) {
+          allFilms(first: $first, after: $after) {
+            pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+            edges { node {
+              id title episodeId openingCrawl director producer releaseDate characterCount planetCount
+              characters { edges { node { id name } } }
+              planets { edges { node { id name } } }
+            } }
+          }
+        }
+    ''',
+    'GetAllPlanets': '''
+        query GetAllPlanets($first: Int, $after: String) {
+          allPlanets(first: $first, after: $after) {
+            pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+            edges { node {
+              id name rotationPeriod orbitalPeriod diameter climate gravity terrain surfaceWater
+              population residentCount filmCount
+              residents { edges { node { id name } } }
+              films { edges { node { id title } } }
+            } }
+          }
+        }
+    ''',
+    'SearchPeople': '''
+        query SearchPeople($name: String) {
+          searchPeople(name: $name) {
+            id name height mass hairColor skinColor eyeColor birthYear gender filmCount
+            homeworld { id name }
+          }
+        }
+    ''',
+    'GetFilmsByCharacter': '''
+        query GetFilmsByCharacter($characterId: String!) {
+          filmsByCharacter(characterId: $characterId) {
+            id title episodeId openingCrawl director producer releaseDate
+          }
+        }
+    ''',
+    'GetCharactersInFilm': '''
+        query GetCharactersInFilm($filmId: String!) {
+          charactersInFilm(filmId: $filmId) {
+            id name height mass hairColor skinColor eyeColor birthYear gender
+            homeworld { id name }
+          }
+        }
+    ''',
+    'GetPersonDetail': '''
+        query GetPersonDetail($id: ID!) {
+          person(id: $id) {
+            id name height mass hairColor skinColor eyeColor birthYear gender filmCount
+            homeworld { id name climate terrain population }
+            films { edges { node { id title episodeId releaseDate director } } }
+          }
+        }
+    ''',
+    'GetFilmDetail': '''
+        query GetFilmDetail($id: ID!) {
+          film(id: $id) {
+            id title episodeId openingCrawl director producer releaseDate characterCount planetCount
+            characters { edges { node { id name homeworld { name } } } }
+            planets { edges { node { id name climate terrain } } }
+          }
+        }
+    ''',
+    'GetPlanetDetail': '''
+        query GetPlanetDetail($id: ID!) {
+          planet(id: $id) {
+            id name rotationPeriod orbitalPeriod diameter climate gravity terrain surfaceWater
+            population residentCount filmCount
+            residents { edges { node { id name } } }
+            films { edges { node { id title episodeId } } }
+          }
+        }
+    ''',
+}
+
+Case = namedtuple('Case', ['name', 'method', 'path', 'body'])
+Measurement = namedtuple('Measurement', ['wall_ms', 'queries', 'rows', 'peak_memory_kb'])
+PlanCase = namedtuple('PlanCase', ['name', 'index', 'queryset'])
+
+# Scan nodes of PostgreSQL (EXPLAIN) and SQLite (EXPLAIN QUERY PLAN) plans
+SCAN_NODE = re.compile(r'((?:Seq|Index Only|Index|Bitmap Heap|Bitmap Index) Scan|SCAN|SEARCH)\b[^(\n]*')
+
+
+def build_cases():
+    """Every benchmarked request, pointing at rows of the current dataset"""
+    # The most linked rows make the heaviest detail pages
+    person = Person.objects.order_by('-film_count', 'pk').first()
+    film = Film.objects.order_by('-character_count', 'pk').first()
+    planet = Planet.objects.order_by('-resident_count', 'pk').first()
+
+    api = '/api/starwars'
+    cases = [
+        Case('status', 'get', f'{api}/status/', None),
+        Case('stats', 'get', f'{api}/stats/', None),
+        Case('cache-stats', 'get', f'{api}/cache/stats/', None),
+        Case('metrics', 'get', f'{api}/metrics/', None),
+        Case('characters-list', 'get', f'{api}/characters/?page_size=100', None),
+        Case('characters-list-deep-page', 'get', f'{api}/characters/?page_size=100&page=5', None),
+        Case('characters-list-keyset', 'get', f'{api}/characters/?pagination=keyset&page_size=100', None),
+        Case('characters-search', 'get', f'{api}/characters/?name=ka&page_size=100', None),
+        Case('characters-range', 'get', f'{api}/characters/?height_min=150&order=-mass&page_size=100', None),
+        Case('films-list', 'get', f'{api}/films/', None),
+        Case('planets-list', 'get', f'{api}/planets/', None),
+        Case('search', 'get', f'{api}/search/?q=ka', None),
+        Case('text-search', 'get', f'{api}/search/text/?q=arid desert', None),
+        Case('autocomplete', 'get', f'{api}/autocomplete/?q=ka&limit=20', None),
+    ]
+    if person:
+        cases += [
+            Case('character-detail', 'get', f'{api}/characters/{person.pk}/', None),
+            Case('character-films', 'get', f'{api}/characters/{person.pk}/films/', None),
+        ]
+
+    variables = {
+        'GetAllPeople': {'first': 100},
+        'GetAllFilms': {'first': 20},
+        'GetAllPlanets': {'first': 100},
+        'SearchPeople': {'name': 'ka'},
+    }
+    if person:
+        variables['GetFilmsByCharacter'] = {'characterId': str(person.pk)}
+        variables['GetPersonDetail'] = {'id': to_global_id('PersonType', person.pk)}
+    if film:
+        variables['GetCharactersInFilm'] = {'filmId': str(film.pk)}
+        variables['GetFilmDetail'] = {'id': to_global_id('FilmType', film.pk)}
+    if planet:
+        variables['GetPlanetDetail'] = {'id': to_global_id('PlanetType', planet.pk)}
+
+    for name, values in variables.items():
+        body = {'query': GRAPHQL_OPERATIONS[name], 'operationName': name, 'variables': values}
+        cases.append(Case(f'graphql:{name}', 'post', '/graphql/', body))
+    return cases
+
+
+class QueryRecorder:
+    """execute_wrapper counting statements and the rows fetched from them"""
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        cursor = context['cursor']
+        for name in ('fetchone', 'fetchmany', 'fetchall'):
+            if name not in vars(cursor):
+                setattr(cursor, name, self.counting(getattr(cursor, name)))
+        return execute(sql, params, many, context)
+
+    def counting(self, fetch):
+        def wrapper(*args, **kwargs):
+            result = fetch(*args, **kwargs)
+            if isinstance(result, list):
+                self.rows += len(result)
+            elif result is not None:
+                self.rows += 1
+            return result
+        return wrapper
+
+
+def request(client, case):
+    if case.method == 'post':
+        response = client.post(case.path, json.dumps(case.body), content_type='application/json')
+    else:
+        response = client.get(case.path)
+    if response.status_code != 200:
+        raise AssertionError(f'{case.name}: HTTP {response.status_code} {response.content[:200]!r}')
+    return response
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0, GRAPHQL_RESULT_CACHE_TIMEOUT=0)
+def measure(case, repeat=5):
+    """Measurement of `case`; response caches are off so every run does the work"""
+    client = Client()
+    request(client, case)  # warm up (parsed-document cache, connections)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        request(client, case)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        request(client, case)
+
+    tracemalloc.start()
+    try:
+        request(client, case)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Measurement(statistics.median(timings), recorder.queries, recorder.rows, peak // 1024)
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path) as budgets:
+        return json.load(budgets)
+
+
+def load_baseline(path):
+    """(case, size) -> wall_ms of a results file written by `benchmark --output`"""
+    with open(path) as baseline:
+        results = json.load(baseline)['results']
+    return {(result['case'], result['size']): result['wall_ms'] for result in results}
+
+
+def check_budget(measurement, budget, size, baseline_ms=None, tolerance=WALL_TOLERANCE):
+    """
+    Descriptions of the budgets `measurement` exceeds; wall time only
+    against `baseline_ms`, the same case's time in a baseline run
+    """
+    violations = []
+    if 'queries' in budget and measurement.queries > budget['queries']:
+        violations.append(f"{measurement.queries} queries > {budget['queries']}")
+    limit = budget.get('peak_memory_kb', {}).get(size)
+    if limit is not None and measurement.peak_memory_kb > limit:
+        violations.append(f'peak_memory_kb {measurement.peak_memory_kb:.0f} > {limit}')
+    if baseline_ms is not None and measurement.wall_ms > baseline_ms * (1 + tolerance):
+        violations.append(
+            f'wall_ms {measurement.wall_ms:.0f} > baseline {baseline_ms:.0f} + {tolerance:.0%}'
+        )
+    return violations
+
+
+def plan_cases():
+    """Queries served by the indexes of migrations 0007 and 0008, with the index each should use"""
+    planet = Planet.objects.filter(resident_count__gt=0).order_by('-resident_count').first()
+    film = Film.objects.order_by('-character_count').first()
+    person = Person.objects.order_by('-film_count').first()
+    cases = [
+        PlanCase(
+            'people-by-gender', 'starwars_person_gender_name',
+            Person.objects.filter(gender='female').order_by('name')[:100],
+        ),
+        PlanCase(
+            'species-by-classification', 'starwars_species_class_name',
+            Species.objects.filter(classification='mammal').order_by('name')[:100],
+        ),
+    ]
+    if planet:
+        cases += [
+            PlanCase(
+                'planet-residents', 'starwars_person_homeworld_name',
+                Person.objects.filter(homeworld=planet).order_by('name')[:100],
+            ),
+            PlanCase(
+                'planet-films', 'starwars_film_planets_planet_id_film_id',
+                Film.objects.filter(planets=planet),
+            ),
+        ]
+    if film:
+        cases += [
+            PlanCase(
+                'film-characters', 'starwars_person_films_film_id_person_id',
+                Person.objects.filter(films=film),
+            ),
+            PlanCase(
+                'film-species', 'starwars_species_films_film_id_species_id',
+                Species.objects.filter(films=film),
+            ),
+        ]
+    if person:
+        cases.append(PlanCase(
+            'person-species', 'starwars_species_people_person_id_species_id',
+            Species.objects.filter(people=person),
+        ))
+    return cases
+
+
+_explain_ids = itertools.count()
+
+
+def explain(queryset):
+    """EXPLAIN output of `queryset`, planned afresh"""
+    sql, params = queryset.query.sql_with_params()
+    # A distinct statement each time: SQLite keeps using a cached EXPLAIN
+    # statement's plan after the schema changes
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql} /* {next(_explain_ids)} */', params)
+        return '\n'.join(' '.join(map(str, row)) for row in cursor.fetchall())
+
+
+def scans(plan):
+    """The scan nodes of an EXPLAIN output, outermost first"""
+    return [match.group().strip() for match in SCAN_NODE.finditer(plan)]
+
+
+def compare_plans(size):
+    """
+    Plans of every plan case with and without its index. The index is
+    dropped inside a transaction that is rolled back, so only run this on
+    throwaway data (the benchmark command uses a test database).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    results = []
+    for case in plan_cases():
+        with_index = explain(case.queryset)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(case.index)}')
+            without_index = explain(case.queryset)
+            transaction.set_rollback(True)
+        results.append({
+            'case': case.name,
+            'size': size,
+            'index': case.index,
+            'before': scans(without_index),
+            'after': scans(with_index),
+            'uses_index': case.index in with_index and case.index not in without_index,
+        })
+    return results
+
+
+def run_benchmarks(size, budgets, repeat=5, baseline=None, tolerance=WALL_TOLERANCE):
+    """
+    Measure every case against the current data; returns result dicts.
+    `baseline` is a load_baseline() mapping; without one wall time is not checked.
+    """
+    results = []
+    for case in build_cases():
+        measurement = measure(case, repeat)
+        baseline_ms = (baseline or {}).get((case.name, size))
+        results.append({
+            'case': case.name,
+            'size': size,
+            **measurement._asdict(),
+            'violations': check_budget(
+                measurement, budgets.get(case.name, {}), size, baseline_ms, tolerance
+            ),
+        })
+    return results
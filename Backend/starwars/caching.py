@@ -0,0 +1,136 @@
+"""
+Response caching for the REST endpoints.
+
+Every model has a version tag in the cache. A cached response key embeds
+the current versions of the models its payload is built from, so a write
+invalidates entries by bumping a tag (see signals.py) instead of scanning
+or deleting keys; stale entries simply stop being read and expire. Tags
+are bumped once the write commits: bumped earlier, a concurrent request
+could cache the old rows under the new tag.
+"""
+import hashlib
+import logging
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'starwars'
+STATS_KEYS = {
+    'hits': f'{KEY_PREFIX}:cache:hits',
+    'misses': f'{KEY_PREFIX}:cache:misses',
+}
+DATA_VERSION_KEY = f'{KEY_PREFIX}:version:data'
+
+
+def version_key(model):
+    return f'{KEY_PREFIX}:version:{model._meta.label_lower}'
+
+
+def incr(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Missing key; add() keeps a concurrent creator's value
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key, delta)
+
+
+def bump(key):
+    # A cache outage must not fail the write that triggered the bump
+    try:
+        incr(key)
+    except Exception:
+        logger.exception('Could not bump cache version %s', key)
+
+
+def bump_versions(*models):
+    """Invalidate every cached response built from any of `models`"""
+    for model in models:
+        bump(version_key(model))
+    bump_data_version()
+
+
+def bump_data_version():
+    """Invalidate every cached GraphQL result"""
+    bump(DATA_VERSION_KEY)
+
+
+def data_version():
+    return cache.get(DATA_VERSION_KEY, 0)
+
+
+def get_versions(models):
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    return [str(versions.get(key, 0)) for key in keys]
+
+
+def canonical_url(request):
+    """Path plus the query string with its parameters sorted"""
+    params = sorted(
+        (name, value)
+        for name in request.GET
+        for value in request.GET.getlist(name)
+    )
+    return f'{request.path}?{urlencode(params)}'
+
+
+def response_key(request, models):
+    url_hash = hashlib.sha256(canonical_url(request).encode()).hexdigest()
+    return f"{KEY_PREFIX}:response:{url_hash}:{'.'.join(get_versions(models))}"
+
+
+def record(outcome):
+    try:
+        incr(STATS_KEYS[outcome])
+    except Exception:
+        logger.exception('Could not record response cache %s', outcome)
+
+
+def cache_stats():
+    counts = cache.get_many(list(STATS_KEYS.values()))
+    stats = {name: counts.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / total if total else 0.0
+    return stats
+
+
+def cache_response(*models):
+    """
+    Cache the JSON bytes of successful GET responses per canonical URL.
+    `models` are the models the payload is derived from.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or not settings.RESPONSE_CACHE_TIMEOUT:
+                return view(request, *args, **kwargs)
+
+            try:
+                key = response_key(request, models)
+                content = cache.get(key)
+            except Exception:
+                logger.exception('Response cache unavailable')
+                return view(request, *args, **kwargs)
+
+            if content is not None:
+                record('hits')
+                return HttpResponse(content, content_type='application/json')
+
+            record('misses')
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                try:
+                    cache.set(key, response.content, settings.RESPONSE_CACHE_TIMEOUT)
+                except Exception:
+                    logger.exception('Could not store cached response')
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,138 @@
+"""
+Static cost analysis of GraphQL operations.
+
+Runs on the parsed document before execution: every object field costs
+its weight, and the selections below a connection or list are multiplied
+by the number of items it can return (`first`/`last`, or the default page
+size). The result is compared against GRAPHQL_MAX_DEPTH / GRAPHQL_MAX_COST
+so expensive documents are rejected without touching the database.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from graphene_django.settings import graphene_settings
+from graphql import (
+    FieldNode, FragmentDefinitionNode, FragmentSpreadNode, GraphQLError, IntValueNode,
+    VariableNode, get_named_type, get_nullable_type, is_list_type, is_object_type,
+)
+
+
+# Weight of resolving one object field, on top of its children. Scalars
+# are free; root fields that run a query of their own cost more.
+DEFAULT_OBJECT_COST = 1
+FIELD_COSTS = {
+    ('Query', 'searchPeople'): 10,
+    ('Query', 'search'): 10,
+    ('Query', 'textSearch'): 10,
+    ('Query', 'autocomplete'): 1,
+    ('Query', 'filmsByCharacter'): 5,
+    ('Query', 'charactersInFilm'): 5,
+}
+
+# Relay plumbing: free, not multiplied and not a nesting level. Each
+# `node` still costs one item of its connection.
+TRANSPARENT_FIELDS = {'edges', 'node', 'pageInfo'}
+
+Complexity = namedtuple('Complexity', ['depth', 'cost'])
+
+
+def argument_value(node, name, variables, defaults):
+    for argument in node.arguments:
+        if argument.name.value == name:
+            value = argument.value
+            if isinstance(value, IntValueNode):
+                return int(value.value)
+            if isinstance(value, VariableNode):
+                variable = value.name.value
+                return variables.get(variable, defaults.get(variable))
+    return None
+
+
+def item_count(value, page_size):
+    """
+    Items a connection can return for a `first`/`last` value. Negative
+    values count as none; a missing or non-integer value as a full page.
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return min(max(0, value), page_size)
+    return page_size
+
+
+def variable_defaults(operation):
+    defaults = {}
+    for definition in operation.variable_definitions or []:
+        if isinstance(definition.default_value, IntValueNode):
+            defaults[definition.variable.name.value] = int(definition.default_value.value)
+    return defaults
+
+
+def analyze(schema, document, operation, variables=None):
+    """Return the Complexity (depth, cost) of `operation` in `document`"""
+    variables = variables or {}
+    defaults = variable_defaults(operation)
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+    page_size = graphene_settings.RELAY_CONNECTION_MAX_LIMIT or 100
+
+    def fields_of(selection_set, parent_type):
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield selection, parent_type
+            else:
+                if isinstance(selection, FragmentSpreadNode):
+                    selection = fragments.get(selection.name.value)
+                    if selection is None:
+                        continue
+                condition = selection.type_condition
+                fragment_type = schema.get_type(condition.name.value) if condition else parent_type
+                yield from fields_of(selection.selection_set, fragment_type)
+
+    def visit(selection_set, parent_type):
+        depth, cost = 0, 0
+        for node, node_parent in fields_of(selection_set, parent_type):
+            field = node_parent.fields.get(node.name.value) if is_object_type(node_parent) else None
+            if field is None or node.selection_set is None:
+                continue
+
+            field_type = get_named_type(field.type)
+            child_depth, child_cost = visit(node.selection_set, field_type)
+
+            name = node.name.value
+            if name in TRANSPARENT_FIELDS:
+                cost += child_cost + (DEFAULT_OBJECT_COST if name == 'node' else 0)
+                depth = max(depth, child_depth)
+                continue
+
+            weight = FIELD_COSTS.get((node_parent.name, name), DEFAULT_OBJECT_COST)
+            if field_type.name.endswith('Connection'):
+                size = min(
+                    item_count(argument_value(node, name, variables, defaults), page_size)
+                    for name in ('first', 'last')
+                )
+                cost += weight + size * child_cost
+            elif is_list_type(get_nullable_type(field.type)):
+                cost += weight + page_size * (DEFAULT_OBJECT_COST + child_cost)
+            else:
+                cost += weight + child_cost
+            depth = max(depth, 1 + child_depth)
+        return Complexity(depth, cost)
+
+    root_type = schema.get_root_type(operation.operation)
+    return visit(operation.selection_set, root_type)
+
+
+def check_complexity(complexity):
+    """Raise a GraphQLError when `complexity` exceeds the configured limits"""
+    if complexity.depth > settings.GRAPHQL_MAX_DEPTH:
+        raise GraphQLError(
+            f'Query depth {complexity.depth} exceeds the maximum of {settings.GRAPHQL_MAX_DEPTH}',
+            extensions={'code': 'QUERY_TOO_DEEP', 'depth': complexity.depth},
+        )
+    if complexity.cost > settings.GRAPHQL_MAX_COST:
+        raise GraphQLError(
+            f'Query cost {complexity.cost} exceeds the maximum of {settings.GRAPHQL_MAX_COST}',
+            extensions={'code': 'QUERY_TOO_EXPENSIVE', 'cost': complexity.cost},
+        )
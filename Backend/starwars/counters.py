@@ -0,0 +1,83 @@
+from collections import defaultdict, namedtuple
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Person, Film, Planet, Species
+
+
+# A stored counter column: `model.field` holds the number of `source` rows
+# whose `key` foreign key points at the model row.
+Counter = namedtuple('Counter', ['model', 'field', 'source', 'key'])
+
+COUNTERS = [
+    Counter(Person, 'film_count', Person.films.through, 'person'),
+    Counter(Film, 'character_count', Person.films.through, 'film'),
+    Counter(Film, 'planet_count', Film.planets.through, 'film'),
+    Counter(Planet, 'resident_count', Person, 'homeworld'),
+    Counter(Planet, 'film_count', Film.planets.through, 'planet'),
+    Counter(Species, 'people_count', Species.people.through, 'species'),
+    Counter(Species, 'film_count', Species.films.through, 'species'),
+]
+
+
+def counter_subquery(counter):
+    """Correlated subquery computing `counter` for the outer model row"""
+    rows = (
+        counter.source.objects
+        .filter(**{counter.key: OuterRef('pk')})
+        .order_by()
+        .values(counter.key)
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def refresh_counters(model, pks=None, source=None):
+    """
+    Recompute the stored counters of `model` from the source rows in a
+    single UPDATE. Limited to `pks` and to counters fed by `source` when
+    given; `pks=None` refreshes the whole table.
+    """
+    counters = [
+        counter for counter in COUNTERS
+        if counter.model is model and (source is None or counter.source is source)
+    ]
+    if not counters or pks is not None and not pks:
+        return 0
+    queryset = model.objects.all()
+    if pks is not None:
+        queryset = queryset.filter(pk__in=pks)
+    return queryset.update(**{
+        counter.field: counter_subquery(counter) for counter in counters
+    })
+
+
+def reload_counters(instance):
+    """Copy the stored counter values of `instance` back from the database"""
+    fields = [counter.field for counter in COUNTERS if counter.model is type(instance)]
+    if fields:
+        values = type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+        for field, value in (values or {}).items():
+            setattr(instance, field, value)
+
+
+def linked_counters(instance):
+    """{model: pks} whose counters include rows linked to `instance`"""
+    linked = defaultdict(set)
+    model = type(instance)
+    for counter in COUNTERS:
+        if counter.source is model:
+            linked[counter.model].add(getattr(instance, f'{counter.key}_id'))
+        elif counter.source._meta.auto_created:
+            for field in counter.source._meta.fields:
+                if field.related_model is model and field.name != counter.key:
+                    linked[counter.model].update(
+                        counter.source.objects
+                        .filter(**{field.name: instance.pk})
+                        .values_list(counter.key, flat=True)
+                    )
+    for pks in linked.values():
+        pks.discard(None)
+    return linked
@@ -0,0 +1,331 @@
+"""
+GraphQL endpoint with persisted queries, a parsed-document cache and an
+opt-in result cache.
+
+Clients may send `extensions.persistedQuery.sha256Hash` (Apollo automatic
+persisted queries) instead of the query text. Query texts are registered
+in the shared cache (Redis) for GRAPHQL_PERSISTED_QUERY_TIMEOUT seconds so
+every worker can resolve a hash; a hash is resolved once per request. Each
+worker keeps an LRU of parsed and validated documents so known queries
+skip lexing, parsing and validation.
+
+With GRAPHQL_RESULT_CACHE_TIMEOUT set, the JSON of successful query
+operations is cached by document hash, operation name, variables and the
+global data version (bumped by model signals and after every mutation),
+so a hit never reaches graphene or the ORM.
+
+Every operation is costed statically before execution (complexity.py);
+documents over the depth or cost limit are rejected and the computed
+complexity is returned in the response `extensions`.
+
+Profiled requests (profiling.py) bypass the result cache and add resolver
+tracing and SQL statistics to the `extensions`.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponseNotAllowed
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import ExecutionResult, OperationType, execute, get_operation_ast, parse, validate_schema
+from graphql.error import GraphQLError
+from graphql.execution.middleware import MiddlewareManager
+from graphql.validation import validate
+
+from .caching import bump_data_version, data_version, record
+from .complexity import analyze, check_complexity
+from .profiling import current_profile
+
+logger = logging.getLogger(__name__)
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def registry_key(sha256_hash):
+    return f'starwars:persisted-query:{sha256_hash}'
+
+
+class DocumentCache:
+    """Thread-safe LRU of (document, validation errors) by query hash"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+document_cache = DocumentCache(settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+
+
+class PersistedQueryGraphQLView(GraphQLView):
+    execution_errors = False
+    execution_extensions = None
+
+    @staticmethod
+    def get_persisted_hash(request, data):
+        extensions = request.GET.get('extensions') or data.get('extensions')
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                return None
+        persisted = (extensions or {}).get('persistedQuery') or {}
+        return persisted.get('sha256Hash')
+
+    def resolve_persisted_query(self, query, sha256_hash):
+        """Return the query text for a persisted request, registering new ones"""
+        if query:
+            if query_hash(query) != sha256_hash:
+                raise GraphQLError(
+                    'provided sha does not match query',
+                    extensions={'code': 'PERSISTED_QUERY_HASH_MISMATCH'},
+                )
+            # add(): a known hash costs no write
+            cache.add(registry_key(sha256_hash), query, settings.GRAPHQL_PERSISTED_QUERY_TIMEOUT)
+            return query
+
+        query = cache.get(registry_key(sha256_hash))
+        if query is None:
+            raise GraphQLError(
+                'PersistedQueryNotFound',
+                extensions={'code': 'PERSISTED_QUERY_NOT_FOUND'},
+            )
+        return query
+
+    def request_query(self, request, data, query):
+        """
+        (query text, GraphQLError) of the request: `query`, or the text of its
+        persisted hash. Memoized on the request, so the result cache key and
+        the execution share one lookup (or registration).
+        """
+        if not hasattr(request, 'graphql_query'):
+            sha256_hash = self.get_persisted_hash(request, data)
+            error = None
+            if sha256_hash:
+                try:
+                    query = self.resolve_persisted_query(query, sha256_hash)
+                except GraphQLError as e:
+                    query, error = None, e
+            request.graphql_query = (query, error)
+        return request.graphql_query
+
+    def get_document(self, query):
+        """Parsed and validated document for `query`, from the LRU when known"""
+        key = query_hash(query)
+        entry = document_cache.get(key)
+        if entry is None:
+            document = parse(query)
+            validation_errors = validate(
+                self.schema.graphql_schema,
+                document,
+                self.validation_rules,
+                graphene_settings.MAX_VALIDATION_ERRORS,
+            )
+            entry = (document, validation_errors)
+            document_cache.set(key, entry)
+        return entry
+
+    def result_cache_key(self, request, data, show_graphiql):
+        """Cache key for a cacheable query operation, None otherwise"""
+        if not settings.GRAPHQL_RESULT_CACHE_TIMEOUT or show_graphiql or request.GET.get('pretty'):
+            return None
+        if current_profile() is not None:
+            return None
+
+        query, variables, operation_name, _ = self.get_graphql_params(request, data)
+        query, _ = self.request_query(request, data, query)
+        if not query:
+            return None
+        try:
+            document, validation_errors = self.get_document(query)
+        except Exception:
+            return None
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if validation_errors or operation_ast is None or operation_ast.operation != OperationType.QUERY:
+            return None
+
+        variables_key = json.dumps(variables or {}, sort_keys=True, separators=(',', ':'))
+        return 'starwars:graphql:{}:{}:{}:{}'.format(
+            query_hash(query),
+            operation_name or '',
+            hashlib.sha256(variables_key.encode()).hexdigest(),
+            data_version(),
+        )
+
+    def get_response(self, request, data, show_graphiql=False):
+        # Label for the per-operation latency histogram (metrics.py)
+        request.graphql_operation = request.GET.get('operationName') or data.get('operationName')
+        try:
+            key = self.result_cache_key(request, data, show_graphiql)
+            cached = cache.get(key) if key is not None else None
+        except Exception:
+            # Without the cache, execute uncached
+            logger.exception('GraphQL result cache unavailable')
+            key = None
+        if key is not None:
+            if cached is not None:
+                record('hits')
+                return cached, 200
+            record('misses')
+
+        result, status_code = super().get_response(request, data, show_graphiql)
+
+        if key is not None and status_code == 200 and not self.execution_errors:
+            try:
+                cache.set(key, result, settings.GRAPHQL_RESULT_CACHE_TIMEOUT)
+            except Exception:
+                logger.exception('Could not store cached GraphQL result')
+        return result, status_code
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        result = self.execute_operation(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+        self.execution_errors = bool(result and result.errors)
+        self.execution_extensions = result.extensions if result else None
+        return result
+
+    def get_middleware(self, request):
+        middleware = super().get_middleware(request)
+        profile = current_profile()
+        if profile is None:
+            return middleware
+        if isinstance(middleware, MiddlewareManager):
+            middleware = middleware.middlewares
+        return [profile.resolver_middleware(), *(middleware or [])]
+
+    def json_encode(self, request, d, pretty=False):
+        if self.execution_extensions:
+            d = {**d, 'extensions': self.execution_extensions}
+        return super().json_encode(request, d, pretty)
+
+    def execute_operation(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        query, error = self.request_query(request, data, query)
+        if error is not None:
+            return ExecutionResult(errors=[error])
+
+        if not query:
+            return super().execute_graphql_request(
+                request, data, query, variables, operation_name, show_graphiql
+            )
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        try:
+            document, validation_errors = self.get_document(query)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        if (
+            request.method.lower() == 'get'
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ['POST'],
+                    'Can only perform a {} operation from a POST request.'.format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        extensions = None
+        if operation_ast is not None:
+            try:
+                complexity = analyze(schema, document, operation_ast, variables)
+                extensions = {
+                    'complexity': {
+                        'depth': complexity.depth,
+                        'cost': complexity.cost,
+                        'maxDepth': settings.GRAPHQL_MAX_DEPTH,
+                        'maxCost': settings.GRAPHQL_MAX_COST,
+                    },
+                }
+                check_complexity(complexity)
+            except GraphQLError as e:
+                return ExecutionResult(errors=[e], extensions=extensions)
+            except Exception as e:
+                return ExecutionResult(errors=[e])
+
+        try:
+            execute_options = {
+                'root_value': self.get_root_value(request),
+                'context_value': self.get_context(request),
+                'variable_values': variables,
+                'operation_name': operation_name,
+                'middleware': self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options['execution_context_class'] = self.execution_context_class
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get('ATOMIC_MUTATIONS', False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+            else:
+                result = execute(schema, document, **execute_options)
+
+            if operation_ast is not None and operation_ast.operation == OperationType.MUTATION:
+                # Covers writes that bypass model signals (bulk updates); once
+                # committed, like the model signals' bumps
+                transaction.on_commit(bump_data_version)
+            profile = current_profile()
+            if profile is not None and profile.tracing_started is not None:
+                extensions = {**(extensions or {}), **profile.graphql_extensions()}
+            result.extensions = extensions
+            return result
+        except Exception as e:
+            return ExecutionResult(errors=[e])
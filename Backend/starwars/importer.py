@@ -0,0 +1,351 @@
+"""
+Bulk load path shared by the import commands.
+
+Rows are upserted with one INSERT ... ON CONFLICT per batch keyed on the
+natural unique column (name/title), and M2M edges go straight into the
+auto-created through tables. Neither sends model signals, so rows get
+their numeric measurement columns here (measurements.py), and
+finish_import() recomputes the stored counters and invalidates cached
+responses once at the end.
+"""
+import csv
+import io
+from collections import namedtuple
+from datetime import datetime
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections, models, transaction
+from django.utils import timezone
+
+from .caching import bump_versions
+from .counters import refresh_counters
+from .measurements import with_numeric_values
+from .models import Person, Film, Planet, Species
+
+BATCH_SIZE = 1000
+COPY_BATCH_SIZE = 10000
+
+# Natural key each model is upserted on
+UNIQUE_FIELDS = {
+    Planet: 'name',
+    Film: 'title',
+    Person: 'name',
+    Species: 'name',
+}
+
+# M2M relations as (descriptor, source field of the SWAPI record)
+RELATIONS = {
+    Person: [(Person.films, 'films')],
+    Film: [(Film.planets, 'planets')],
+    Species: [(Species.people, 'people'), (Species.films, 'films')],
+}
+
+IMPORT_MODELS = (Planet, Film, Person, Species)
+
+RowChanges = namedtuple('RowChanges', ['created', 'updated', 'deleted', 'unchanged'])
+EdgeChanges = namedtuple('EdgeChanges', ['added', 'removed'])
+
+
+def planet_row(data):
+    return {
+        'name': data['name'],
+        'rotation_period': data.get('rotation_period', ''),
+        'orbital_period': data.get('orbital_period', ''),
+        'diameter': data.get('diameter', ''),
+        'climate': data.get('climate', ''),
+        'gravity': data.get('gravity', ''),
+        'terrain': data.get('terrain', ''),
+        'surface_water': data.get('surface_water', ''),
+        'population': data.get('population', ''),
+        'swapi_url': data['url'],
+    }
+
+
+def film_row(data):
+    return {
+        'title': data['title'],
+        'episode_id': data['episode_id'],
+        'opening_crawl': data['opening_crawl'],
+        'director': data['director'],
+        'producer': data['producer'],
+        'release_date': datetime.strptime(data['release_date'], '%Y-%m-%d').date(),
+        'swapi_url': data['url'],
+    }
+
+
+def person_row(data, planets):
+    return {
+        'name': data['name'],
+        'height': data.get('height', ''),
+        'mass': data.get('mass', ''),
+        'hair_color': data.get('hair_color', ''),
+        'skin_color': data.get('skin_color', ''),
+        'eye_color': data.get('eye_color', ''),
+        'birth_year': data.get('birth_year', ''),
+        'gender': data.get('gender', ''),
+        'homeworld_id': planets.get(data.get('homeworld')),
+        'swapi_url': data['url'],
+    }
+
+
+def species_row(data, planets):
+    return {
+        'name': data['name'],
+        'classification': data.get('classification', ''),
+        'designation': data.get('designation', ''),
+        'average_height': data.get('average_height', ''),
+        'skin_colors': data.get('skin_colors', ''),
+        'hair_colors': data.get('hair_colors', ''),
+        'eye_colors': data.get('eye_colors', ''),
+        'average_lifespan': data.get('average_lifespan', ''),
+        'language': data.get('language', ''),
+        'homeworld_id': planets.get(data.get('homeworld')),
+        'swapi_url': data['url'],
+    }
+
+
+def raw_delete(model, field_name, values):
+    """DELETE the rows of `model` whose `field_name` is in `values`; no signals, no collector"""
+    field = model._meta.get_field(field_name)
+    table = connection.ops.quote_name(model._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {connection.ops.quote_name(field.column)} IN ({placeholders})',
+            [field.get_db_prep_value(value, connection) for value in values],
+        )
+
+
+def link_tables(model):
+    """(through model, foreign key name) of every M2M through table pointing at `model`"""
+    tables = [
+        (field.remote_field.through, field.m2m_field_name())
+        for field in model._meta.many_to_many
+    ]
+    tables += [
+        (relation.through, relation.field.m2m_reverse_field_name())
+        for relation in model._meta.related_objects if relation.many_to_many
+    ]
+    return tables
+
+
+def delete_rows(model, pks, batch_size=BATCH_SIZE):
+    """
+    Delete rows of `model` by primary key in bulk, without model signals.
+    Their M2M links are deleted and the foreign keys pointing at them set
+    to NULL (their on_delete rule); run finish_import() afterwards.
+    """
+    pks = list(pks)
+    for start in range(0, len(pks), batch_size):
+        batch = pks[start:start + batch_size]
+        for through, name in link_tables(model):
+            raw_delete(through, name, batch)
+        for relation in model._meta.related_objects:
+            if relation.one_to_many and relation.on_delete is models.SET_NULL:
+                name = relation.field.name
+                relation.related_model.objects.filter(**{f'{name}__in': batch}).update(**{name: None})
+        raw_delete(model, model._meta.pk.name, batch)
+
+
+def clear_tables(models=IMPORT_MODELS):
+    """
+    Empty the tables of `models` (parents first, as IMPORT_MODELS) and
+    their M2M through tables without model signals: TRUNCATE on
+    PostgreSQL, children-first DELETEs elsewhere. Run finish_import() afterwards.
+    """
+    throughs = {field.remote_field.through for model in models for field in model._meta.many_to_many}
+    tables = sorted(through._meta.db_table for through in throughs)
+    tables += [model._meta.db_table for model in reversed(models)]
+    tables = [connection.ops.quote_name(table) for table in tables]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"TRUNCATE {', '.join(tables)}")
+        else:
+            for table in tables:
+                cursor.execute(f'DELETE FROM {table}')
+
+
+def build_index(model):
+    """swapi_url -> pk for every imported row of `model`"""
+    return dict(
+        model.objects.exclude(swapi_url=None).values_list('swapi_url', 'pk')
+    )
+
+
+def upsert(model, rows, batch_size=BATCH_SIZE):
+    """
+    Insert `rows` (dicts of field values), updating the rows that already
+    exist with the same natural key. Returns the number of rows written.
+    """
+    unique_field = UNIQUE_FIELDS[model]
+    # A key may appear only once per statement; the last record wins
+    rows = list({row[unique_field]: with_numeric_values(model, row) for row in rows}.values())
+    if not rows:
+        return 0
+
+    update_fields = [field for field in rows[0] if field != unique_field] + ['edited']
+    model.objects.bulk_create(
+        [model(**row) for row in rows],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=[unique_field],
+        update_fields=update_fields,
+    )
+    return len(rows)
+
+
+def through_fields(descriptor):
+    """Foreign key attnames (source, target) of an M2M through table"""
+    field = descriptor.field
+    return f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+
+
+def insert_edges(descriptor, edges, batch_size=BATCH_SIZE):
+    """Write (source pk, target pk) pairs into the through table of `descriptor`"""
+    through = descriptor.through
+    source, target = through_fields(descriptor)
+    created = through.objects.bulk_create(
+        [through(**{source: a, target: b}) for a, b in edges],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    return len(created)
+
+
+def resolve_edges(records, source_index, target_index, field):
+    """(source pk, target pk) pairs of the links listed in `records[field]`"""
+    for record in records:
+        source = source_index.get(record['url'])
+        if source is None:
+            continue
+        for url in record.get(field) or []:
+            target = target_index.get(url)
+            if target is not None:
+                yield source, target
+
+
+def sync_rows(model, rows, batch_size=BATCH_SIZE):
+    """
+    Make the rows of `model` that came from SWAPI match `rows`, matching by
+    swapi_url: insert new records, update changed ones and delete the ones
+    the source no longer lists. Rows without a swapi_url are left alone.
+    """
+    rows = {row['swapi_url']: with_numeric_values(model, row) for row in rows}
+    fields = [field for field in next(iter(rows.values()), {}) if field != 'swapi_url']
+    existing = {
+        current.pop('swapi_url'): current
+        for current in model.objects.exclude(swapi_url=None).values('pk', 'swapi_url', *fields)
+    }
+
+    created, updated, unchanged = [], [], 0
+    now = timezone.now()
+    for url, row in rows.items():
+        current = existing.get(url)
+        if current is None:
+            created.append(row)
+        elif any(current[field] != row[field] for field in fields):
+            updated.append(model(pk=current['pk'], edited=now, **row))
+        else:
+            unchanged += 1
+    stale = [current['pk'] for url, current in existing.items() if url not in rows]
+
+    # Deletes first, so a record re-listed under a new URL can take its name
+    delete_rows(model, stale, batch_size)
+    if updated:
+        model.objects.bulk_update(updated, fields + ['edited'], batch_size=batch_size)
+    upsert(model, created, batch_size)
+    return RowChanges(len(created), len(updated), len(stale), unchanged)
+
+
+def sync_edges(descriptor, edges, batch_size=BATCH_SIZE):
+    """
+    Make the through table of `descriptor` match `edges` for links between
+    SWAPI rows; links to rows created locally are left alone.
+    """
+    through = descriptor.through
+    field = descriptor.field
+    source, target = through_fields(descriptor)
+    existing = {
+        (a, b): pk
+        for pk, a, b in through.objects.filter(**{
+            f'{field.m2m_field_name()}__swapi_url__isnull': False,
+            f'{field.m2m_reverse_field_name()}__swapi_url__isnull': False,
+        }).values_list('pk', source, target)
+    }
+
+    edges = set(edges)
+    added = edges - existing.keys()
+    stale = [pk for edge, pk in existing.items() if edge not in edges]
+
+    insert_edges(descriptor, added, batch_size)
+    for start in range(0, len(stale), batch_size):
+        raw_delete(through, 'id', stale[start:start + batch_size])
+    return EdgeChanges(len(added), len(stale))
+
+
+def copy_rows(model, rows, batch_size=COPY_BATCH_SIZE):
+    """
+    Append `rows` (dicts keyed by attname) to the table of `model` as fast
+    as the database allows: COPY FROM STDIN on PostgreSQL, one prepared
+    INSERT run with executemany() elsewhere. Missing fields take their model default; there is no
+    conflict handling. Returns the number of rows written.
+    """
+    now = timezone.now()
+    fields = [field for field in model._meta.concrete_fields if not isinstance(field, models.AutoField)]
+    defaults = {
+        field.attname: (lambda: now) if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+        else field.get_default
+        for field in fields
+    }
+
+    def values(row):
+        return [
+            row[field.attname] if field.attname in row else defaults[field.attname]()
+            for field in fields
+        ]
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+
+    if connection.vendor == 'postgresql':
+        statement = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+
+        def write(batch):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in batch:
+                writer.writerow(['\\N' if value is None else value for value in values(row)])
+            buffer.seek(0)
+            with connection.cursor() as cursor:
+                cursor.copy_expert(statement, buffer)
+    else:
+        placeholders = ', '.join(['%s'] * len(fields))
+        statement = f'INSERT INTO {table} ({columns}) VALUES ({placeholders})'
+        # The wrapper behind the `connection` proxy, resolved once per call
+        db = connections[DEFAULT_DB_ALIAS]
+        preps = [field.get_db_prep_save for field in fields]
+
+        def write(batch):
+            params = [
+                [prep(value, db) for prep, value in zip(preps, values(row))]
+                for row in batch
+            ]
+            with connection.cursor() as cursor:
+                cursor.executemany(statement, params)
+
+    written, batch = 0, []
+    for row in rows:
+        batch.append(with_numeric_values(model, row))
+        if len(batch) >= batch_size:
+            write(batch)
+            written, batch = written + len(batch), []
+    if batch:
+        write(batch)
+        written += len(batch)
+    return written
+
+
+def finish_import(models=IMPORT_MODELS):
+    """Recompute counters, and invalidate caches once the load commits"""
+    for model in models:
+        refresh_counters(model)
+    transaction.on_commit(lambda: bump_versions(*models))
@@ -0,0 +1,151 @@
+from collections import defaultdict
+
+from django.db.models import F
+
+from .models import Person, Film, Planet, Species
+
+
+# Related managers served by the loaders:
+# model -> {relation name: (related model, lookup back to the parent)}
+RELATIONS = {
+    Person: {
+        'films': (Film, 'characters'),
+        'species': (Species, 'people'),
+    },
+    Film: {
+        'characters': (Person, 'films'),
+        'planets': (Planet, 'films'),
+        'species': (Species, 'films'),
+    },
+    Planet: {
+        'residents': (Person, 'homeworld'),
+        'films': (Film, 'planets'),
+    },
+    Species: {
+        'people': (Person, 'species'),
+        'films': (Film, 'species'),
+    },
+}
+
+
+class BatchLoader:
+    """
+    Synchronous DataLoader: keys queued with prime() are fetched together
+    the first time any of them is loaded, and every result is cached for
+    the life of the loader (one GraphQL request).
+    """
+
+    def __init__(self, batch_load_fn, default=None):
+        self.batch_load_fn = batch_load_fn
+        self.default = default
+        self._cache = {}
+        self._queue = set()
+
+    def prime(self, keys):
+        for key in keys:
+            if key is not None and key not in self._cache:
+                self._queue.add(key)
+
+    def seed(self, key, value):
+        self._cache[key] = value
+        self._queue.discard(key)
+
+    def load(self, key):
+        if key is None:
+            return self.default
+        if key not in self._cache:
+            keys = self._queue | {key}
+            self._queue = set()
+            results = self.batch_load_fn(list(keys))
+            for batch_key in keys:
+                self._cache[batch_key] = results.get(batch_key, self.default)
+        return self._cache[key]
+
+
+class Loaders:
+    """Per-request registry of batch loaders for the Star Wars schema"""
+
+    def __init__(self):
+        self.related = {
+            (model, name): self._related_loader(*target)
+            for model, relations in RELATIONS.items()
+            for name, target in relations.items()
+        }
+        # Objects by primary key (foreign keys such as homeworld)
+        self.planets = BatchLoader(self._load_planets)
+
+    def _related_loader(self, model, lookup):
+        def batch_load(keys):
+            grouped = defaultdict(list)
+            queryset = model.objects.filter(**{f'{lookup}__in': keys})
+            for obj in queryset.annotate(batch_key=F(lookup)):
+                grouped[obj.batch_key].append(obj)
+            self.prime(obj for objects in grouped.values() for obj in objects)
+            return grouped
+
+        return BatchLoader(batch_load, default=[])
+
+    def _load_planets(self, keys):
+        planets = Planet.objects.in_bulk(keys)
+        self.prime(planets.values())
+        return planets
+
+    def load_related(self, instance, name):
+        """Objects related to `instance` through `name`, prefetched or batched"""
+        cache = getattr(instance, '_prefetched_objects_cache', {})
+        if name in cache:
+            return list(cache[name])
+        return self.related[type(instance), name].load(instance.pk)
+
+    def load_homeworld(self, instance):
+        if type(instance).homeworld.is_cached(instance):
+            return instance.homeworld
+        return self.planets.load(instance.homeworld_id)
+
+    def prime(self, objects, seen=None):
+        """Queue every object's keys so sibling lookups share one query"""
+        # Prefetched children point back at their parent (a resident's cached
+        # homeworld is the planet being primed), so remember what was visited.
+        seen = set() if seen is None else seen
+        by_model = defaultdict(list)
+        for obj in objects:
+            key = (type(obj), obj.pk)
+            if key not in seen:
+                seen.add(key)
+                by_model[type(obj)].append(obj)
+
+        for model, instances in by_model.items():
+            keys = [obj.pk for obj in instances]
+            for name in RELATIONS.get(model, {}):
+                self.related[model, name].prime(keys)
+
+            # Follow select_related/prefetch_related results as well, so their
+            # own relations are batched across every parent in one go.
+            children = []
+            if model in (Person, Species):
+                for obj in instances:
+                    if model.homeworld.is_cached(obj):
+                        if obj.homeworld is not None:
+                            self.planets.seed(obj.homeworld_id, obj.homeworld)
+                            children.append(obj.homeworld)
+                    else:
+                        self.planets.prime([obj.homeworld_id])
+            for obj in instances:
+                for related in getattr(obj, '_prefetched_objects_cache', {}).values():
+                    children.extend(related)
+            if children:
+                self.prime(children, seen)
+
+
+def get_loaders(info):
+    """Return the loaders bound to the current request (info.context)"""
+    context = info.context
+    if context is None:
+        # No request to hang the cache on (e.g. schema.execute without a
+        # context); fall back to unbatched, uncached loaders.
+        return Loaders()
+    loaders = getattr(context, 'starwars_loaders', None)
+    if loaders is None:
+        loaders = Loaders()
+        setattr(context, 'starwars_loaders', loaders)
+    return loaders
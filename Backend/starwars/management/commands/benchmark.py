@@ -0,0 +1,95 @@
+import json
+import os
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from starwars.benchmarks import (
+    BUDGETS_PATH, SIZES, WALL_TOLERANCE, compare_plans, load_baseline, load_budgets, run_benchmarks,
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the REST and GraphQL endpoints on synthetic datasets and check the budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='small,medium',
+            help=f"Comma-separated dataset sizes ({', '.join(SIZES)})",
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case')
+        parser.add_argument('--seed', type=int, default=42, help='Seed of the synthetic data')
+        parser.add_argument('--budgets', default=BUDGETS_PATH, help='Budgets JSON file')
+        parser.add_argument('--output', metavar='PATH', help='Write the results as JSON')
+        parser.add_argument(
+            '--baseline', metavar='PATH',
+            help='Results JSON (--output) of an earlier run on this machine to check wall times against',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=WALL_TOLERANCE,
+            help='Slowdown over the baseline wall time allowed, as a fraction',
+        )
+        parser.add_argument(
+            '--plans', action='store_true',
+            help='Also EXPLAIN the indexed list/filter queries with and without their index',
+        )
+
+    def handle(self, *args, **options):
+        sizes = [size.strip() for size in options['sizes'].split(',') if size.strip()]
+        unknown = set(sizes) - set(SIZES)
+        if unknown:
+            raise CommandError(f"Unknown sizes: {', '.join(sorted(unknown))}")
+        budgets = load_budgets(options['budgets'])
+        baseline = load_baseline(options['baseline']) if options['baseline'] else None
+
+        # Never touch the real data: run against a throwaway test database
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results, plans = [], []
+            for size in sizes:
+                self.stdout.write(f'Generating {size} dataset...')
+                with open(os.devnull, 'w') as devnull:
+                    call_command(
+                        'generate_synthetic', clear=True, seed=options['seed'],
+                        stdout=devnull, **SIZES[size]
+                    )
+                results += run_benchmarks(
+                    size, budgets, options['repeat'], baseline, options['tolerance']
+                )
+                if options['plans']:
+                    plans += compare_plans(size)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for result in results:
+            line = (
+                f"  {result['size']:<7} {result['case']:<32} {result['wall_ms']:8.1f}ms "
+                f"{result['queries']:4d} queries {result['rows']:7d} rows "
+                f"{result['peak_memory_kb']:7d}KB"
+            )
+            if result['violations']:
+                line = self.style.ERROR(f"{line}  OVER BUDGET: {'; '.join(result['violations'])}")
+            self.stdout.write(line)
+
+        for plan in plans:
+            line = (
+                f"  {plan['size']:<7} {plan['case']:<32} {' / '.join(plan['before']) or '-'}\n"
+                f"  {'':<7} {'':<32} -> {' / '.join(plan['after']) or '-'}"
+            )
+            if not plan['uses_index']:
+                # Planners rightly prefer a scan on small tables, so this is not a failure
+                line = self.style.WARNING(f"{line}  (not using {plan['index']})")
+            self.stdout.write(line)
+
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                json.dump(
+                    {'sizes': {size: SIZES[size] for size in sizes}, 'results': results, 'plans': plans},
+                    out, indent=2,
+                )
+
+        failed = [result for result in results if result['violations']]
+        if failed:
+            raise CommandError(f'{len(failed)} benchmark(s) over budget')
+        self.stdout.write(self.style.SUCCESS('All benchmarks within budget'))
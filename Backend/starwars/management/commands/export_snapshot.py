@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from starwars.snapshot import write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Export all Star Wars data to a compressed NDJSON snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Snapshot file to write (e.g. starwars.ndjson.gz)')
+
+    def handle(self, *args, **options):
+        counts = write_snapshot(options['path'])
+        for table, count in counts.items():
+            self.stdout.write(f'  Exported {count} {table} lines')
+
+        self.stdout.write(self.style.SUCCESS(f"Snapshot written to {options['path']}"))
@@ -0,0 +1,234 @@
+import random
+import time
+import uuid
+from datetime import date, timedelta
+from itertools import accumulate
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from starwars.importer import IMPORT_MODELS, clear_tables, copy_rows, finish_import, through_fields
+from starwars.models import Person, Film, Planet, Species
+
+
+SYLLABLES = [
+    'ka', 'ro', 'dan', 'tel', 'vor', 'ith', 'mu', 'sha', 'bel', 'kor', 'an', 'jin',
+    'ra', 'sol', 'ven', 'ta', 'lo', 'dre', 'ob', 'ix', 'zan', 'qui', 'mal', 'ess',
+]
+CLIMATES = ['arid', 'temperate', 'tropical', 'frozen', 'murky', 'windy', 'hot', 'polluted']
+TERRAINS = ['desert', 'grasslands', 'mountains', 'jungle', 'tundra', 'swamp', 'ocean', 'cityscape']
+GENDERS = ['male', 'female', 'n/a', 'hermaphrodite', 'none']
+COLORS = ['black', 'brown', 'blond', 'red', 'white', 'grey', 'blue', 'green', 'yellow', 'none']
+CLASSIFICATIONS = ['mammal', 'reptile', 'amphibian', 'artificial', 'sentient', 'insectoid']
+
+
+class Generator:
+    """Seeded source of names, ids and skewed (Zipf-like) picks"""
+
+    def __init__(self, seed, skew):
+        self.random = random.Random(seed)
+        self.skew = skew
+
+    def uuid(self):
+        return uuid.UUID(int=self.random.getrandbits(128), version=4)
+
+    def word(self, syllables=(2, 3)):
+        count = self.random.randint(*syllables)
+        return ''.join(self.random.choice(SYLLABLES) for _ in range(count)).capitalize()
+
+    def popularity(self, size):
+        """Cumulative weights where the item at rank r weighs 1 / r**skew"""
+        return list(accumulate(1 / rank ** self.skew for rank in range(1, size + 1)))
+
+    def pick(self, items, weights, k=1):
+        """k distinct popular-biased picks (fewer when duplicates are drawn)"""
+        return list(dict.fromkeys(self.random.choices(items, cum_weights=weights, k=k)))
+
+    def fan_out(self, mean, limit):
+        """Geometric-ish count >= 1: most rows link a few items, a tail links many"""
+        count = 1
+        while count < limit and self.random.random() < 1 - 1 / mean:
+            count += 1
+        return count
+
+
+class Command(BaseCommand):
+    help = 'Generate a large, reproducible synthetic Star Wars dataset for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--people', type=int, default=10000, help='Number of people')
+        parser.add_argument('--films', type=int, default=100, help='Number of films')
+        parser.add_argument('--planets', type=int, default=1000, help='Number of planets')
+        parser.add_argument('--species', type=int, default=50, help='Number of species')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; same seed, same data')
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help='Zipf exponent of homeworld, film and species popularity',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete all existing data first (in bulk, without model signals); '
+                 'required when the database already has data, since the same seed '
+                 'generates the same ids and names',
+        )
+
+    def handle(self, *args, **options):
+        generator = Generator(options['seed'], options['skew'])
+        self.started = time.perf_counter()
+
+        with transaction.atomic():
+            if options['clear']:
+                self.stdout.write('Clearing existing data...')
+                clear_tables()
+            elif any(model.objects.exists() for model in IMPORT_MODELS):
+                raise CommandError('The database already has data; run again with --clear to replace it')
+
+            planets = self.generate_planets(generator, options['planets'])
+            films = self.generate_films(generator, options['films'], planets)
+            species = self.generate_species(generator, options['species'], planets, films)
+            self.generate_people(generator, options['people'], planets, films, species)
+
+            self.stdout.write('Recomputing counters...')
+            finish_import()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Synthetic dataset generated in {time.perf_counter() - self.started:.1f}s')
+        )
+
+    def written(self, count, label):
+        self.stdout.write(f'  {count} {label} ({time.perf_counter() - self.started:.1f}s)')
+
+    def edges(self, descriptor, pairs):
+        source, target = through_fields(descriptor)
+        return copy_rows(descriptor.through, ({source: a, target: b} for a, b in pairs))
+
+    def generate_planets(self, generator, count):
+        rnd = generator.random
+        ids = [generator.uuid() for _ in range(count)]
+        rows = (
+            {
+                'id': pk,
+                'name': f'{generator.word()} {index}',
+                'rotation_period': str(rnd.randint(10, 60)),
+                'orbital_period': str(rnd.randint(150, 5000)),
+                'diameter': str(rnd.randint(1000, 200000)),
+                'climate': rnd.choice(CLIMATES),
+                'gravity': f'{rnd.uniform(0.1, 3):.1f} standard',
+                'terrain': ', '.join(rnd.sample(TERRAINS, rnd.randint(1, 3))),
+                'surface_water': str(rnd.randint(0, 100)),
+                'population': str(int(10 ** rnd.uniform(2, 12))),
+            }
+            for index, pk in enumerate(ids, 1)
+        )
+        self.written(copy_rows(Planet, rows), 'planets')
+        return ids
+
+    def generate_films(self, generator, count, planets):
+        rnd = generator.random
+        first_episode = (Film.objects.aggregate(Max('episode_id'))['episode_id__max'] or 0) + 1
+        ids = [generator.uuid() for _ in range(count)]
+        rows = (
+            {
+                'id': pk,
+                'title': f'The {generator.word()} {generator.word()} {index}',
+                'episode_id': first_episode + index,
+                'opening_crawl': ' '.join(generator.word((1, 3)).lower() for _ in range(60)),
+                'director': f'{generator.word()} {generator.word()}',
+                'producer': f'{generator.word()} {generator.word()}',
+                'release_date': date(1977, 5, 25) + timedelta(days=rnd.randint(0, 365 * 50)),
+            }
+            for index, pk in enumerate(ids)
+        )
+        self.written(copy_rows(Film, rows), 'films')
+
+        planet_weights = generator.popularity(len(planets))
+        pairs = (
+            (film, planet)
+            for film in ids
+            for planet in generator.pick(planets, planet_weights, rnd.randint(1, 12))
+        ) if planets else ()
+        self.written(self.edges(Film.planets, pairs), 'film-planet links')
+        return ids
+
+    def generate_species(self, generator, count, planets, films):
+        rnd = generator.random
+        planet_weights = generator.popularity(len(planets))
+        ids = [generator.uuid() for _ in range(count)]
+        rows = (
+            {
+                'id': pk,
+                'name': f'{generator.word()} {index}',
+                'classification': rnd.choice(CLASSIFICATIONS),
+                'designation': rnd.choice(['sentient', 'reptilian']),
+                'average_height': str(rnd.randint(50, 300)),
+                'skin_colors': ', '.join(rnd.sample(COLORS, 2)),
+                'hair_colors': rnd.choice(COLORS),
+                'eye_colors': rnd.choice(COLORS),
+                'average_lifespan': str(rnd.randint(30, 1000)),
+                'language': generator.word(),
+                'homeworld_id': generator.pick(planets, planet_weights)[0] if planets else None,
+            }
+            for index, pk in enumerate(ids, 1)
+        )
+        self.written(copy_rows(Species, rows), 'species')
+
+        film_weights = generator.popularity(len(films))
+        pairs = (
+            (species, film)
+            for species in ids
+            for film in generator.pick(films, film_weights, generator.fan_out(3, 20))
+        ) if films else ()
+        self.written(self.edges(Species.films, pairs), 'species-film links')
+        return ids
+
+    def generate_people(self, generator, count, planets, films, species):
+        """People are streamed in chunks together with their links"""
+        rnd = generator.random
+        planet_weights = generator.popularity(len(planets))
+        film_weights = generator.popularity(len(films))
+        species_weights = generator.popularity(len(species))
+
+        people, person_films, species_people = [], [], []
+        written = links = members = 0
+
+        def flush():
+            nonlocal written, links, members
+            written += copy_rows(Person, people)
+            links += self.edges(Person.films, person_films)
+            members += self.edges(Species.people, species_people)
+            people.clear()
+            person_films.clear()
+            species_people.clear()
+
+        for index in range(1, count + 1):
+            pk = generator.uuid()
+            people.append({
+                'id': pk,
+                'name': f'{generator.word()} {generator.word()} {index}',
+                'height': str(rnd.randint(60, 250)),
+                'mass': str(rnd.randint(20, 200)) if rnd.random() < 0.9 else 'unknown',
+                'hair_color': rnd.choice(COLORS),
+                'skin_color': rnd.choice(COLORS),
+                'eye_color': rnd.choice(COLORS),
+                'birth_year': f'{rnd.randint(1, 900)}BBY',
+                'gender': rnd.choice(GENDERS),
+                # One in ten has no known homeworld
+                'homeworld_id': generator.pick(planets, planet_weights)[0]
+                if planets and rnd.random() < 0.9 else None,
+            })
+            if films:
+                person_films.extend(
+                    (pk, film) for film in generator.pick(films, film_weights, generator.fan_out(2, 10))
+                )
+            if species and rnd.random() < 0.85:
+                species_people.append((generator.pick(species, species_weights)[0], pk))
+
+            if len(people) >= 10000:
+                flush()
+        flush()
+
+        self.written(written, 'people')
+        self.written(links, 'person-film links')
+        self.written(members, 'species-person links')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from starwars.importer import BATCH_SIZE
+from starwars.snapshot import SnapshotError, read_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Load a snapshot written by export_snapshot, merging it into existing data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Snapshot file to read')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Rows written per bulk statement',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            counts = read_snapshot(options['path'], options['chunk_size'])
+        except (OSError, SnapshotError) as e:
+            raise CommandError(f'Could not import snapshot: {e}')
+
+        for table, count in counts.items():
+            self.stdout.write(f'  Imported {count} {table} lines')
+
+        self.stdout.write(self.style.SUCCESS('Snapshot imported successfully!'))
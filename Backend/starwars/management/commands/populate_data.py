@@ -1,9 +1,37 @@
-from sys import stdout
-import requests
-from django.core.management.base import BaseCommand
+import json
+import time
+from contextlib import contextmanager
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from starwars.models import Person, Film, Planet, Species
-from datetime import datetime
+from starwars.importer import (
+    RELATIONS, build_index, clear_tables, film_row, finish_import, insert_edges,
+    person_row, planet_row, resolve_edges, species_row, sync_edges, sync_rows, upsert,
+)
+from starwars.models import ImportCheckpoint, Person, Film, Planet, Species
+from starwars.snapshot import read_snapshot
+from starwars.swapi import DEFAULT_BASE_URL, DEFAULT_WORKERS, SwapiClient, percentile
+
+
+# Base stages in load order: model, SWAPI resource, row builder
+STAGES = [
+    (Planet, 'planets', planet_row),
+    (Film, 'films', film_row),
+    (Person, 'people', person_row),
+    (Species, 'species', species_row),
+]
+
+RESOURCES = {model: resource for model, resource, _ in STAGES}
+
+
+def planet_index(model):
+    """The planets index the row builder of `model` resolves homeworlds with, if any"""
+    return build_index(Planet) if model in (Person, Species) else None
+
+
+def build_rows(model, row, records, planets=None):
+    if model in (Person, Species):
+        return [row(data, planets) for data in records]
+    return [row(data) for data in records]
 
 
 class Command(BaseCommand):
@@ -15,31 +43,83 @@ class Command(BaseCommand):
             action='store_true',
             help='Force repopulation even if data exists',
         )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an interrupted import from its last checkpoint',
+        )
+        parser.add_argument(
+            '--base-url',
+            default=DEFAULT_BASE_URL,
+            help='SWAPI root URL (e.g. a local mirror)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=DEFAULT_WORKERS,
+            help='Maximum concurrent HTTP requests',
+        )
+        parser.add_argument(
+            '--retries',
+            type=int,
+            default=3,
+            help='Retries per request on connection errors, 429 and 5xx',
+        )
+        parser.add_argument(
+            '--report',
+            metavar='PATH',
+            help='Write the per-stage progress metrics as JSON',
+        )
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Apply only the differences from SWAPI to existing data',
+        )
+        parser.add_argument(
+            '--from-snapshot',
+            metavar='PATH',
+            help='Load a snapshot written by export_snapshot instead of calling SWAPI',
+        )
 
     def handle(self, *args, **options):
-        if not options['force'] and Person.objects.exists():
+        if options['sync']:
+            self.sync(options['base_url'], options['workers'], options['retries'])
+            return
+
+        if not options['force'] and not options['resume'] and Person.objects.exists():
             self.stdout.write(
                 self.style.WARNING('Database already populated. Use --force to repopulate.')
             )
             return
 
         self.stdout.write('Starting data population...')
-        
+
+        if options['from_snapshot']:
+            self.populate_from_snapshot(options['from_snapshot'], options['force'])
+            return
+
+        self.client = SwapiClient(
+            options['base_url'], max_workers=options['workers'], retries=options['retries']
+        )
+        self.metrics = {}
         try:
-            with transaction.atomic():
-                if options['force']:
-                    self.stdout.write('Clearing existing data...')
-                    Person.objects.all().delete()
-                    Film.objects.all().delete()
-                    Planet.objects.all().delete()
-                    Species.objects.all().delete()
-
-                self.populate_planets()
-                self.populate_films()
-                self.populate_people()
-                self.populate_species()
-                self.link_relationships()
+            if not options['resume']:
+                with transaction.atomic():
+                    if options['force']:
+                        self.clear_data()
+                    ImportCheckpoint.objects.all().delete()
 
+            self.client.prefetch()
+            for model, resource, row in STAGES:
+                self.load_stage(model, resource, row)
+            self.link_relationships()
+
+            with self.stage('counters') as stage:
+                with transaction.atomic():
+                    finish_import()
+                stage['db_seconds'] = stage['seconds']
+
+            self.report(options['report'])
             self.stdout.write(
                 self.style.SUCCESS('Successfully populated database with Star Wars data!')
             )
@@ -47,183 +127,175 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.ERROR(f'Error populating data: {str(e)}')
             )
+            self.stdout.write('Run again with --resume to continue from the last checkpoint.')
+        finally:
+            self.client.close()
 
-    def fetch_all_pages(self, url):
-        """Fetch all pages from SWAPI endpoint"""
-        results = []
-        while url:
-            try:
-                response = requests.get(url, timeout=10, verify=False)
-                response.raise_for_status()
-                data = response.json()
-                results.extend(data['results'])
-                url = data['next']
-            except requests.RequestException as e:
-                self.stdout.write(
-                    self.style.ERROR(f'Error fetching {url}: {str(e)}')
-                )
-                break
-        return results
-
-    def populate_planets(self):
-        self.stdout.write('Populating planets...')
-        planets_data = self.fetch_all_pages('https://swapi.dev/api/planets/')
-        
-        for planet_data in planets_data:
-            planet, created = Planet.objects.get_or_create(
-                name=planet_data['name'],
-                defaults={
-                    'rotation_period': planet_data.get('rotation_period', ''),
-                    'orbital_period': planet_data.get('orbital_period', ''),
-                    'diameter': planet_data.get('diameter', ''),
-                    'climate': planet_data.get('climate', ''),
-                    'gravity': planet_data.get('gravity', ''),
-                    'terrain': planet_data.get('terrain', ''),
-                    'surface_water': planet_data.get('surface_water', ''),
-                    'population': planet_data.get('population', ''),
-                    'swapi_url': planet_data['url'],
-                }
-            )
-            if created:
-                self.stdout.write(f'  Created planet: {planet.name}')
-
-    def populate_films(self):
-        self.stdout.write('Populating films...')
-        films_data = self.fetch_all_pages('https://swapi.dev/api/films/')
-        
-        for film_data in films_data:
-            # Parse release date
-            release_date = datetime.strptime(film_data['release_date'], '%Y-%m-%d').date()
-            
-            film, created = Film.objects.get_or_create(
-                title=film_data['title'],
-                defaults={
-                    'episode_id': film_data['episode_id'],
-                    'opening_crawl': film_data['opening_crawl'],
-                    'director': film_data['director'],
-                    'producer': film_data['producer'],
-                    'release_date': release_date,
-                    'swapi_url': film_data['url'],
+    @contextmanager
+    def stage(self, name):
+        """Time one stage into self.metrics[name]"""
+        metrics = self.metrics.setdefault(name, {'rows': 0, 'seconds': 0.0, 'db_seconds': 0.0})
+        started = time.perf_counter()
+        try:
+            yield metrics
+        finally:
+            metrics['seconds'] += time.perf_counter() - started
+
+    def checkpoint(self, stage):
+        return ImportCheckpoint.objects.filter(stage=stage).first()
+
+    def load_stage(self, model, resource, row):
+        """Upsert `resource` page by page, committing a checkpoint with each page"""
+        checkpoint = self.checkpoint(resource)
+        if checkpoint and checkpoint.completed:
+            self.stdout.write(f'Skipping {resource} (already imported)')
+            return
+
+        start = checkpoint.page + 1 if checkpoint else 1
+        self.stdout.write(f'Populating {resource} from page {start}...')
+        # Planets are a finished stage by now: index them once, not per page
+        planets = planet_index(model)
+        with self.stage(resource) as stage:
+            for page, records in self.client.fetch_pages(resource, start):
+                started = time.perf_counter()
+                with transaction.atomic():
+                    stage['rows'] += upsert(model, build_rows(model, row, records, planets))
+                    ImportCheckpoint.objects.update_or_create(stage=resource, defaults={'page': page})
+                stage['db_seconds'] += time.perf_counter() - started
+
+            ImportCheckpoint.objects.update_or_create(stage=resource, defaults={'completed': True})
+
+    def link_relationships(self):
+        self.stdout.write('Linking relationships...')
+        indexes = {model: build_index(model) for model, _, _ in STAGES}
+
+        for model, relations in RELATIONS.items():
+            for descriptor, field in relations:
+                name = f'links:{model._meta.model_name}.{field}'
+                checkpoint = self.checkpoint(name)
+                if checkpoint and checkpoint.completed:
+                    continue
+
+                with self.stage(name) as stage:
+                    records = self.client.fetch_all(RESOURCES[model])
+                    edges = list(resolve_edges(
+                        records, indexes[model], indexes[descriptor.field.related_model], field
+                    ))
+                    started = time.perf_counter()
+                    with transaction.atomic():
+                        stage['rows'] += insert_edges(descriptor, edges)
+                        ImportCheckpoint.objects.update_or_create(stage=name, defaults={'completed': True})
+                    stage['db_seconds'] += time.perf_counter() - started
+
+        self.stdout.write('Relationships linked successfully!')
+
+    def report(self, path=None):
+        latencies = self.client.latencies
+        report = {
+            'stages': {
+                name: {
+                    **metrics,
+                    'rows_per_second': metrics['rows'] / metrics['seconds'] if metrics['seconds'] else 0.0,
                 }
+                for name, metrics in self.metrics.items()
+            },
+            'http': {
+                'requests': self.client.requests_made,
+                'latency_p50': percentile(latencies, 50),
+                'latency_p95': percentile(latencies, 95),
+                'latency_p99': percentile(latencies, 99),
+            },
+        }
+
+        for name, metrics in report['stages'].items():
+            self.stdout.write(
+                f"  {name}: {metrics['rows']} rows in {metrics['seconds']:.2f}s "
+                f"({metrics['rows_per_second']:.0f} rows/s), db writes {metrics['db_seconds']:.2f}s"
             )
-            if created:
-                self.stdout.write(f'  Created film: {film.title}')
-
-    def populate_people(self):
-        self.stdout.write('Populating people...')
-        people_data = self.fetch_all_pages('https://swapi.dev/api/people/')
-        
-        for person_data in people_data:
-            # Get homeworld if exists
-            homeworld = None
-            if person_data.get('homeworld'):
-                try:
-                    homeworld_response = requests.get(person_data['homeworld'], verify=False)
-                    homeworld_data = homeworld_response.json()
-                    homeworld = Planet.objects.get(name=homeworld_data['name'])
-                except (requests.RequestException, Planet.DoesNotExist):
-                    pass
-
-            person, created = Person.objects.get_or_create(
-                name=person_data['name'],
-                defaults={
-                    'height': person_data.get('height', ''),
-                    'mass': person_data.get('mass', ''),
-                    'hair_color': person_data.get('hair_color', ''),
-                    'skin_color': person_data.get('skin_color', ''),
-                    'eye_color': person_data.get('eye_color', ''),
-                    'birth_year': person_data.get('birth_year', ''),
-                    'gender': person_data.get('gender', ''),
-                    'homeworld': homeworld,
-                    'swapi_url': person_data['url'],
-                }
+        http = report['http']
+        self.stdout.write(
+            f"  HTTP: {http['requests']} requests, latency p50 {http['latency_p50'] * 1000:.0f}ms "
+            f"p95 {http['latency_p95'] * 1000:.0f}ms p99 {http['latency_p99'] * 1000:.0f}ms"
+        )
+
+        if path:
+            with open(path, 'w') as out:
+                json.dump(report, out, indent=2)
+
+    def sync(self, base_url, workers, retries):
+        """Diff SWAPI against the imported rows by swapi_url and apply the changes"""
+        self.stdout.write('Starting incremental sync...')
+
+        self.client = SwapiClient(base_url, max_workers=workers, retries=retries)
+        try:
+            self.client.prefetch()
+            # Records missing from a listing are deleted, so a failed fetch, an
+            # empty listing or one shorter than its count aborts the sync
+            records = {
+                model: self.client.fetch_all(resource) for model, resource, _ in STAGES
+            }
+            for model, resource, _ in STAGES:
+                listed = self.client.listed_count(resource)
+                if not records[model] or len(records[model]) != listed:
+                    raise CommandError(
+                        f'Refusing to sync {resource}: fetched {len(records[model])} of {listed} records'
+                    )
+
+            changed = 0
+            with transaction.atomic():
+                for model, resource, row in STAGES:
+                    rows = build_rows(model, row, records[model], planet_index(model))
+                    result = sync_rows(model, rows)
+                    changed += result.created + result.updated + result.deleted
+                    self.stdout.write(
+                        f'  {model._meta.verbose_name_plural.capitalize()}: {result.created} created, '
+                        f'{result.updated} updated, {result.deleted} deleted, {result.unchanged} unchanged'
+                    )
+
+                indexes = {model: build_index(model) for model, _, _ in STAGES}
+                for model, relations in RELATIONS.items():
+                    for descriptor, field in relations:
+                        edges = resolve_edges(
+                            records[model], indexes[model], indexes[descriptor.field.related_model], field
+                        )
+                        result = sync_edges(descriptor, edges)
+                        changed += result.added + result.removed
+                        self.stdout.write(
+                            f'  {model.__name__} {field}: {result.added} added, {result.removed} removed'
+                        )
+
+                if changed:
+                    finish_import()
+
+            self.stdout.write(
+                self.style.SUCCESS(f'Sync complete: {changed} changes applied')
             )
-            if created:
-                self.stdout.write(f'  Created person: {person.name}')
-
-    def populate_species(self):
-        self.stdout.write('Populating species...')
-        species_data = self.fetch_all_pages('https://swapi.dev/api/species/')
-        
-        for species_item in species_data:
-            # Get homeworld if exists
-            homeworld = None
-            if species_item.get('homeworld'):
-                try:
-                    homeworld_response = requests.get(species_item['homeworld'], verify=False)
-                    homeworld_data = homeworld_response.json()
-                    homeworld = Planet.objects.get(name=homeworld_data['name'])
-                except (requests.RequestException, Planet.DoesNotExist):
-                    pass
-
-            species, created = Species.objects.get_or_create(
-                name=species_item['name'],
-                defaults={
-                    'classification': species_item.get('classification', ''),
-                    'designation': species_item.get('designation', ''),
-                    'average_height': species_item.get('average_height', ''),
-                    'skin_colors': species_item.get('skin_colors', ''),
-                    'hair_colors': species_item.get('hair_colors', ''),
-                    'eye_colors': species_item.get('eye_colors', ''),
-                    'average_lifespan': species_item.get('average_lifespan', ''),
-                    'language': species_item.get('language', ''),
-                    'homeworld': homeworld,
-                    'swapi_url': species_item['url'],
-                }
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Error syncing data: {str(e)}')
             )
-            if created:
-                self.stdout.write(f'  Created species: {species.name}')
+        finally:
+            self.client.close()
 
-    def link_relationships(self):
-        self.stdout.write('Linking relationships...')
-        
-        # Link people to films
-        people_data = self.fetch_all_pages('https://swapi.dev/api/people/')
-        for person_data in people_data:
-            try:
-                person = Person.objects.get(name=person_data['name'])
-                for film_url in person_data['films']:
-                    film_response = requests.get(film_url, verify=False)
-                    film_data = film_response.json()
-                    film = Film.objects.get(title=film_data['title'])
-                    person.films.add(film)
-            except (Person.DoesNotExist, Film.DoesNotExist, requests.RequestException):
-                continue
-
-        # Link planets to films
-        films_data = self.fetch_all_pages('https://swapi.dev/api/films/')
-        for film_data in films_data:
-            try:
-                film = Film.objects.get(title=film_data['title'])
-                for planet_url in film_data['planets']:
-                    planet_response = requests.get(planet_url, verify=False)
-                    planet_data = planet_response.json()
-                    planet = Planet.objects.get(name=planet_data['name'])
-                    film.planets.add(planet)
-            except (Film.DoesNotExist, Planet.DoesNotExist, requests.RequestException):
-                continue
-
-        # Link species to people and films
-        species_data = self.fetch_all_pages('https://swapi.dev/api/species/')
-        for species_item in species_data:
-            try:
-                species = Species.objects.get(name=species_item['name'])
-                
-                # Link to people
-                for person_url in species_item['people']:
-                    person_response = requests.get(person_url, verify=False)
-                    person_data = person_response.json()
-                    person = Person.objects.get(name=person_data['name'])
-                    species.people.add(person)
-                
-                # Link to films
-                for film_url in species_item['films']:
-                    film_response = requests.get(film_url, verify=False)
-                    film_data = film_response.json()
-                    film = Film.objects.get(title=film_data['title'])
-                    species.films.add(film)
-                    
-            except (Species.DoesNotExist, Person.DoesNotExist, Film.DoesNotExist, requests.RequestException):
-                continue
-
-        self.stdout.write('Relationships linked successfully!')
\ No newline at end of file
+    def clear_data(self):
+        self.stdout.write('Clearing existing data...')
+        clear_tables()
+        finish_import()
+
+    def populate_from_snapshot(self, path, force):
+        try:
+            with transaction.atomic():
+                if force:
+                    self.clear_data()
+                counts = read_snapshot(path)
+
+            for table, count in counts.items():
+                self.stdout.write(f'  Imported {count} {table} lines')
+
+            self.stdout.write(
+                self.style.SUCCESS('Successfully populated database from snapshot!')
+            )
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Error populating data: {str(e)}')
+            )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from starwars.caching import bump_versions
+from starwars.counters import COUNTERS, refresh_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored relation counters (film_count, resident_count, ...) in bulk'
+
+    def handle(self, *args, **options):
+        models = list(dict.fromkeys(counter.model for counter in COUNTERS))
+
+        with transaction.atomic():
+            for model in models:
+                updated = refresh_counters(model)
+                self.stdout.write(f'  Reconciled {updated} {model._meta.verbose_name_plural}')
+
+        # Bulk updates send no signals, so invalidate cached responses here
+        bump_versions(*models)
+
+        self.stdout.write(self.style.SUCCESS('Counters reconciled successfully!'))
@@ -0,0 +1,110 @@
+"""
+Numeric shadows of the SWAPI measurement strings.
+
+SWAPI gives measurements as text ("1,358", "unknown", "n/a"). Each field
+listed here also has a nullable, indexed numeric column `<field>_value`,
+filled on save (signals.py), by the bulk import paths (importer.py) and
+for existing rows by migration 0006, so range filters and ordering run
+in SQL. Unparseable values, and integers outside their column's range,
+are NULL and sort last either way.
+"""
+import math
+
+from django.db.backends.base.operations import BaseDatabaseOperations
+from django.db.models import Q
+
+from .models import Person, Planet
+
+# model -> {measurement field: numeric type}
+NUMERIC_FIELDS = {
+    Person: {'height': int, 'mass': float},
+    Planet: {
+        'rotation_period': int,
+        'orbital_period': int,
+        'diameter': int,
+        'surface_water': float,
+        'population': int,
+    },
+}
+
+
+def value_field(field):
+    return f'{field}_value'
+
+
+# model -> {integer measurement field: (min, max) of its column}, the same
+# on every backend so stored values do not depend on the database
+COLUMN_RANGES = {
+    model: {
+        field: BaseDatabaseOperations.integer_field_ranges[
+            model._meta.get_field(value_field(field)).get_internal_type()
+        ]
+        for field, cast in fields.items() if cast is int
+    }
+    for model, fields in NUMERIC_FIELDS.items()
+}
+
+
+def parse_number(text, cast=float, bounds=None):
+    """`text` as a number of type `cast`, None when it is not one or is outside `bounds`"""
+    try:
+        number = float(str(text).replace(',', '').strip())
+    except ValueError:
+        return None
+    if not math.isfinite(number):
+        return None
+    if cast is int:
+        number = round(number)
+    if bounds is not None and not bounds[0] <= number <= bounds[1]:
+        return None
+    return number
+
+
+def numeric_values(model, row):
+    """Shadow column values for the measurement fields present in `row`"""
+    ranges = COLUMN_RANGES.get(model, {})
+    return {
+        value_field(field): parse_number(row[field], cast, ranges.get(field))
+        for field, cast in NUMERIC_FIELDS.get(model, {}).items()
+        if field in row
+    }
+
+
+def with_numeric_values(model, row):
+    return {**row, **numeric_values(model, row)} if model in NUMERIC_FIELDS else row
+
+
+def range_filter(model, params):
+    """
+    Q for the `<field>_min`/`<field>_max` bounds (inclusive) in `params`;
+    raises ValueError for a bound that is not a number
+    """
+    condition = Q()
+    for field in NUMERIC_FIELDS[model]:
+        for suffix, lookup in (('min', 'gte'), ('max', 'lte')):
+            bound = params.get(f'{field}_{suffix}')
+            if bound is None or bound == '':
+                continue
+            number = parse_number(bound)
+            if number is None:
+                raise ValueError(f"Invalid value for '{field}_{suffix}': {bound}")
+            condition &= Q(**{f'{value_field(field)}__{lookup}': number})
+    return condition
+
+
+def order_keys(model, order=None):
+    """
+    Sort keys for `order` ("mass", "-height", "name"...; the model ordering
+    by default), ending in the UUID so every row has a distinct key
+    """
+    default = [*model._meta.ordering, 'id']
+    if not order:
+        return default
+    descending, field = order.startswith('-'), order.lstrip('-')
+    sign = '-' if descending else ''
+    if field in NUMERIC_FIELDS.get(model, {}):
+        return [f'{sign}{value_field(field)}', *default]
+    if field in model._meta.ordering:
+        return [f'{sign}{key}' for key in default]
+    choices = [*model._meta.ordering, *NUMERIC_FIELDS.get(model, {})]
+    raise ValueError(f"Invalid order '{order}'; use one of {', '.join(choices)}, optionally prefixed by '-'")
@@ -0,0 +1,265 @@
+"""
+Prometheus-style request metrics.
+
+Each worker process aggregates its counters and histogram buckets in
+memory and, at most every METRICS_FLUSH_INTERVAL seconds, adds the deltas
+to shared counters in the cache (Redis INCRBY, atomic across workers and
+hosts). Series names are kept in a registry key so the metrics view reads
+every counter with one get_many and renders the text exposition format.
+
+Collected: latency histograms per route and per GraphQL operation name,
+SQL queries per request, requests by status, errors caught by the REST
+views, database connections opened, the response/result cache hits and
+misses (caching.py), and on PostgreSQL the server's connections by state.
+"""
+import bisect
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .caching import KEY_PREFIX, cache_stats, incr
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_KEY = f'{KEY_PREFIX}:metrics:series'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Histogram sums are stored as integers in millionths
+SUM_SCALE = 1000000
+
+# Operation names come from clients; further names are reported as "other"
+MAX_OPERATION_NAMES = 100
+
+HISTOGRAMS = {
+    'starwars_http_request_duration_seconds': ('Request latency by route', LATENCY_BUCKETS),
+    'starwars_graphql_operation_duration_seconds': ('GraphQL latency by operation name', LATENCY_BUCKETS),
+    'starwars_http_request_sql_queries': ('SQL queries per request by route', QUERY_BUCKETS),
+}
+
+COUNTERS = {
+    'starwars_http_requests_total': 'Requests by route, method and status',
+    'starwars_view_errors_total': 'Exceptions caught by the REST views',
+    'starwars_db_connections_created_total': 'Database connections opened',
+}
+
+
+def series(name, labels):
+    return json.dumps([name, sorted(labels.items())], separators=(',', ':'))
+
+
+def series_key(name):
+    return f'{KEY_PREFIX}:metrics:{hashlib.sha256(name.encode()).hexdigest()[:32]}'
+
+
+class Metrics:
+    """Per-process deltas, flushed to the shared counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = Counter()
+        self._unconfirmed = set()
+        self._operations = set()
+        self._last_flush = time.monotonic()
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self._pending[series(name, labels)] += value
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        index = bisect.bisect_left(buckets, value)
+        le = str(buckets[index]) if index < len(buckets) else '+Inf'
+        with self._lock:
+            self._pending[series(f'{name}_bucket', {**labels, 'le': le})] += 1
+            self._pending[series(f'{name}_sum', labels)] += round(value * SUM_SCALE)
+
+    def operation_label(self, name):
+        name = (name or 'anonymous')[:64]
+        with self._lock:
+            if name not in self._operations:
+                if len(self._operations) >= MAX_OPERATION_NAMES:
+                    return 'other'
+                self._operations.add(name)
+        return name
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        if not self._flush_lock.acquire(blocking=False):
+            return  # another thread of this worker is flushing
+        try:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+                self._last_flush = time.monotonic()
+            try:
+                for name, delta in pending.items():
+                    if delta:
+                        incr(series_key(name), delta)
+                self.register(set(pending))
+            except Exception:
+                logger.exception('Could not flush metrics')
+        finally:
+            self._flush_lock.release()
+
+    def register(self, names):
+        """
+        Add series names to the shared registry (also after a cache flush).
+        Two workers may write it at once and lose a name, so names written
+        are re-checked on the next flush until they are seen in the registry.
+        """
+        self._unconfirmed |= names
+        if not self._unconfirmed:
+            return
+        registry = set(cache.get(REGISTRY_KEY) or [])
+        missing = self._unconfirmed - registry
+        if missing:
+            cache.set(REGISTRY_KEY, sorted(registry | missing), timeout=None)
+        self._unconfirmed = missing
+
+
+metrics = Metrics()
+
+
+def count_error(view, error):
+    """Count an exception caught (and turned into a 500) by a REST view"""
+    metrics.inc('starwars_view_errors_total', {'view': view, 'exception': type(error).__name__})
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    metrics.inc('starwars_db_connections_created_total', {'vendor': connection.vendor})
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        labels = {'route': match.route if match else 'unmatched', 'method': request.method}
+        metrics.observe('starwars_http_request_duration_seconds', labels, elapsed)
+        metrics.observe('starwars_http_request_sql_queries', labels, queries.count)
+        metrics.inc('starwars_http_requests_total', {**labels, 'status': str(response.status_code)})
+        if hasattr(request, 'graphql_operation'):
+            metrics.observe(
+                'starwars_graphql_operation_duration_seconds',
+                {'operation': metrics.operation_label(request.graphql_operation)},
+                elapsed,
+            )
+        metrics.maybe_flush()
+        return response
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels) + '}'
+
+
+def shared_values():
+    """{(name, labels): value} of every series flushed by any worker"""
+    names = cache.get(REGISTRY_KEY) or []
+    keys = {series_key(name): name for name in names}
+    values = cache.get_many(list(keys))
+    result = {}
+    for key, value in values.items():
+        name, labels = json.loads(keys[key])
+        result[name, tuple(tuple(label) for label in labels)] = value
+    return result
+
+
+def database_connections():
+    """Server connections to this database by state (PostgreSQL only)"""
+    if connection.vendor != 'postgresql':
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT COALESCE(state, %s), COUNT(*) FROM pg_stat_activity '
+            'WHERE datname = current_database() GROUP BY 1',
+            ['unknown'],
+        )
+        return dict(cursor.fetchall())
+
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    metrics.flush()
+    values = shared_values()
+    lines = []
+
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        counts, sums = defaultdict(dict), {}
+        for (series_name, labels), value in values.items():
+            if series_name == f'{name}_bucket':
+                labels = dict(labels)
+                le = labels.pop('le')
+                counts[tuple(sorted(labels.items()))][le] = value
+            elif series_name == f'{name}_sum':
+                sums[labels] = value
+        for labels in sorted(counts):
+            total = 0
+            for le in [*map(str, buckets), '+Inf']:
+                total += counts[labels].get(le, 0)
+                lines.append(f"{name}_bucket{format_labels([*labels, ('le', le)])} {total}")
+            lines.append(f'{name}_sum{format_labels(labels)} {sums.get(labels, 0) / SUM_SCALE}')
+            lines.append(f'{name}_count{format_labels(labels)} {total}')
+
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (series_name, labels), value in sorted(values.items()):
+            if series_name == name:
+                lines.append(f'{name}{format_labels(labels)} {value}')
+
+    stats = cache_stats()
+    for outcome in ('hits', 'misses'):
+        name = f'starwars_cache_{outcome}_total'
+        lines += [
+            f'# HELP {name} Response and GraphQL result cache {outcome}',
+            f'# TYPE {name} counter',
+            f'{name} {stats[outcome]}',
+        ]
+
+    states = database_connections()
+    if states:
+        name = 'starwars_db_server_connections'
+        lines += [f'# HELP {name} Server connections to this database by state', f'# TYPE {name} gauge']
+        lines += [f'{name}{format_labels([("state", state)])} {count}' for state, count in sorted(states.items())]
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:09
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_rows(source, key):
+    rows = (
+        source.objects
+        .filter(**{key: OuterRef('pk')})
+        .order_by()
+        .values(key)
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    Person = apps.get_model('starwars', 'Person')
+    Film = apps.get_model('starwars', 'Film')
+    Planet = apps.get_model('starwars', 'Planet')
+    Species = apps.get_model('starwars', 'Species')
+
+    Person.objects.update(film_count=count_rows(Person.films.through, 'person'))
+    Film.objects.update(
+        character_count=count_rows(Person.films.through, 'film'),
+        planet_count=count_rows(Film.planets.through, 'film'),
+    )
+    Planet.objects.update(
+        resident_count=count_rows(Person, 'homeworld'),
+        film_count=count_rows(Film.planets.through, 'planet'),
+    )
+    Species.objects.update(
+        people_count=count_rows(Species.people.through, 'species'),
+        film_count=count_rows(Species.films.through, 'species'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starwars', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='film',
+            name='character_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='film',
+            name='planet_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='film_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='planet',
+            name='film_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='planet',
+            name='resident_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='species',
+            name='film_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='species',
+            name='people_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
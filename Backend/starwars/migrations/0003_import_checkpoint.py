@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starwars', '0002_relation_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=50, unique=True)),
+                ('page', models.PositiveIntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('edited', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['stage'],
+            },
+        ),
+    ]
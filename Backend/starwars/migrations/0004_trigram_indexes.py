@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:10
+
+from django.db import migrations
+
+# (table, column) pairs searched by starwars/search.py
+TRIGRAM_COLUMNS = [
+    ('starwars_person', 'name'),
+    ('starwars_planet', 'name'),
+    ('starwars_film', 'title'),
+    ('starwars_species', 'name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # pg_trgm GIN indexes are PostgreSQL-only; other databases keep scanning
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm ON {table} USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starwars', '0003_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:40
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Weighted columns of each table's full-text document; starwars/search.py
+# (TEXT_DOCUMENTS) lists the same columns for highlighting
+SEARCH_DOCUMENTS = {
+    'starwars_film': [('title', 'A'), ('director', 'B'), ('producer', 'B'), ('opening_crawl', 'C')],
+    'starwars_planet': [('name', 'A'), ('climate', 'B'), ('terrain', 'B')],
+    'starwars_species': [('name', 'A'), ('classification', 'B'), ('language', 'B')],
+}
+
+
+def vector_sql(columns, row=''):
+    return ' || '.join(
+        f"setweight(to_tsvector('english', coalesce({row}{column}, '')), '{weight}')"
+        for column, weight in columns
+    )
+
+
+def create_search_triggers(apps, schema_editor):
+    # tsvector triggers and GIN indexes are PostgreSQL-only; elsewhere the
+    # column stays NULL and search.py falls back to substring matching
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, columns in SEARCH_DOCUMENTS.items():
+        schema_editor.execute(f"""
+            CREATE OR REPLACE FUNCTION {table}_search_vector() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := {vector_sql(columns, 'NEW.')};
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_search_vector "
+            f"BEFORE INSERT OR UPDATE OF {', '.join(column for column, _ in columns)} ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION {table}_search_vector()"
+        )
+        schema_editor.execute(f'UPDATE {table} SET search_vector = {vector_sql(columns)}')
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_search_vector_gin ON {table} USING gin (search_vector)'
+        )
+
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in SEARCH_DOCUMENTS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_search_vector_gin')
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_search_vector ON {table}')
+        schema_editor.execute(f'DROP FUNCTION IF EXISTS {table}_search_vector()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starwars', '0004_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='film',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='planet',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='species',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:15
+
+import math
+
+from django.db import migrations, models
+from django.db.backends.base.operations import BaseDatabaseOperations
+
+# Measurement fields and their numeric types, as in starwars/measurements.py
+NUMERIC_FIELDS = {
+    'person': {'height': int, 'mass': float},
+    'planet': {
+        'rotation_period': int,
+        'orbital_period': int,
+        'diameter': int,
+        'surface_water': float,
+        'population': int,
+    },
+}
+
+BATCH_SIZE = 1000
+
+
+def parse_number(text, cast, bounds):
+    try:
+        number = float(str(text).replace(',', '').strip())
+    except ValueError:
+        return None
+    if not math.isfinite(number):
+        return None
+    if cast is int:
+        number = round(number)
+    if bounds is not None and not bounds[0] <= number <= bounds[1]:
+        return None
+    return number
+
+
+def backfill_values(apps, schema_editor):
+    for model_name, fields in NUMERIC_FIELDS.items():
+        model = apps.get_model('starwars', model_name)
+        value_fields = [f'{field}_value' for field in fields]
+        # Integers outside their column's range are stored as NULL
+        ranges = {
+            field: BaseDatabaseOperations.integer_field_ranges.get(
+                model._meta.get_field(f'{field}_value').get_internal_type()
+            )
+            for field in fields
+        }
+        batch = []
+        for row in model.objects.only('pk', *fields).iterator(chunk_size=BATCH_SIZE):
+            for field, cast in fields.items():
+                setattr(row, f'{field}_value', parse_number(getattr(row, field), cast, ranges[field]))
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                model.objects.bulk_update(batch, value_fields)
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, value_fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starwars', '0005_full_text_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='height_value',
+            field=models.IntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='mass_value',
+            field=models.FloatField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='planet',
+            name='diameter_value',
+            field=models.IntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='planet',
+            name='orbital_period_value',
+            field=models.IntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='planet',
+            name='population_value',
+            field=models.BigIntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='planet',
+            name='rotation_period_value',
+            field=models.IntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='planet',
+            name='surface_water_value',
+            field=models.FloatField(db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_values, migrations.RunPython.noop),
+    ]
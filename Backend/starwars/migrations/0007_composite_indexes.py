@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:50
+
+from django.db import migrations, models
+
+# Reverse (target, source) indexes on the auto-created M2M through tables,
+# as (model, M2M field, through fields). Django only creates the unique
+# (source, target) pair and one index per column, so joins starting from
+# the target side (a film's characters, a planet's films...) read the
+# table rows; these serve them from the index.
+#
+# Auto-created through models have no Meta of their own in the migration
+# state, so these cannot be AddIndex operations: they are created and
+# dropped through the schema editor, and makemigrations never sees them.
+REVERSE_THROUGH_INDEXES = [
+    ('person', 'films', ['film', 'person']),
+    ('film', 'planets', ['planet', 'film']),
+    ('species', 'people', ['person', 'species']),
+    ('species', 'films', ['film', 'species']),
+]
+
+
+def through_indexes(apps):
+    for model_name, field_name, fields in REVERSE_THROUGH_INDEXES:
+        through = apps.get_model('starwars', model_name)._meta.get_field(field_name).remote_field.through
+        columns = [through._meta.get_field(field).column for field in fields]
+        yield through, models.Index(fields=fields, name=f"{through._meta.db_table}_{'_'.join(columns)}")
+
+
+def add_through_indexes(apps, schema_editor):
+    for through, index in through_indexes(apps):
+        schema_editor.add_index(through, index)
+
+
+def remove_through_indexes(apps, schema_editor):
+    for through, index in through_indexes(apps):
+        schema_editor.remove_index(through, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starwars', '0006_numeric_measurements'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['gender', 'name'], name='starwars_person_gender_name'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['homeworld', 'name'], name='starwars_person_homeworld_name'),
+        ),
+        migrations.RunPython(add_through_indexes, remove_through_indexes),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starwars', '0007_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='species',
+            index=models.Index(fields=['classification', 'name'], name='starwars_species_class_name'),
+        ),
+        migrations.AddIndex(
+            model_name='species',
+            index=models.Index(fields=['designation', 'name'], name='starwars_species_desig_name'),
+        ),
+    ]
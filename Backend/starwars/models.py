@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.core.validators import URLValidator
 import uuid
@@ -14,7 +15,17 @@ class Planet(models.Model):
     terrain = models.CharField(max_length=100, blank=True, null=True)
     surface_water = models.CharField(max_length=20, blank=True, null=True)
     population = models.CharField(max_length=50, blank=True, null=True)
+    # Numeric shadows of the measurements above, NULL when unknown (see measurements.py)
+    rotation_period_value = models.IntegerField(null=True, editable=False, db_index=True)
+    orbital_period_value = models.IntegerField(null=True, editable=False, db_index=True)
+    diameter_value = models.IntegerField(null=True, editable=False, db_index=True)
+    surface_water_value = models.FloatField(null=True, editable=False, db_index=True)
+    population_value = models.BigIntegerField(null=True, editable=False, db_index=True)
+    resident_count = models.PositiveIntegerField(default=0, editable=False)
+    film_count = models.PositiveIntegerField(default=0, editable=False)
     swapi_url = models.URLField(blank=True, null=True, validators=[URLValidator()])
+    # Full-text document, maintained by a database trigger (PostgreSQL only)
+    search_vector = SearchVectorField(null=True, editable=False)
     created = models.DateTimeField(auto_now_add=True)
     edited = models.DateTimeField(auto_now=True)
 
@@ -34,7 +45,11 @@ class Film(models.Model):
     producer = models.CharField(max_length=200)
     release_date = models.DateField()
     planets = models.ManyToManyField(Planet, related_name='films', blank=True)
+    character_count = models.PositiveIntegerField(default=0, editable=False)
+    planet_count = models.PositiveIntegerField(default=0, editable=False)
     swapi_url = models.URLField(blank=True, null=True, validators=[URLValidator()])
+    # Full-text document, maintained by a database trigger (PostgreSQL only)
+    search_vector = SearchVectorField(null=True, editable=False)
     created = models.DateTimeField(auto_now_add=True)
     edited = models.DateTimeField(auto_now=True)
 
@@ -59,6 +74,9 @@ class Person(models.Model):
     name = models.CharField(max_length=100, unique=True)
     height = models.CharField(max_length=10, blank=True, null=True)
     mass = models.CharField(max_length=10, blank=True, null=True)
+    # Numeric shadows of height and mass, NULL when unknown (see measurements.py)
+    height_value = models.IntegerField(null=True, editable=False, db_index=True)
+    mass_value = models.FloatField(null=True, editable=False, db_index=True)
     hair_color = models.CharField(max_length=50, blank=True, null=True)
     skin_color = models.CharField(max_length=50, blank=True, null=True)
     eye_color = models.CharField(max_length=50, blank=True, null=True)
@@ -66,20 +84,23 @@ class Person(models.Model):
     gender = models.CharField(max_length=15, choices=GENDER_CHOICES, blank=True, null=True)
     homeworld = models.ForeignKey(Planet, on_delete=models.SET_NULL, null=True, blank=True, related_name='residents')
     films = models.ManyToManyField(Film, related_name='characters', blank=True)
+    film_count = models.PositiveIntegerField(default=0, editable=False)
     swapi_url = models.URLField(blank=True, null=True, validators=[URLValidator()])
     created = models.DateTimeField(auto_now_add=True)
     edited = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Filter-then-order-by-name lists: admin gender/homeworld filters,
+            # a planet's residents
+            models.Index(fields=['gender', 'name'], name='starwars_person_gender_name'),
+            models.Index(fields=['homeworld', 'name'], name='starwars_person_homeworld_name'),
+        ]
 
     def __str__(self):
         return self.name
 
-    @property
-    def film_count(self):
-        return self.films.count()
-
 
 class Species(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -95,13 +116,36 @@ class Species(models.Model):
     language = models.CharField(max_length=100, blank=True, null=True)
     people = models.ManyToManyField(Person, related_name='species', blank=True)
     films = models.ManyToManyField(Film, related_name='species', blank=True)
+    people_count = models.PositiveIntegerField(default=0, editable=False)
+    film_count = models.PositiveIntegerField(default=0, editable=False)
     swapi_url = models.URLField(blank=True, null=True, validators=[URLValidator()])
+    # Full-text document, maintained by a database trigger (PostgreSQL only)
+    search_vector = SearchVectorField(null=True, editable=False)
     created = models.DateTimeField(auto_now_add=True)
     edited = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['name']
         verbose_name_plural = "Species"
+        indexes = [
+            # Admin classification/designation filters, ordered by name
+            models.Index(fields=['classification', 'name'], name='starwars_species_class_name'),
+            models.Index(fields=['designation', 'name'], name='starwars_species_desig_name'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ImportCheckpoint(models.Model):
+    """Last committed page of one populate_data stage, for --resume"""
+    stage = models.CharField(max_length=50, unique=True)
+    page = models.PositiveIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    edited = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['stage']
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f'{self.stage} (page {self.page})'
@@ -0,0 +1,175 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are fetched with a WHERE on the ordering columns instead of
+OFFSET, so page N costs the same as page 1, and no COUNT(*) is needed
+to know whether there is a next page.
+
+Keys are field names, prefixed with "-" to sort descending. NULLs of
+nullable keys (the numeric measurement columns) sort last either way.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class InvalidPage(ValueError):
+    pass
+
+
+def page_params(params, default_size=20, max_size=100):
+    """`page` and `page_size` of a query string as positive ints, `page_size` capped at `max_size`"""
+    values = []
+    for name, default in (('page', 1), ('page_size', default_size)):
+        value = params.get(name, default)
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            number = 0
+        if number < 1:
+            raise InvalidPage(f"'{name}' must be a positive integer, got '{value}'")
+        values.append(number)
+    page, page_size = values
+    return page, min(page_size, max_size)
+
+
+def encode_key(values):
+    """Opaque token for the sort-key `values` of a row"""
+    payload = json.dumps([None if value is None else str(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_key(cursor, size):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor}') from e
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor(f'Invalid cursor: {cursor}')
+    return values
+
+
+def encode_cursor(values, direction):
+    return encode_key([direction, *values])
+
+
+def decode_cursor(cursor, size):
+    direction, *values = decode_key(cursor, size + 1)
+    if direction not in ('next', 'previous'):
+        raise InvalidCursor(f'Invalid cursor: {cursor}')
+    return direction, values
+
+
+def field_name(key):
+    return key.lstrip('-')
+
+
+def key_values(model, keys, values):
+    """Decoded cursor `values` as values of their key fields; InvalidCursor when one is not"""
+    converted = []
+    for key, value in zip(keys, values):
+        field = model._meta.get_field(field_name(key))
+        if value is None:
+            converted.append(None)
+            continue
+        try:
+            converted.append(field.to_python(value))
+        except (ValidationError, ValueError, TypeError) as e:
+            raise InvalidCursor(f"Invalid cursor value for '{field.name}': {value}") from e
+    return converted
+
+
+def nullable_keys(model, keys):
+    return {field_name(key) for key in keys if model._meta.get_field(field_name(key)).null}
+
+
+def row_key(row, keys):
+    if isinstance(row, dict):
+        return [row[field_name(key)] for key in keys]
+    return [getattr(row, field_name(key)) for key in keys]
+
+
+def keyset_ordering(keys, forward=True, nullable=()):
+    """ORDER BY for `keys`, or for the reverse order when not `forward`"""
+    ordering = []
+    for key in keys:
+        name = field_name(key)
+        descending = key.startswith('-') == forward
+        if name in nullable:
+            nulls = {'nulls_last': True} if forward else {'nulls_first': True}
+            ordering.append(F(name).desc(**nulls) if descending else F(name).asc(**nulls))
+        else:
+            ordering.append(f'-{name}' if descending else name)
+    return ordering
+
+
+def keyset_filter(keys, values, forward, nullable=()):
+    """WHERE clause selecting rows strictly after (or before) `values`"""
+    condition = Q()
+    for i, key in enumerate(keys):
+        name, value = field_name(key), values[i]
+        if value is None:
+            if forward:
+                continue  # nothing sorts after NULL
+            beyond = Q(**{f'{name}__isnull': False})
+        else:
+            lookup = 'gt' if key.startswith('-') != forward else 'lt'
+            beyond = Q(**{f'{name}__{lookup}': value})
+            if forward and name in nullable:
+                beyond |= Q(**{f'{name}__isnull': True})
+        equal = [
+            Q(**{f'{field_name(prior)}__isnull': True}) if values[j] is None
+            else Q(**{field_name(prior): values[j]})
+            for j, prior in enumerate(keys[:i])
+        ]
+        condition |= Q(*equal) & beyond
+    return condition
+
+
+class KeysetPage:
+    """
+    One page of `queryset` ordered by `keys` (the last key must be unique).
+    Works on model and .values() querysets alike.
+    """
+
+    def __init__(self, queryset, keys, page_size, cursor=None):
+        self.keys = keys
+        direction, values = decode_cursor(cursor, len(keys)) if cursor else ('next', None)
+        if values is not None:
+            values = key_values(queryset.model, keys, values)
+        forward = direction == 'next'
+        nullable = nullable_keys(queryset.model, keys)
+
+        queryset = queryset.order_by(*keyset_ordering(keys, forward, nullable))
+        if values is not None:
+            queryset = queryset.filter(keyset_filter(keys, values, forward, nullable))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if not forward:
+            rows.reverse()
+
+        self.object_list = rows
+        self.has_next = has_more if forward else True
+        self.has_previous = values is not None if forward else has_more
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.object_list:
+            return encode_cursor(row_key(self.object_list[-1], self.keys), 'next')
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.object_list:
+            return encode_cursor(row_key(self.object_list[0], self.keys), 'previous')
+
+    def __iter__(self):
+        return iter(self.object_list)
@@ -0,0 +1,195 @@
+"""
+Opt-in per-request profiling.
+
+ProfilingMiddleware profiles every request when PROFILING is set, or a
+single request sending the `X-Profile` header when PROFILING_ALLOW_HEADER
+is on (the default in DEBUG). Otherwise it only reads two settings and
+hands the request on.
+
+A profiled request records every SQL statement with its duration, and
+flags statements run more than once with the same parameters (duplicates)
+or with different ones (similar, the N+1 signature). Serializer time net
+of the SQL it triggers is timed through @profiled. The totals go in a
+`Server-Timing` header. GraphQL requests also get Apollo-style resolver
+tracing, and the field paths whose resolvers kept querying, in the
+response `extensions`.
+"""
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+# Same statement (different parameters) run this many times is reported;
+# with the loaders a field path should query at most once per request
+SIMILAR_THRESHOLD = 3
+
+_current = ContextVar('starwars_profile', default=None)
+
+
+def current_profile():
+    """Profile of the request being handled, None when not profiling"""
+    return _current.get()
+
+
+def profiling_enabled(request):
+    if settings.PROFILING:
+        return True
+    return settings.PROFILING_ALLOW_HEADER and request.META.get(PROFILE_HEADER, '') not in ('', '0')
+
+
+class Profile:
+    """SQL, span and resolver timings of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []  # (sql, params, ms)
+        self.db_ms = 0.0
+        self.spans = defaultdict(float)
+        self.resolvers = []
+        self.resolver_queries = defaultdict(list)
+        self.tracing_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            self.db_ms += duration
+            self.queries.append((sql, repr(params), duration))
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def duplicates(self):
+        """Statements run more than once with identical parameters"""
+        counts = Counter((sql, params) for sql, params, _ in self.queries)
+        return [
+            {'sql': sql, 'count': count}
+            for (sql, _), count in counts.items() if count > 1
+        ]
+
+    def similar(self):
+        """Statements run SIMILAR_THRESHOLD+ times with differing parameters"""
+        variants = defaultdict(set)
+        for sql, params, _ in self.queries:
+            variants[sql].add(params)
+        return [
+            {'sql': sql, 'count': len(params)}
+            for sql, params in variants.items() if len(params) >= SIMILAR_THRESHOLD
+        ]
+
+    def server_timing(self):
+        metrics = [
+            f'total;dur={self.elapsed_ms():.2f}',
+            f'db;dur={self.db_ms:.2f};desc="{len(self.queries)} queries"',
+        ]
+        metrics += [f'{name};dur={ms:.2f}' for name, ms in self.spans.items()]
+        duplicates, similar = self.duplicates(), self.similar()
+        if duplicates:
+            metrics.append(f'duplicates;desc="{sum(d["count"] - 1 for d in duplicates)} repeated queries"')
+        if similar:
+            metrics.append(f'similar;desc="{len(similar)} statements run per row"')
+        return ', '.join(metrics)
+
+    def resolver_middleware(self):
+        """Graphene middleware tracing this request's resolvers"""
+        self.tracing_started = datetime.now(timezone.utc), time.perf_counter_ns()
+        return ResolverTracer(self)
+
+    def graphql_extensions(self):
+        start_time, start_ns = self.tracing_started
+        duration = time.perf_counter_ns() - start_ns
+        n_plus_one = [
+            {'path': path, 'resolvers': len(counts), 'queries': sum(counts)}
+            for path, counts in self.resolver_queries.items() if len(counts) > 1
+        ]
+        return {
+            'tracing': {
+                'version': 1,
+                'startTime': start_time.isoformat(),
+                'endTime': datetime.now(timezone.utc).isoformat(),
+                'duration': duration,
+                'execution': {'resolvers': self.resolvers},
+            },
+            'profile': {
+                'queries': len(self.queries),
+                'dbMs': round(self.db_ms, 3),
+                'duplicateQueries': self.duplicates(),
+                'similarQueries': self.similar(),
+                'nPlusOne': n_plus_one,
+            },
+        }
+
+
+class ResolverTracer:
+    """Records each resolver's timing and the SQL issued while it ran"""
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def resolve(self, next, root, info, **args):
+        profile = self.profile
+        queries = len(profile.queries)
+        started = time.perf_counter_ns()
+        try:
+            return next(root, info, **args)
+        finally:
+            path = info.path.as_list()
+            profile.resolvers.append({
+                'path': path,
+                'parentType': str(info.parent_type),
+                'fieldName': info.field_name,
+                'returnType': str(info.return_type),
+                'startOffset': started - profile.tracing_started[1],
+                'duration': time.perf_counter_ns() - started,
+            })
+            issued = len(profile.queries) - queries
+            if issued:
+                # List indexes dropped: one entry per field, whatever the row
+                field = '.'.join(str(key) for key in path if not isinstance(key, int))
+                profile.resolver_queries[field].append(issued)
+
+
+def profiled(span):
+    """Time the decorated function into `span` of the current profile, net of SQL"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return func(*args, **kwargs)
+            started, db_ms = time.perf_counter(), profile.db_ms
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                profile.spans[span] += elapsed - (profile.db_ms - db_ms)
+        return wrapper
+    return decorator
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling_enabled(request):
+            return self.get_response(request)
+
+        profile = Profile()
+        token = _current.set(profile)
+        try:
+            with connection.execute_wrapper(profile):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        response['Server-Timing'] = profile.server_timing()
+        return response
@@ -2,8 +2,169 @@ import graphene
 from graphene import relay, ObjectType, String, Int, Field, List
 from graphene_django import DjangoObjectType
 from graphene_django import DjangoConnectionField
-from django.db.models import Q
+from graphene_django.utils import maybe_queryset
+from graphene.relay.connection import connection_adapter, page_info_adapter
+from graphql_relay import to_global_id
+from graphql.language import FragmentSpreadNode, InlineFragmentNode
+from django.db.models import QuerySet
 from .models import Person, Film, Planet, Species
+from .autocomplete import autocomplete
+from .loaders import RELATIONS, get_loaders
+from .measurements import NUMERIC_FIELDS, order_keys, range_filter
+from .pagination import decode_key, encode_key, key_values, keyset_filter, keyset_ordering, nullable_keys, row_key
+from .search import contains_filter, search, text_search
+
+
+def selected_fields(info, *path):
+    """
+    Names of the fields selected below `path` (e.g. 'edges', 'node') in the
+    current field's selection set, with fragments expanded.
+    """
+    def collect(selection_set, names):
+        for selection in selection_set.selections if selection_set else []:
+            if isinstance(selection, FragmentSpreadNode):
+                collect(info.fragments[selection.name.value].selection_set, names)
+            elif isinstance(selection, InlineFragmentNode):
+                collect(selection.selection_set, names)
+            else:
+                names.setdefault(selection.name.value, []).append(selection.selection_set)
+        return names
+
+    selection_sets = [node.selection_set for node in info.field_nodes]
+    for name in path:
+        fields = {}
+        for selection_set in selection_sets:
+            collect(selection_set, fields)
+        selection_sets = fields.get(name, [])
+    fields = {}
+    for selection_set in selection_sets:
+        collect(selection_set, fields)
+    return set(fields)
+
+
+def optimize_queryset(queryset, node_type, fields):
+    """
+    Join/prefetch the selected relations so a page costs a constant number
+    of queries (the *_count fields are stored columns).
+    """
+    model = node_type._meta.model
+    if 'homeworld' in fields and model in (Person, Species):
+        queryset = queryset.select_related('homeworld')
+    prefetch = [name for name in RELATIONS.get(model, {}) if name in fields]
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class CountableConnection(relay.Connection):
+    """Relay connection whose totalCount is only computed when selected"""
+
+    class Meta:
+        abstract = True
+
+    total_count = Int()
+
+    def resolve_total_count(self, info):
+        if isinstance(self.iterable, QuerySet):
+            return self.iterable.count()
+        return len(self.iterable)
+
+
+def measurement_arguments(model):
+    """`order` plus inclusive `<field>Min`/`<field>Max` bounds on the numeric measurements"""
+    arguments = {'order': String()}
+    for field in NUMERIC_FIELDS[model]:
+        arguments[f'{field}_min'] = graphene.Float()
+        arguments[f'{field}_max'] = graphene.Float()
+    return arguments
+
+
+class OptimizedConnectionField(DjangoConnectionField):
+    """
+    DjangoConnectionField that optimizes its queryset for the requested
+    selection, pages it by keyset and primes the request loaders with the
+    resulting page.
+
+    Cursors encode the sort key of each edge (name or episode_id plus the
+    UUID, after the measurement given as `order`), so `after`/`before`
+    become a WHERE on indexed columns instead of an OFFSET, and
+    hasNextPage/hasPreviousPage come from fetching one extra row instead
+    of a COUNT(*). Fields given measurement_arguments() also filter on the
+    numeric measurement columns.
+    """
+
+    @classmethod
+    def resolve_queryset(cls, connection, queryset, info, args):
+        queryset = super().resolve_queryset(connection, queryset, info, args)
+        queryset = maybe_queryset(queryset)
+        if isinstance(queryset, QuerySet):
+            if queryset.model in NUMERIC_FIELDS:
+                queryset = queryset.filter(range_filter(queryset.model, args))
+            fields = selected_fields(info, 'edges', 'node')
+            queryset = optimize_queryset(queryset, connection._meta.node, fields)
+        return queryset
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        iterable = maybe_queryset(iterable)
+        if not isinstance(iterable, QuerySet) or args.get('offset'):
+            return super().resolve_connection(connection, args, iterable, max_limit)
+
+        keys = order_keys(iterable.model, args.get('order'))
+        nullable = nullable_keys(iterable.model, keys)
+        first, last = args.get('first'), args.get('last')
+        after, before = args.get('after'), args.get('before')
+        if max_limit is not None and first is None and last is None:
+            first = max_limit
+
+        def cursor_values(cursor):
+            return key_values(iterable.model, keys, decode_key(cursor, len(keys)))
+
+        queryset = iterable
+        if after:
+            queryset = queryset.filter(keyset_filter(keys, cursor_values(after), True, nullable))
+        if before:
+            queryset = queryset.filter(keyset_filter(keys, cursor_values(before), False, nullable))
+
+        if first is None and last is not None:
+            rows = list(queryset.order_by(*keyset_ordering(keys, False, nullable))[:last + 1])
+            has_previous, has_next = len(rows) > last, bool(before)
+            rows = rows[:last][::-1]
+        else:
+            queryset = queryset.order_by(*keyset_ordering(keys, True, nullable))
+            rows = list(queryset if first is None else queryset[:first + 1])
+            has_previous, has_next = bool(after), first is not None and len(rows) > first
+            rows = rows[:first]
+            if last is not None:
+                has_previous = has_previous or len(rows) > last
+                rows = rows[-last:] if last else []
+
+        edges = [
+            connection.Edge(node=row, cursor=encode_key(row_key(row, keys)))
+            for row in rows
+        ]
+        result = connection_adapter(
+            connection,
+            edges=edges,
+            pageInfo=page_info_adapter(
+                startCursor=edges[0].cursor if edges else None,
+                endCursor=edges[-1].cursor if edges else None,
+                hasPreviousPage=has_previous,
+                hasNextPage=has_next,
+            ),
+        )
+        result.iterable = iterable
+        return result
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager, queryset_resolver,
+                            max_limit, enforce_first_or_last, root, info, **args):
+        result = super().connection_resolver(
+            resolver, connection, default_manager, queryset_resolver,
+            max_limit, enforce_first_or_last, root, info, **args
+        )
+        get_loaders(info).prime(edge.node for edge in result.edges)
+        return result
 
 
 class PersonType(DjangoObjectType):
@@ -11,59 +172,113 @@ class PersonType(DjangoObjectType):
         model = Person
         interfaces = (relay.Node,)
         fields = '__all__'
+        connection_class = CountableConnection
 
     film_count = Int()
 
-    def resolve_film_count(self, info):
-        return self.films.count()
+    def resolve_homeworld(self, info):
+        return get_loaders(info).load_homeworld(self)
+
+    def resolve_films(self, info, **kwargs):
+        return get_loaders(info).load_related(self, 'films')
+
+    def resolve_species(self, info, **kwargs):
+        return get_loaders(info).load_related(self, 'species')
 
 
 class FilmType(DjangoObjectType):
     class Meta:
         model = Film
         interfaces = (relay.Node,)
-        fields = '__all__'
+        exclude = ['search_vector']
+        connection_class = CountableConnection
 
     character_count = Int()
     planet_count = Int()
 
-    def resolve_character_count(self, info):
-        return self.characters.count()
+    def resolve_characters(self, info, **kwargs):
+        return get_loaders(info).load_related(self, 'characters')
 
-    def resolve_planet_count(self, info):
-        return self.planets.count()
+    def resolve_planets(self, info, **kwargs):
+        return get_loaders(info).load_related(self, 'planets')
+
+    def resolve_species(self, info, **kwargs):
+        return get_loaders(info).load_related(self, 'species')
 
 
 class PlanetType(DjangoObjectType):
     class Meta:
         model = Planet
         interfaces = (relay.Node,)
-        fields = '__all__'
+        exclude = ['search_vector']
+        connection_class = CountableConnection
 
     resident_count = Int()
     film_count = Int()
 
-    def resolve_resident_count(self, info):
-        return self.residents.count()
+    def resolve_residents(self, info, **kwargs):
+        return get_loaders(info).load_related(self, 'residents')
 
-    def resolve_film_count(self, info):
-        return self.films.count()
+    def resolve_films(self, info, **kwargs):
+        return get_loaders(info).load_related(self, 'films')
 
 
 class SpeciesType(DjangoObjectType):
     class Meta:
         model = Species
         interfaces = (relay.Node,)
-        fields = '__all__'
+        exclude = ['search_vector']
+        connection_class = CountableConnection
 
     people_count = Int()
     film_count = Int()
 
-    def resolve_people_count(self, info):
-        return self.people.count()
+    def resolve_homeworld(self, info):
+        return get_loaders(info).load_homeworld(self)
 
-    def resolve_film_count(self, info):
-        return self.films.count()
+    def resolve_people(self, info, **kwargs):
+        return get_loaders(info).load_related(self, 'people')
+
+    def resolve_films(self, info, **kwargs):
+        return get_loaders(info).load_related(self, 'films')
+
+
+class SearchResult(graphene.Union):
+    class Meta:
+        types = (PersonType, PlanetType, FilmType, SpeciesType)
+
+
+class SearchHit(ObjectType):
+    """One ranked result of Query.search"""
+    kind = String()
+    score = graphene.Float()
+    node = Field(SearchResult)
+
+
+class TextSearchHit(ObjectType):
+    """One ranked result of Query.textSearch; `headline` marks matches with <mark>"""
+    kind = String()
+    rank = graphene.Float()
+    headline = String()
+    node = Field(SearchResult)
+
+
+NODE_TYPES = {'person': PersonType, 'planet': PlanetType, 'film': FilmType, 'species': SpeciesType}
+
+
+class AutocompleteHit(ObjectType):
+    """One suggestion of Query.autocomplete; `id` is the node's global ID"""
+    kind = String()
+    id = graphene.ID()
+    name = String()
+
+
+class TextSearchPage(ObjectType):
+    hits = List(TextSearchHit)
+    total_count = Int()
+    page = Int()
+    total_pages = Int()
+    has_next = graphene.Boolean()
 
 
 # Mutations
@@ -211,10 +426,10 @@ class CreateFilmMutation(graphene.Mutation):
 
 
 class Query(ObjectType):
-    all_people = DjangoConnectionField(PersonType)
-    all_films = DjangoConnectionField(FilmType)
-    all_planets = DjangoConnectionField(PlanetType)
-    all_species = DjangoConnectionField(SpeciesType)
+    all_people = OptimizedConnectionField(PersonType, **measurement_arguments(Person))
+    all_films = OptimizedConnectionField(FilmType)
+    all_planets = OptimizedConnectionField(PlanetType, **measurement_arguments(Planet))
+    all_species = OptimizedConnectionField(SpeciesType)
 
     person = relay.Node.Field(PersonType)
     film = relay.Node.Field(FilmType)
@@ -222,28 +437,63 @@ class Query(ObjectType):
     species = relay.Node.Field(SpeciesType)
 
     search_people = Field(List(PersonType), name=String())
+    search = Field(List(SearchHit), text=String(required=True), types=List(String), first=Int())
+    text_search = Field(
+        TextSearchPage, text=String(required=True), types=List(String), page=Int(), page_size=Int()
+    )
+    autocomplete = Field(List(AutocompleteHit), prefix=String(required=True), types=List(String), first=Int())
     films_by_character = Field(List(FilmType), character_id=String(required=True))
     characters_in_film = Field(List(PersonType), film_id=String(required=True))
 
     def resolve_search_people(self, info, name=None):
         queryset = Person.objects.all()
         if name:
-            queryset = queryset.filter(
-                Q(name__icontains=name)
-            ).distinct()
-        return queryset
+            queryset = queryset.filter(contains_filter('name', name))
+        people = list(queryset)
+        get_loaders(info).prime(people)
+        return people
+
+    def resolve_search(self, info, text, types=None, first=None):
+        hits = search(text, types, first or 20)
+        get_loaders(info).prime(obj for _, _, obj in hits)
+        return [SearchHit(kind=kind, score=score, node=obj) for kind, score, obj in hits]
+
+    def resolve_text_search(self, info, text, types=None, page=None, page_size=None):
+        result = text_search(text, types, page or 1, page_size or 20)
+        get_loaders(info).prime(hit.obj for hit in result.hits)
+        return TextSearchPage(
+            hits=[
+                TextSearchHit(kind=hit.kind, rank=hit.rank, headline=hit.headline, node=hit.obj)
+                for hit in result.hits
+            ],
+            total_count=result.count,
+            page=result.page,
+            total_pages=result.total_pages,
+            has_next=result.page < result.total_pages,
+        )
+
+    def resolve_autocomplete(self, info, prefix, types=None, first=None):
+        # Answered from the worker's in-memory index, without touching the database
+        return [
+            AutocompleteHit(kind=kind, id=to_global_id(NODE_TYPES[kind]._meta.name, pk), name=name)
+            for kind, name, pk in autocomplete.complete(prefix, types, first or 10)
+        ]
 
     def resolve_films_by_character(self, info, character_id):
         try:
             person = Person.objects.get(id=character_id)
-            return person.films.all()
+            films = list(person.films.all())
+            get_loaders(info).prime(films)
+            return films
         except Person.DoesNotExist:
             return []
 
     def resolve_characters_in_film(self, info, film_id):
         try:
             film = Film.objects.get(id=film_id)
-            return film.characters.all()
+            characters = list(film.characters.all())
+            get_loaders(info).prime(characters)
+            return characters
         except Film.DoesNotExist:
             return []
 
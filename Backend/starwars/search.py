@@ -0,0 +1,224 @@
+"""
+Name search across people, planets, films and species.
+
+On PostgreSQL the name columns carry pg_trgm GIN indexes (migration
+0004). Django's icontains renders as UPPER(name) LIKE, which those
+indexes cannot serve, so substring filters use a case-insensitive regex
+of the escaped text instead (`~*`, which they can). Fuzzy search also
+accepts typos: a row matches when the text is word-similar to its name
+(`name %> text`), and hits are ranked by word_similarity().
+
+Full-text search (text_search) covers films, planets and species. On
+PostgreSQL each row has a weighted `search_vector` kept current by a
+trigger, with a GIN index (migration 0005), so a query is answered from
+the index and only the returned page is read to build its headlines.
+
+Other databases fall back to icontains. Name search ranks matches by how
+much of the name they cover, and there is no typo tolerance. Text search
+requires every word and ranks by weighted occurrences.
+"""
+import re
+from collections import namedtuple
+
+from django.contrib.postgres.search import (
+    SearchHeadline, SearchQuery, SearchRank, TrigramWordSimilarity,
+)
+from django.db import connection
+from django.db.models import F, Q, TextField, Value
+from django.db.models.functions import Concat
+
+from .models import Person, Film, Planet, Species
+
+# Searchable models: kind -> (model, name field)
+SEARCH_MODELS = {
+    'person': (Person, 'name'),
+    'planet': (Planet, 'name'),
+    'film': (Film, 'title'),
+    'species': (Species, 'name'),
+}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def trigram_supported():
+    return connection.vendor == 'postgresql'
+
+
+def contains_filter(field, text):
+    """Case-insensitive substring filter the trigram index can serve"""
+    if trigram_supported():
+        return Q(**{f'{field}__iregex': re.escape(text)})
+    return Q(**{f'{field}__icontains': text})
+
+
+def check_kinds(kinds, known):
+    unknown = set(kinds or ()) - set(known)
+    if unknown:
+        raise ValueError(f"Unknown types: {', '.join(sorted(unknown))}")
+
+
+def search_model(kind, text, limit=DEFAULT_LIMIT):
+    """Best `limit` (score, object) pairs of one kind, best first"""
+    model, field = SEARCH_MODELS[kind]
+    queryset = model.objects.all()
+
+    if trigram_supported():
+        rows = (
+            queryset
+            .filter(contains_filter(field, text) | Q(**{f'{field}__trigram_word_similar': text}))
+            .annotate(score=TrigramWordSimilarity(text, field))
+            .order_by('-score', field)[:limit]
+        )
+        return [(row.score, row) for row in rows]
+
+    rows = queryset.filter(contains_filter(field, text))
+    scored = [(len(text) / len(getattr(row, field)), row) for row in rows]
+    scored.sort(key=lambda hit: (-hit[0], getattr(hit[1], field)))
+    return scored[:limit]
+
+
+def search(text, kinds=None, limit=DEFAULT_LIMIT):
+    """
+    Ranked hits over every kind in `kinds` (all by default) as
+    (kind, score, object) tuples, best first.
+    """
+    check_kinds(kinds, SEARCH_MODELS)
+    text = text.strip()
+    if not text:
+        return []
+    limit = max(1, min(limit, MAX_LIMIT))
+    hits = [
+        (kind, score, obj)
+        for kind in (kinds or SEARCH_MODELS)
+        for score, obj in search_model(kind, text, limit)
+    ]
+    hits.sort(key=lambda hit: -hit[1])
+    return hits[:limit]
+
+
+SEARCH_CONFIG = 'english'
+
+# Full-text documents: kind -> (model, [(field, weight)]); the weights match
+# the triggers of migration 0005
+TEXT_DOCUMENTS = {
+    'film': (Film, [('title', 'A'), ('director', 'B'), ('producer', 'B'), ('opening_crawl', 'C')]),
+    'planet': (Planet, [('name', 'A'), ('climate', 'B'), ('terrain', 'B')]),
+    'species': (Species, [('name', 'A'), ('classification', 'B'), ('language', 'B')]),
+}
+
+# ts_rank's default weights, used by the fallback ranking
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+HEADLINE_SEPARATOR = ' · '
+HEADLINE_WORDS = 30
+
+# Deepest result reachable by paging; every kind's top rows are merged
+MAX_TEXT_RESULTS = 1000
+
+TextHit = namedtuple('TextHit', ['kind', 'rank', 'headline', 'obj'])
+TextPage = namedtuple('TextPage', ['hits', 'count', 'page', 'total_pages'])
+
+
+def full_text_supported():
+    return connection.vendor == 'postgresql'
+
+
+def document(obj, fields):
+    return HEADLINE_SEPARATOR.join(
+        str(getattr(obj, field)) for field, _ in fields if getattr(obj, field)
+    )
+
+
+def highlight(text, words):
+    """Fallback headline: HEADLINE_WORDS words around the first match, marked"""
+    pattern = re.compile('|'.join(re.escape(word) for word in words), re.IGNORECASE)
+    tokens = text.split()
+    first = next((index for index, token in enumerate(tokens) if pattern.search(token)), 0)
+    start = max(0, first - HEADLINE_WORDS // 3)
+    snippet = ' '.join(tokens[start:start + HEADLINE_WORDS])
+    return pattern.sub(lambda match: f'<mark>{match.group()}</mark>', snippet)
+
+
+def page_bounds(count, page, page_size):
+    """(page clamped to the last page, total pages) for `count` results"""
+    total_pages = max(1, -(-min(count, MAX_TEXT_RESULTS) // page_size))
+    return min(page, total_pages), total_pages
+
+
+def fallback_text_search(text, kinds, page, page_size):
+    words = text.split()
+    hits = []
+    for kind in kinds:
+        model, fields = TEXT_DOCUMENTS[kind]
+        condition = Q()
+        for word in words:
+            condition &= Q(*[Q(**{f'{field}__icontains': word}) for field, _ in fields], _connector=Q.OR)
+        for obj in model.objects.filter(condition):
+            rank = sum(
+                WEIGHTS[weight] * str(getattr(obj, field) or '').lower().count(word.lower())
+                for field, weight in fields
+                for word in words
+            )
+            hits.append(TextHit(kind, rank, highlight(document(obj, fields), words), obj))
+    hits.sort(key=lambda hit: -hit.rank)
+
+    page, total_pages = page_bounds(len(hits), page, page_size)
+    return TextPage(hits[(page - 1) * page_size:page * page_size], len(hits), page, total_pages)
+
+
+def postgres_text_search(text, kinds, page, page_size):
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    end = min(page * page_size, MAX_TEXT_RESULTS)
+
+    # Ranks come from the indexed vectors; no text column is read here
+    count, ranked = 0, []
+    for kind in kinds:
+        matches = TEXT_DOCUMENTS[kind][0].objects.filter(search_vector=query)
+        count += matches.count()
+        ranked += [
+            (rank, kind, pk)
+            for pk, rank in matches
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', 'pk')
+            .values_list('pk', 'rank')[:end]
+        ]
+    ranked.sort(key=lambda hit: -hit[0])
+    page, total_pages = page_bounds(count, page, page_size)
+    window = ranked[(page - 1) * page_size:page * page_size]
+
+    # Rows and headlines only for this page
+    objects = {}
+    for kind in {kind for _, kind, _ in window}:
+        model, fields = TEXT_DOCUMENTS[kind]
+        source = Concat(
+            *[part for field, _ in fields for part in (Value(HEADLINE_SEPARATOR), field)][1:],
+            output_field=TextField(),
+        )
+        headline = SearchHeadline(
+            source, query, config=SEARCH_CONFIG, start_sel='<mark>', stop_sel='</mark>',
+            max_words=HEADLINE_WORDS, min_words=HEADLINE_WORDS // 2,
+        )
+        pks = [pk for _, hit_kind, pk in window if hit_kind == kind]
+        for obj in model.objects.filter(pk__in=pks).annotate(headline=headline):
+            objects[kind, obj.pk] = obj
+
+    hits = [
+        TextHit(kind, rank, objects[kind, pk].headline, objects[kind, pk])
+        for rank, kind, pk in window
+        if (kind, pk) in objects
+    ]
+    return TextPage(hits, count, page, total_pages)
+
+
+def text_search(text, kinds=None, page=1, page_size=20):
+    """
+    One TextPage of full-text hits (TextHit, best first) over every kind
+    in `kinds` (all by default).
+    """
+    check_kinds(kinds, TEXT_DOCUMENTS)
+    text = text.strip()
+    if not text:
+        return TextPage([], 0, 1, 1)
+    search_page = postgres_text_search if full_text_supported() else fallback_text_search
+    return search_page(text, kinds or list(TEXT_DOCUMENTS), max(page, 1), max(1, min(page_size, MAX_LIMIT)))
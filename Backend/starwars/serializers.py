@@ -0,0 +1,166 @@
+"""
+Plain-dict serializers for the REST views.
+
+They read rows with .values() (stored counters included), so a page is
+built without instantiating model objects or running per-row queries.
+"""
+from collections import defaultdict
+
+from .models import Person, Film, Planet
+from .profiling import profiled
+
+
+CHARACTER_FIELDS = (
+    'id', 'name', 'gender', 'birth_year', 'height', 'mass', 'hair_color',
+    'skin_color', 'eye_color', 'film_count', 'created',
+    # Not serialized; read as sort keys of the keyset pages
+    'height_value', 'mass_value',
+)
+
+HOMEWORLD_FIELDS = ('id', 'name', 'climate', 'terrain')
+
+FILM_FIELDS = (
+    'id', 'title', 'episode_id', 'director', 'producer', 'release_date',
+    'character_count', 'planet_count',
+)
+
+FILM_DETAIL_FIELDS = (
+    'id', 'title', 'episode_id', 'opening_crawl', 'director', 'producer',
+    'release_date', 'character_count', 'created', 'swapi_url',
+)
+
+PLANET_FIELDS = (
+    'id', 'name', 'climate', 'terrain', 'population', 'resident_count', 'film_count',
+)
+
+FILM_PLANET_FIELDS = (
+    'id', 'name', 'climate', 'terrain', 'population', 'diameter', 'gravity',
+    'surface_water', 'rotation_period', 'orbital_period',
+)
+
+
+def homeworld_values(fields):
+    return tuple(f'homeworld__{field}' for field in fields)
+
+
+def homeworld_payload(row, fields):
+    if row['homeworld__id'] is None:
+        return None
+    homeworld = {field: row[f'homeworld__{field}'] for field in fields}
+    homeworld['id'] = str(homeworld['id'])
+    return homeworld
+
+
+def character_values(queryset, homeworld_fields=HOMEWORLD_FIELDS):
+    return queryset.values(*CHARACTER_FIELDS, *homeworld_values(homeworld_fields))
+
+
+def character_payload(row, homeworld_fields=HOMEWORLD_FIELDS):
+    return {
+        'id': str(row['id']),
+        'name': row['name'],
+        'gender': row['gender'],
+        'birth_year': row['birth_year'],
+        'height': row['height'],
+        'mass': row['mass'],
+        'hair_color': row['hair_color'],
+        'skin_color': row['skin_color'],
+        'eye_color': row['eye_color'],
+        'homeworld': homeworld_payload(row, homeworld_fields),
+        'films_count': row['film_count'],
+        'films_url': f"/api/characters/{row['id']}/films/",
+        'created': row['created'].isoformat(),
+    }
+
+
+@profiled('serialize')
+def serialize_characters(rows):
+    """List payload for rows produced by character_values()"""
+    return [character_payload(row) for row in rows]
+
+
+@profiled('serialize')
+def serialize_character_detail(character_id):
+    """Detail payload for one character; raises Person.DoesNotExist"""
+    homeworld_fields = HOMEWORLD_FIELDS + ('population',)
+    row = character_values(
+        Person.objects.filter(id=character_id), homeworld_fields
+    ).first()
+    if row is None:
+        raise Person.DoesNotExist
+    return character_payload(row, homeworld_fields)
+
+
+@profiled('serialize')
+def serialize_films(queryset):
+    return [
+        {
+            **row,
+            'id': str(row['id']),
+            'release_date': row['release_date'].isoformat(),
+        }
+        for row in queryset.values(*FILM_FIELDS)
+    ]
+
+
+@profiled('serialize')
+def serialize_planets(queryset):
+    return [
+        {**row, 'id': str(row['id'])}
+        for row in queryset.values(*PLANET_FIELDS)
+    ]
+
+
+@profiled('serialize')
+def serialize_character_films(character_id):
+    """Films payload for one character; raises Person.DoesNotExist"""
+    character = (
+        Person.objects.filter(id=character_id)
+        .values('id', 'name', 'gender', 'birth_year', 'homeworld__name')
+        .first()
+    )
+    if character is None:
+        raise Person.DoesNotExist
+
+    films = list(
+        Film.objects.filter(characters=character_id)
+        .order_by('episode_id')
+        .values(*FILM_DETAIL_FIELDS)
+    )
+
+    planets = defaultdict(list)
+    planet_rows = (
+        Planet.objects.filter(films__in=[film['id'] for film in films])
+        .values('films', *FILM_PLANET_FIELDS)
+    )
+    for row in planet_rows:
+        film_id = row.pop('films')
+        row['id'] = str(row['id'])
+        planets[film_id].append(row)
+
+    return {
+        'character': {
+            'id': str(character['id']),
+            'name': character['name'],
+            'gender': character['gender'],
+            'birth_year': character['birth_year'],
+            'homeworld': character['homeworld__name'],
+        },
+        'films': [
+            {
+                'id': str(film['id']),
+                'title': film['title'],
+                'episode_id': film['episode_id'],
+                'opening_crawl': film['opening_crawl'],
+                'director': film['director'],
+                'producer': film['producer'],
+                'release_date': film['release_date'].isoformat(),
+                'planets': planets[film['id']],
+                'character_count': film['character_count'],
+                'created': film['created'].isoformat(),
+                'swapi_url': film['swapi_url'],
+            }
+            for film in films
+        ],
+        'total_films': len(films),
+    }
@@ -0,0 +1,107 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .autocomplete import autocomplete
+from .caching import bump_versions
+from .counters import COUNTERS, linked_counters, refresh_counters, reload_counters
+from .measurements import NUMERIC_FIELDS, numeric_values
+from .models import Person, Film, Planet, Species
+
+
+COUNTED_MODELS = (Person, Film, Planet, Species)
+
+
+def through_field(through, model):
+    """Name of the foreign key on an M2M through table that points at `model`"""
+    for field in through._meta.fields:
+        if field.related_model is model:
+            return field.name
+
+
+def update_counts(sender, instance, action, model, pk_set, **kwargs):
+    """Keep the counters fed by an M2M through table in sync with it"""
+    if action == 'pre_clear':
+        instance._cleared_pks = set(
+            sender.objects
+            .filter(**{through_field(sender, type(instance)): instance.pk})
+            .values_list(through_field(sender, model), flat=True)
+        )
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if action == 'post_clear':
+            pk_set = instance.__dict__.pop('_cleared_pks', set())
+        refresh_counters(type(instance), [instance.pk], source=sender)
+        refresh_counters(model, pk_set, source=sender)
+        reload_counters(instance)
+
+
+def invalidate_m2m(sender, instance, action, model, **kwargs):
+    # Bumped once the write is visible: a request served before the commit
+    # would cache the old rows under the new version
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(lambda: bump_versions(type(instance), model))
+
+
+for through in {counter.source for counter in COUNTERS if counter.source._meta.auto_created}:
+    m2m_changed.connect(update_counts, sender=through, dispatch_uid=f'counters_{through.__name__}')
+    m2m_changed.connect(invalidate_m2m, sender=through, dispatch_uid=f'cache_{through.__name__}')
+
+
+def parse_measurements(sender, instance, raw=False, **kwargs):
+    if not raw:
+        for field, value in numeric_values(sender, instance.__dict__).items():
+            setattr(instance, field, value)
+
+
+@receiver(pre_save, sender=Person)
+def remember_homeworld(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance._previous_homeworld_id = (
+            Person.objects.filter(pk=instance.pk).values_list('homeworld_id', flat=True).first()
+        )
+
+
+def update_counts_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not created:
+        # A save writes back whatever counter values the instance was
+        # loaded with, so recompute them from the relations.
+        refresh_counters(sender, [instance.pk])
+        reload_counters(instance)
+    if sender is Person:
+        previous = instance.__dict__.pop('_previous_homeworld_id', None)
+        refresh_counters(Planet, {instance.homeworld_id, previous} - {None}, source=Person)
+
+
+def remember_linked_counters(sender, instance, **kwargs):
+    instance._linked_counters = linked_counters(instance)
+
+
+def update_counts_on_delete(sender, instance, **kwargs):
+    for model, pks in instance.__dict__.pop('_linked_counters', {}).items():
+        refresh_counters(model, pks)
+
+
+def invalidate_responses(sender, **kwargs):
+    def invalidate():
+        bump_versions(sender)
+        # Not before the commit, or a lookup could rebuild the index from
+        # the old rows and keep it under the new version
+        autocomplete.invalidate(sender)
+
+    transaction.on_commit(invalidate)
+
+
+# Connected per model, so other models (sessions, auth, through tables)
+# send no signals here and keep Django's fast delete path
+for model in COUNTED_MODELS:
+    name = model.__name__
+    post_save.connect(update_counts_on_save, sender=model, dispatch_uid=f'counters_save_{name}')
+    pre_delete.connect(remember_linked_counters, sender=model, dispatch_uid=f'counters_pre_delete_{name}')
+    post_delete.connect(update_counts_on_delete, sender=model, dispatch_uid=f'counters_delete_{name}')
+    post_save.connect(invalidate_responses, sender=model, dispatch_uid=f'cache_save_{name}')
+    post_delete.connect(invalidate_responses, sender=model, dispatch_uid=f'cache_delete_{name}')
+
+for model in NUMERIC_FIELDS:
+    pre_save.connect(parse_measurements, sender=model, dispatch_uid=f'measurements_{model.__name__}')
@@ -0,0 +1,210 @@
+"""
+Offline snapshots of the Star Wars dataset.
+
+A snapshot is gzip-compressed newline-delimited JSON. The first line is a
+header naming the format version and the columns of every table; each
+following line is one row (`["planet", value, ...]`) or one M2M edge
+(`["person.films", "Luke Skywalker", "A New Hope"]`). Rows and edges
+refer to each other by natural key (name/title), so a snapshot can be
+merged into a database whose primary keys differ.
+
+Tables are written parents first, so the reader can stream the file in
+chunks through the bulk upsert path with flat memory (beyond the
+key -> pk index of each table).
+"""
+import gzip
+import json
+from datetime import datetime, timezone
+
+from django.db import transaction
+
+from .importer import (
+    BATCH_SIZE, IMPORT_MODELS, RELATIONS, UNIQUE_FIELDS, finish_import, insert_edges, upsert,
+)
+
+FORMAT = 'starwars-snapshot'
+VERSION = 1
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def snapshot_fields(model):
+    """Data fields stored for `model`; ids, timestamps and counters are not"""
+    return [
+        field for field in model._meta.concrete_fields
+        if field.editable and not field.primary_key
+    ]
+
+
+def columns(model):
+    return [field.name for field in snapshot_fields(model)]
+
+
+def relation_name(descriptor):
+    return f'{descriptor.field.model._meta.model_name}.{descriptor.field.name}'
+
+
+def table_models():
+    return {model._meta.model_name: model for model in IMPORT_MODELS}
+
+
+def relation_descriptors():
+    return {
+        relation_name(descriptor): descriptor
+        for relations in RELATIONS.values()
+        for descriptor, _ in relations
+    }
+
+
+def encode(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def write_snapshot(path):
+    """Write every table and edge to `path`; returns {table: lines written}"""
+    counts = {}
+    with gzip.open(path, 'wt', encoding='utf-8') as out:
+        header = {
+            'format': FORMAT,
+            'version': VERSION,
+            'exported': datetime.now(timezone.utc).isoformat(),
+            'tables': {model._meta.model_name: columns(model) for model in IMPORT_MODELS},
+        }
+        out.write(json.dumps(header) + '\n')
+
+        for model in IMPORT_MODELS:
+            name = model._meta.model_name
+            lookups = [
+                f'{field.name}__{UNIQUE_FIELDS[field.related_model]}' if field.is_relation else field.name
+                for field in snapshot_fields(model)
+            ]
+            counts[name] = 0
+            for row in model.objects.order_by().values_list(*lookups).iterator(chunk_size=BATCH_SIZE):
+                out.write(json.dumps([name, *map(encode, row)], separators=(',', ':')) + '\n')
+                counts[name] += 1
+
+        for name, descriptor in relation_descriptors().items():
+            field = descriptor.field
+            through = descriptor.through
+            lookups = (
+                f'{field.m2m_field_name()}__{UNIQUE_FIELDS[field.model]}',
+                f'{field.m2m_reverse_field_name()}__{UNIQUE_FIELDS[field.related_model]}',
+            )
+            counts[name] = 0
+            for edge in through.objects.order_by().values_list(*lookups).iterator(chunk_size=BATCH_SIZE):
+                out.write(json.dumps([name, *edge], separators=(',', ':')) + '\n')
+                counts[name] += 1
+    return counts
+
+
+class SnapshotReader:
+    """Streams a snapshot into the database through the bulk upsert path"""
+
+    def __init__(self, chunk_size=BATCH_SIZE):
+        self.chunk_size = chunk_size
+        self.counts = {}
+        self._indexes = {}
+
+    def natural_index(self, model):
+        """natural key -> pk of `model`, reloaded after the table is written"""
+        if model not in self._indexes:
+            self._indexes[model] = dict(
+                model.objects.values_list(UNIQUE_FIELDS[model], 'pk')
+            )
+        return self._indexes[model]
+
+    def read_header(self, line):
+        try:
+            header = json.loads(line)
+        except ValueError as e:
+            raise SnapshotError('Not a snapshot file') from e
+        if header.get('format') != FORMAT:
+            raise SnapshotError('Not a snapshot file')
+        if header.get('version') != VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {header.get('version')}")
+        return header
+
+    def write_rows(self, model, columns, lines):
+        foreign_keys = {
+            field.name: field for field in snapshot_fields(model) if field.is_relation
+        }
+        rows = []
+        for values in lines:
+            row = dict(zip(columns, values))
+            for name, field in foreign_keys.items():
+                key = row.pop(name, None)
+                row[field.attname] = self.natural_index(field.related_model).get(key)
+            rows.append(row)
+        self._indexes.pop(model, None)
+        return upsert(model, rows, self.chunk_size)
+
+    def write_edges(self, descriptor, lines):
+        field = descriptor.field
+        sources = self.natural_index(field.model)
+        targets = self.natural_index(field.related_model)
+        edges = [
+            (sources[source], targets[target])
+            for source, target in lines
+            if source in sources and target in targets
+        ]
+        return insert_edges(descriptor, edges, self.chunk_size)
+
+    @staticmethod
+    def numbered(lines):
+        """Numbered lines, with a truncated gzip stream reported as a SnapshotError"""
+        lines = enumerate(lines, 1)
+        while True:
+            try:
+                yield next(lines)
+            except StopIteration:
+                return
+            except EOFError as e:
+                raise SnapshotError('Snapshot file is truncated') from e
+
+    @staticmethod
+    def decode(number, line):
+        try:
+            current, *values = json.loads(line)
+        except (ValueError, TypeError) as e:
+            raise SnapshotError(f'Corrupt snapshot line {number}') from e
+        return current, values
+
+    def read(self, lines):
+        """Load the snapshot given as an iterable of lines; returns per-table counts"""
+        lines = self.numbered(lines)
+        header = self.read_header(next(lines, (1, ''))[1])
+        tables = table_models()
+        relations = relation_descriptors()
+
+        def flush(kind, chunk):
+            if not chunk:
+                return
+            if kind in relations:
+                written = self.write_edges(relations[kind], chunk)
+            elif kind in tables:
+                written = self.write_rows(tables[kind], header['tables'][kind], chunk)
+            else:
+                raise SnapshotError(f'Unknown snapshot table {kind}')
+            self.counts[kind] = self.counts.get(kind, 0) + written
+
+        kind, chunk = None, []
+        for number, line in lines:
+            if not line.strip():
+                continue
+            current, values = self.decode(number, line)
+            if current != kind or len(chunk) >= self.chunk_size:
+                flush(kind, chunk)
+                kind, chunk = current, []
+            chunk.append(values)
+        flush(kind, chunk)
+        return self.counts
+
+
+def read_snapshot(path, chunk_size=BATCH_SIZE):
+    """Merge the snapshot at `path` into the database in one transaction"""
+    with gzip.open(path, 'rt', encoding='utf-8') as lines, transaction.atomic():
+        counts = SnapshotReader(chunk_size).read(lines)
+        finish_import()
+    return counts
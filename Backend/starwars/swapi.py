@@ -0,0 +1,148 @@
+"""
+Concurrent SWAPI client used by the import commands.
+
+All requests go through one pooled requests.Session on a bounded thread
+pool. Every URL is fetched at most once per client: responses (and the
+in-flight future of a pending request) are memoized by URL, and each
+resource listed on a page is memoized under its own `url`, so following a
+link to an already listed resource costs no HTTP at all.
+
+Connection errors, timeouts, 429 and 5xx responses are retried with
+exponential backoff; the latency of every attempt is recorded.
+"""
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = 'https://swapi.dev/api/'
+DEFAULT_WORKERS = 8
+
+RESOURCES = ('planets', 'films', 'people', 'species')
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (0 when empty)"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class SwapiClient:
+    def __init__(self, base_url=DEFAULT_BASE_URL, max_workers=DEFAULT_WORKERS, timeout=10, verify=False,
+                 retries=3, backoff=0.5):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.timeout = timeout
+        self.verify = verify
+        self.retries = retries
+        self.backoff = backoff
+        self.requests_made = 0
+        self.latencies = []
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='swapi')
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def resource_url(self, resource, page=None):
+        url = f'{self.base_url}{resource}/'
+        return f'{url}?page={page}' if page and page > 1 else url
+
+    def _fetch(self, url):
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, timeout=self.timeout, verify=self.verify)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.json()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            finally:
+                with self._lock:
+                    self.requests_made += 1
+                    self.latencies.append(time.perf_counter() - started)
+            time.sleep(self.backoff * 2 ** attempt)
+
+    def submit(self, url):
+        """Future for the JSON at `url`, started at most once per client"""
+        with self._lock:
+            future = self._futures.get(url)
+            if future is None:
+                future = self._executor.submit(self._fetch, url)
+                self._futures[url] = future
+            return future
+
+    def prime(self, url, data):
+        with self._lock:
+            if url not in self._futures:
+                future = Future()
+                future.set_result(data)
+                self._futures[url] = future
+
+    def get(self, url):
+        return self.submit(url).result()
+
+    def get_many(self, urls):
+        futures = [self.submit(url) for url in urls]
+        return [future.result() for future in futures]
+
+    def prefetch(self, resources=RESOURCES):
+        """Start downloading the first page of every resource"""
+        for resource in resources:
+            self.submit(self.resource_url(resource))
+
+    def fetch_pages(self, resource, start=1):
+        """
+        Yield (page number, records) for every page of `resource` from
+        `start` on, in order. The first page gives the page count, then all
+        remaining pages are requested in parallel.
+        """
+        first = self.get(self.resource_url(resource))
+        page_count = 1
+        if first.get('next') and first.get('results'):
+            page_count = math.ceil(first['count'] / len(first['results']))
+
+        futures = {
+            page: self.submit(self.resource_url(resource, page))
+            for page in range(max(start, 2), page_count + 1)
+        }
+        if start <= 1:
+            yield 1, self._records(first)
+        for page, future in futures.items():
+            yield page, self._records(future.result())
+
+    def _records(self, page):
+        for item in page['results']:
+            if item.get('url'):
+                self.prime(item['url'], item)
+        return page['results']
+
+    def fetch_all(self, resource):
+        """Every record of `resource`"""
+        return [item for _, records in self.fetch_pages(resource) for item in records]
+
+    def listed_count(self, resource):
+        """Number of records the listing of `resource` announces"""
+        return self.get(self.resource_url(resource)).get('count')
@@ -1,12 +1,43 @@
+import gzip
+import hashlib
+import importlib
+import os
 import pytest
-from django.test import TestCase
+import requests
+import tempfile
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+from io import StringIO
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.core.management import CommandError, call_command
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from graphene.test import Client
+from graphql import execute
 from graphql_relay import to_global_id
 import json
 from datetime import date
 
-from starwars.models import Person, Film, Planet, Species
+from starwars.models import ImportCheckpoint, Person, Film, Planet, Species
+from starwars.swapi import SwapiClient
 from starwars.schema import schema
+from starwars.caching import bump_versions, data_version, get_versions
+from starwars.graphql_views import document_cache, registry_key
+from starwars.importer import RELATIONS, delete_rows, insert_edges, upsert
+from starwars.metrics import REGISTRY_KEY, Metrics, metrics, shared_values
+from starwars.profiling import Profile
+from starwars.autocomplete import PrefixIndex, autocomplete
+from starwars.measurements import parse_number
+from starwars.pagination import encode_cursor, encode_key
+from starwars.search import contains_filter, search, text_search
+from starwars.benchmarks import (
+    Measurement, build_cases, check_budget, compare_plans, load_budgets, run_benchmarks,
+)
 
 
 class ModelsTestCase(TestCase):
@@ -474,4 +505,1618 @@ class IntegrationTestCase(TestCase):
         people = result['data']['searchPeople']
         self.assertEqual(len(people), 1)
         self.assertEqual(people[0]['name'], 'Luke Skywalker')
-        self.assertEqual(len(people[0]['films']['edges']), 2)
\ No newline at end of file
+        self.assertEqual(len(people[0]['films']['edges']), 2)
+
+
+class DataLoaderTestCase(TestCase):
+    def setUp(self):
+        self.client = Client(schema)
+        self.factory = RequestFactory()
+
+        self.planets = [
+            Planet.objects.create(name=f"Planet {i}") for i in range(3)
+        ]
+        self.films = [
+            Film.objects.create(
+                title=f"Film {i}", episode_id=i,
+                opening_crawl="...", director="George Lucas",
+                producer="Gary Kurtz", release_date=date(1977, 5, 25)
+            ) for i in range(1, 4)
+        ]
+        for i in range(10):
+            person = Person.objects.create(
+                name=f"Person {i}", homeworld=self.planets[i % 3]
+            )
+            person.films.set(self.films[:i % 3 + 1])
+
+    def execute(self, query):
+        return self.client.execute(query, context_value=self.factory.get('/graphql/'))
+
+    def test_all_people_counts_and_homeworld_are_batched(self):
+        query = '''
+            query {
+                allPeople {
+                    edges {
+                        node {
+                            name
+                            filmCount
+                            homeworld { name residentCount }
+                            films { edges { node { title characterCount } } }
+                        }
+                    }
+                }
+            }
+        '''
+
+        # page joined to homeworld, prefetched films
+        with self.assertNumQueries(2):
+            result = self.execute(query)
+        self.assertIsNone(result.get('errors'))
+
+        people = {
+            edge['node']['name']: edge['node']
+            for edge in result['data']['allPeople']['edges']
+        }
+        self.assertEqual(len(people), 10)
+        self.assertEqual(people['Person 2']['filmCount'], 3)
+        self.assertEqual(people['Person 2']['homeworld']['name'], 'Planet 2')
+        self.assertEqual(people['Person 2']['homeworld']['residentCount'], 3)
+        self.assertEqual(
+            [edge['node']['title'] for edge in people['Person 2']['films']['edges']],
+            ['Film 1', 'Film 2', 'Film 3']
+        )
+        self.assertEqual(
+            people['Person 2']['films']['edges'][0]['node']['characterCount'], 10
+        )
+
+    def test_query_count_does_not_grow_with_rows(self):
+        query = '''
+            query {
+                allFilms {
+                    edges { node { characterCount planetCount } }
+                }
+            }
+        '''
+        with self.assertNumQueries(1):
+            result = self.execute(query)
+        self.assertIsNone(result.get('errors'))
+        self.assertEqual(
+            [edge['node']['characterCount'] for edge in result['data']['allFilms']['edges']],
+            [10, 6, 3]
+        )
+
+    def test_relations_selected_through_fragments(self):
+        query = '''
+            fragment PlanetCounts on PlanetType {
+                residentCount
+                filmCount
+                films { edges { node { title } } }
+            }
+            query {
+                allPlanets {
+                    edges { node { name ...PlanetCounts } }
+                }
+            }
+        '''
+        self.films[0].planets.set(self.planets)
+
+        # page, prefetched films
+        with self.assertNumQueries(2):
+            result = self.execute(query)
+        self.assertIsNone(result.get('errors'))
+
+        planets = [edge['node'] for edge in result['data']['allPlanets']['edges']]
+        self.assertEqual([p['residentCount'] for p in planets], [4, 3, 3])
+        self.assertEqual([p['filmCount'] for p in planets], [1, 1, 1])
+
+    def test_search_people_reads_stored_counts(self):
+        query = '''
+            query {
+                searchPeople(name: "Person") { name filmCount }
+            }
+        '''
+        with self.assertNumQueries(1):
+            result = self.execute(query)
+        self.assertIsNone(result.get('errors'))
+        self.assertEqual(result['data']['searchPeople'][2]['filmCount'], 3)
+
+
+class CounterTestCase(TestCase):
+    def setUp(self):
+        self.tatooine = Planet.objects.create(name="Tatooine")
+        self.naboo = Planet.objects.create(name="Naboo")
+        self.film = Film.objects.create(
+            title="A New Hope", episode_id=4,
+            opening_crawl="It is a period of civil war...",
+            director="George Lucas", producer="Gary Kurtz",
+            release_date=date(1977, 5, 25)
+        )
+        self.luke = Person.objects.create(name="Luke Skywalker", homeworld=self.tatooine)
+        self.leia = Person.objects.create(name="Princess Leia")
+        self.droids = Species.objects.create(name="Droid")
+
+    def refresh(self, *objects):
+        for obj in objects:
+            obj.refresh_from_db()
+
+    def test_other_models_keep_fast_deletes(self):
+        ImportCheckpoint.objects.create(stage='planets')
+        ImportCheckpoint.objects.create(stage='films')
+        # No receivers for this model: one DELETE, no per-row SELECT or cache bump
+        with self.assertNumQueries(1):
+            ImportCheckpoint.objects.all().delete()
+
+    def test_m2m_add_remove_and_clear(self):
+        self.film.characters.add(self.luke, self.leia)
+        self.film.planets.add(self.tatooine)
+        self.refresh(self.luke, self.tatooine)
+        self.assertEqual(self.film.character_count, 2)
+        self.assertEqual(self.film.planet_count, 1)
+        self.assertEqual(self.luke.film_count, 1)
+        self.assertEqual(self.tatooine.film_count, 1)
+
+        self.luke.films.remove(self.film)
+        self.refresh(self.film)
+        self.assertEqual(self.luke.film_count, 0)
+        self.assertEqual(self.film.character_count, 1)
+
+        self.film.characters.clear()
+        self.refresh(self.leia)
+        self.assertEqual(self.film.character_count, 0)
+        self.assertEqual(self.leia.film_count, 0)
+
+    def test_homeworld_changes_update_resident_counts(self):
+        self.refresh(self.tatooine)
+        self.assertEqual(self.tatooine.resident_count, 1)
+
+        self.luke.homeworld = self.naboo
+        self.luke.save()
+        self.refresh(self.tatooine, self.naboo)
+        self.assertEqual(self.tatooine.resident_count, 0)
+        self.assertEqual(self.naboo.resident_count, 1)
+
+        self.luke.delete()
+        self.refresh(self.naboo)
+        self.assertEqual(self.naboo.resident_count, 0)
+
+    def test_delete_updates_linked_counters(self):
+        self.droids.people.add(self.leia)
+        self.droids.films.add(self.film)
+        self.luke.films.add(self.film)
+
+        self.film.delete()
+        self.refresh(self.luke, self.droids)
+        self.assertEqual(self.luke.film_count, 0)
+        self.assertEqual(self.droids.film_count, 0)
+
+        self.leia.delete()
+        self.refresh(self.droids)
+        self.assertEqual(self.droids.people_count, 0)
+
+    def test_save_does_not_overwrite_counters(self):
+        stale = Person.objects.get(pk=self.luke.pk)
+        self.luke.films.add(self.film)
+
+        stale.height = "172"
+        stale.save()
+        self.assertEqual(stale.film_count, 1)
+        self.refresh(self.luke)
+        self.assertEqual(self.luke.film_count, 1)
+
+    def test_reconcile_counters_command(self):
+        self.luke.films.add(self.film)
+        Person.objects.update(film_count=0)
+        Film.objects.update(character_count=0)
+
+        call_command('reconcile_counters', stdout=StringIO())
+        self.refresh(self.luke, self.film, self.tatooine)
+        self.assertEqual(self.luke.film_count, 1)
+        self.assertEqual(self.film.character_count, 1)
+        self.assertEqual(self.tatooine.resident_count, 1)
+
+
+class RESTViewsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.planet = Planet.objects.create(
+            name="Tatooine", climate="arid", terrain="desert", population="200000"
+        )
+        self.films = [
+            Film.objects.create(
+                title=f"Film {i}", episode_id=i,
+                opening_crawl="...", director="George Lucas",
+                producer="Gary Kurtz", release_date=date(1977, 5, 25)
+            ) for i in range(1, 4)
+        ]
+        for film in self.films:
+            film.planets.add(self.planet)
+        self.people = []
+        for i in range(5):
+            person = Person.objects.create(
+                name=f"Person {i}", homeworld=self.planet if i % 2 else None
+            )
+            person.films.set(self.films)
+            self.people.append(person)
+
+    def test_characters_list(self):
+        # count, page
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/starwars/characters/?page_size=2&page=1')
+        data = response.json()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(data['total_pages'], 3)
+        self.assertTrue(data['has_next'])
+        self.assertIsNone(data['results'][0]['homeworld'])
+        self.assertEqual(data['results'][1], {
+            'id': str(self.people[1].id),
+            'name': 'Person 1',
+            'gender': None,
+            'birth_year': None,
+            'height': None,
+            'mass': None,
+            'hair_color': None,
+            'skin_color': None,
+            'eye_color': None,
+            'homeworld': {
+                'id': str(self.planet.id),
+                'name': 'Tatooine',
+                'climate': 'arid',
+                'terrain': 'desert',
+            },
+            'films_count': 3,
+            'films_url': f'/api/characters/{self.people[1].id}/films/',
+            'created': self.people[1].created.isoformat(),
+        })
+
+    def test_character_films(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/starwars/characters/{self.people[1].id}/films/')
+        data = response.json()
+        self.assertEqual(data['character']['homeworld'], 'Tatooine')
+        self.assertEqual(data['total_films'], 3)
+        self.assertEqual([film['episode_id'] for film in data['films']], [1, 2, 3])
+        self.assertEqual(data['films'][0]['character_count'], 5)
+        self.assertEqual(data['films'][0]['planets'][0]['name'], 'Tatooine')
+        self.assertEqual(data['films'][0]['planets'][0]['population'], '200000')
+
+    def test_character_detail_not_found(self):
+        response = self.client.get(f'/api/starwars/characters/{self.planet.id}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_films_and_planets_lists(self):
+        with self.assertNumQueries(1):
+            films = self.client.get('/api/starwars/films/').json()
+        self.assertEqual(films['count'], 3)
+        self.assertEqual(films['results'][0]['character_count'], 5)
+        self.assertEqual(films['results'][0]['planet_count'], 1)
+        self.assertEqual(films['results'][0]['release_date'], '1977-05-25')
+
+        with self.assertNumQueries(1):
+            planets = self.client.get('/api/starwars/planets/').json()
+        self.assertEqual(planets['results'][0]['resident_count'], 2)
+        self.assertEqual(planets['results'][0]['film_count'], 3)
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(7):
+            Person.objects.create(name=f"Person {i}")
+
+    def get(self, **params):
+        return self.client.get('/api/starwars/characters/', params).json()
+
+    def test_walks_forward_and_back_without_count(self):
+        # one query per page, no COUNT(*)
+        with self.assertNumQueries(1):
+            first = self.get(pagination='keyset', page_size=3)
+        self.assertNotIn('count', first)
+        self.assertEqual([c['name'] for c in first['results']], ['Person 0', 'Person 1', 'Person 2'])
+        self.assertTrue(first['has_next'])
+        self.assertFalse(first['has_previous'])
+        self.assertIsNone(first['previous'])
+
+        second = self.get(cursor=first['next'], page_size=3)
+        self.assertEqual([c['name'] for c in second['results']], ['Person 3', 'Person 4', 'Person 5'])
+
+        last = self.get(cursor=second['next'], page_size=3)
+        self.assertEqual([c['name'] for c in last['results']], ['Person 6'])
+        self.assertFalse(last['has_next'])
+        self.assertIsNone(last['next'])
+
+        back = self.get(cursor=last['previous'], page_size=3)
+        self.assertEqual(back['results'], second['results'])
+        self.assertTrue(back['has_previous'])
+
+        start = self.get(cursor=back['previous'], page_size=3)
+        self.assertEqual(start['results'], first['results'])
+        self.assertFalse(start['has_previous'])
+
+    def test_optional_count_and_name_filter(self):
+        data = self.get(pagination='keyset', name='person 1', include_count='true')
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['name'], 'Person 1')
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/starwars/characters/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Invalid cursor')
+
+    def test_cursor_values_must_fit_their_keys(self):
+        person = Person.objects.get(name="Person 1")
+        for params in (
+            {'cursor': encode_cursor(['Person 1', 'not-a-uuid'], 'next')},
+            {'cursor': encode_cursor(['tall', 'Person 1', str(person.pk)], 'next'), 'order': 'height'},
+        ):
+            response = self.client.get('/api/starwars/characters/', params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['error'], 'Invalid cursor')
+
+    def test_invalid_pagination(self):
+        for params in ({'page': 'two'}, {'page_size': '0'}, {'pagination': 'keyset', 'page_size': 'x'}):
+            response = self.client.get('/api/starwars/characters/', params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['error'], 'Invalid pagination')
+        # Filters keep their own error
+        response = self.client.get('/api/starwars/characters/', {'height_min': 'tall'})
+        self.assertEqual(response.json()['error'], 'Invalid filter')
+
+
+class KeysetConnectionTestCase(TestCase):
+    def setUp(self):
+        self.client = Client(schema)
+        for i in range(5):
+            Person.objects.create(name=f"Person {i}")
+        for i in (6, 4, 5):
+            Film.objects.create(
+                title=f"Episode {i}", episode_id=i,
+                opening_crawl="...", director="George Lucas",
+                producer="Gary Kurtz", release_date=date(1977, 5, 25)
+            )
+
+    def page(self, field, arguments, extra=''):
+        query = f'''
+            query {{
+                {field}({arguments}) {{
+                    {extra}
+                    pageInfo {{ hasNextPage hasPreviousPage startCursor endCursor }}
+                    edges {{ cursor node {{ id }} }}
+                }}
+            }}
+        '''
+        result = self.client.execute(query)
+        self.assertIsNone(result.get('errors'))
+        return result['data'][field]
+
+    def names(self, arguments):
+        query = f'query {{ allPeople({arguments}) {{ edges {{ node {{ name }} }} }} }}'
+        result = self.client.execute(query)
+        self.assertIsNone(result.get('errors'))
+        return [edge['node']['name'] for edge in result['data']['allPeople']['edges']]
+
+    def test_pages_forward_without_count(self):
+        # a single LIMIT first + 1 query, no COUNT(*)
+        with self.assertNumQueries(1):
+            first = self.page('allPeople', 'first: 2')
+        self.assertTrue(first['pageInfo']['hasNextPage'])
+        self.assertFalse(first['pageInfo']['hasPreviousPage'])
+
+        end = first['pageInfo']['endCursor']
+        self.assertEqual(self.names(f'first: 2, after: "{end}"'), ['Person 2', 'Person 3'])
+
+        last = self.page('allPeople', f'first: 10, after: "{end}"')
+        self.assertEqual(len(last['edges']), 3)
+        self.assertFalse(last['pageInfo']['hasNextPage'])
+        self.assertTrue(last['pageInfo']['hasPreviousPage'])
+
+    def test_pages_backward(self):
+        self.assertEqual(self.names('last: 2'), ['Person 3', 'Person 4'])
+        cursor = self.page('allPeople', 'last: 2')['pageInfo']['startCursor']
+        self.assertEqual(self.names(f'last: 2, before: "{cursor}"'), ['Person 1', 'Person 2'])
+
+    def test_films_are_keyed_by_episode(self):
+        first = self.page('allFilms', 'first: 1')
+        after = first['pageInfo']['endCursor']
+        query = f'query {{ allFilms(first: 5, after: "{after}") {{ edges {{ node {{ episodeId }} }} }} }}'
+        result = self.client.execute(query)
+        self.assertEqual(
+            [edge['node']['episodeId'] for edge in result['data']['allFilms']['edges']],
+            [5, 6]
+        )
+
+    def test_total_count_only_when_selected(self):
+        with self.assertNumQueries(2):
+            data = self.page('allPeople', 'first: 2', extra='totalCount')
+        self.assertEqual(data['totalCount'], 5)
+
+    def test_invalid_cursor(self):
+        result = self.client.execute('query { allPeople(after: "bogus") { edges { node { id } } } }')
+        self.assertIn('Invalid cursor', result['errors'][0]['message'])
+
+        after = encode_key(['Luke Skywalker', 'not-a-uuid'])
+        result = self.client.execute(f'query {{ allPeople(after: "{after}") {{ edges {{ node {{ id }} }} }} }}')
+        self.assertIn("Invalid cursor value for 'id'", result['errors'][0]['message'])
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.planet = Planet.objects.create(name="Tatooine")
+        self.film = Film.objects.create(
+            title="A New Hope", episode_id=4,
+            opening_crawl="It is a period of civil war...",
+            director="George Lucas", producer="Gary Kurtz",
+            release_date=date(1977, 5, 25)
+        )
+
+    def test_hit_skips_the_database(self):
+        first = self.client.get('/api/starwars/films/?b=2&a=1')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/starwars/films/?a=1&b=2')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(self.client.get('/api/starwars/cache/stats/').json()['hits'], 1)
+
+    def test_writes_invalidate_dependent_responses(self):
+        self.client.get('/api/starwars/films/')
+        self.client.get('/api/starwars/planets/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            person = Person.objects.create(name="Luke Skywalker")
+            person.films.add(self.film)
+        films = self.client.get('/api/starwars/films/').json()
+        self.assertEqual(films['results'][0]['character_count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            person.homeworld = self.planet
+            person.save()
+        planets = self.client.get('/api/starwars/planets/').json()
+        self.assertEqual(planets['results'][0]['resident_count'], 1)
+
+        stats = self.client.get('/api/starwars/cache/stats/').json()
+        self.assertEqual(stats, {'hits': 0, 'misses': 4, 'hit_rate': 0.0})
+
+    def test_versions_are_bumped_on_commit(self):
+        versions = get_versions([Film, Person])
+        with self.captureOnCommitCallbacks() as callbacks:
+            person = Person.objects.create(name="Luke Skywalker")
+            person.films.add(self.film)
+            # Not before the commit: a concurrent request would cache the
+            # old rows under the new version
+            self.assertEqual(get_versions([Film, Person]), versions)
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        new_versions = get_versions([Film, Person])
+        self.assertTrue(all(new != old for new, old in zip(new_versions, versions)))
+
+        # Nor after a rollback
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                Person.objects.create(name="Leia Organa")
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+
+    def test_errors_are_not_cached(self):
+        url = '/api/starwars/characters/?cursor=bogus'
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get('/api/starwars/cache/stats/').json()['misses'], 2)
+
+    def test_writes_survive_a_cache_outage(self):
+        with mock.patch.object(cache, 'incr', side_effect=ConnectionError), \
+                self.assertLogs('starwars.caching', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            person = Person.objects.create(name="Luke Skywalker", homeworld=self.planet)
+            person.delete()
+        self.assertFalse(Person.objects.exists())
+
+
+class PersistedQueryTestCase(TestCase):
+    query = 'query { allFilms { edges { node { title } } } }'
+
+    def setUp(self):
+        cache.clear()
+        document_cache.clear()
+        Film.objects.create(
+            title="A New Hope", episode_id=4,
+            opening_crawl="It is a period of civil war...",
+            director="George Lucas", producer="Gary Kurtz",
+            release_date=date(1977, 5, 25)
+        )
+
+    def post(self, **body):
+        return self.client.post('/graphql/', json.dumps(body), content_type='application/json')
+
+    def persisted(self, sha256_hash):
+        return {'persistedQuery': {'version': 1, 'sha256Hash': sha256_hash}}
+
+    def test_unknown_hash_then_register(self):
+        sha256_hash = hashlib.sha256(self.query.encode()).hexdigest()
+
+        response = self.post(extensions=self.persisted(sha256_hash))
+        self.assertEqual(response.json()['errors'][0]['message'], 'PersistedQueryNotFound')
+
+        response = self.post(query=self.query, extensions=self.persisted(sha256_hash))
+        self.assertEqual(response.status_code, 200)
+
+        # Later requests only send the hash, and skip parsing and validation
+        with mock.patch('starwars.graphql_views.parse') as parse:
+            response = self.post(extensions=self.persisted(sha256_hash))
+        parse.assert_not_called()
+        self.assertEqual(
+            response.json()['data']['allFilms']['edges'][0]['node']['title'],
+            'A New Hope'
+        )
+
+    @override_settings(GRAPHQL_RESULT_CACHE_TIMEOUT=60, GRAPHQL_PERSISTED_QUERY_TIMEOUT=300)
+    def test_hash_is_resolved_once_per_request(self):
+        sha256_hash = hashlib.sha256(self.query.encode()).hexdigest()
+        key = registry_key(sha256_hash)
+
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            self.post(query=self.query, extensions=self.persisted(sha256_hash))
+        self.assertEqual([c for c in add.call_args_list if c.args[0] == key], [mock.call(key, self.query, 300)])
+
+        with mock.patch.object(cache, 'get', wraps=cache.get) as get:
+            response = self.post(extensions=self.persisted(sha256_hash))
+        self.assertEqual([c for c in get.call_args_list if c.args[0] == key], [mock.call(key)])
+        self.assertIsNone(response.json().get('errors'))
+
+    def test_hash_mismatch(self):
+        response = self.post(query=self.query, extensions=self.persisted('0' * 64))
+        self.assertEqual(response.json()['errors'][0]['message'], 'provided sha does not match query')
+
+    def test_plain_queries_reuse_parsed_documents(self):
+        self.post(query=self.query)
+        with mock.patch('starwars.graphql_views.validate') as validate:
+            response = self.post(query=self.query)
+        validate.assert_not_called()
+        self.assertIsNone(response.json().get('errors'))
+
+
+@override_settings(GRAPHQL_RESULT_CACHE_TIMEOUT=60)
+class GraphQLResultCacheTestCase(TestCase):
+    query = 'query Films($first: Int) { allFilms(first: $first) { edges { node { title characterCount } } } }'
+
+    def setUp(self):
+        cache.clear()
+        self.film = Film.objects.create(
+            title="A New Hope", episode_id=4,
+            opening_crawl="It is a period of civil war...",
+            director="George Lucas", producer="Gary Kurtz",
+            release_date=date(1977, 5, 25)
+        )
+
+    def post(self, query, **variables):
+        body = {'query': query, 'variables': variables}
+        return self.client.post('/graphql/', json.dumps(body), content_type='application/json')
+
+    def test_hit_skips_execution(self):
+        first = self.post(self.query, first=5)
+        with self.assertNumQueries(0):
+            second = self.post(self.query, first=5)
+        self.assertEqual(first.content, second.content)
+
+        # Different variables are a different entry
+        with self.assertNumQueries(1):
+            self.post(self.query, first=1)
+
+    def test_writes_and_mutations_invalidate(self):
+        self.post(self.query)
+        # Caches are invalidated when the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            person = Person.objects.create(name="Luke Skywalker")
+            person.films.add(self.film)
+        data = self.post(self.query).json()['data']
+        self.assertEqual(data['allFilms']['edges'][0]['node']['characterCount'], 1)
+
+        mutation = 'mutation { createPlanet(name: "Hoth") { success } }'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post(mutation)
+        with self.assertNumQueries(1):
+            self.post(self.query)
+
+    def test_cache_outage_executes_uncached(self):
+        with mock.patch.object(cache, 'get', side_effect=ConnectionError), \
+                mock.patch.object(cache, 'set', side_effect=ConnectionError), \
+                self.assertLogs('starwars.graphql_views', 'ERROR'):
+            response = self.post(self.query, first=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['allFilms']['edges'][0]['node']['title'], 'A New Hope')
+
+    def test_mutations_bump_the_data_version_on_commit(self):
+        version = data_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.post('mutation { createPlanet(name: "Hoth") { success } }')
+            self.assertEqual(data_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(data_version(), version)
+
+    def test_mutations_and_errors_are_not_cached(self):
+        mutation = 'mutation { createPlanet(name: "Hoth") { success } }'
+        self.assertTrue(self.post(mutation).json()['data']['createPlanet']['success'])
+        self.assertFalse(self.post(mutation).json()['data']['createPlanet']['success'])
+
+        bad = 'query { allFilms(after: "bogus") { edges { node { title } } } }'
+        self.post(bad)
+        with mock.patch('starwars.graphql_views.execute', wraps=execute) as run:
+            self.post(bad)
+        run.assert_called_once()
+
+
+class QueryComplexityTestCase(TestCase):
+    query = '''
+        query People($first: Int) {
+            allPeople(first: $first) {
+                edges { node { name homeworld { name } films(first: 10) { edges { node { title } } } } }
+            }
+        }
+    '''
+
+    def setUp(self):
+        document_cache.clear()
+        Person.objects.create(name="Luke Skywalker")
+
+    def post(self, query, **variables):
+        body = {'query': query, 'variables': variables}
+        return self.client.post('/graphql/', json.dumps(body), content_type='application/json')
+
+    def test_cost_is_reported(self):
+        response = self.post(self.query, first=20)
+        self.assertEqual(response.status_code, 200)
+        # allPeople 1 + 20 * (node 1 + homeworld 1 + films (1 + 10 * node 1))
+        complexity = response.json()['extensions']['complexity']
+        self.assertEqual(complexity['cost'], 1 + 20 * 13)
+        self.assertEqual(complexity['depth'], 2)
+        self.assertEqual(response.json()['data']['allPeople']['edges'][0]['node']['name'], 'Luke Skywalker')
+
+    @override_settings(GRAPHQL_MAX_COST=100)
+    def test_expensive_query_is_rejected_before_execution(self):
+        with self.assertNumQueries(0):
+            response = self.post(self.query, first=20)
+        self.assertEqual(response.status_code, 400)
+        error = response.json()['errors'][0]
+        self.assertEqual(error['extensions']['code'], 'QUERY_TOO_EXPENSIVE')
+        self.assertNotIn('data', response.json())
+
+        # A smaller page fits the budget
+        self.assertEqual(self.post(self.query, first=5).status_code, 200)
+
+    def test_frontend_queries_fit_the_default_limits(self):
+        query = '''
+            query GetAllPlanets($first: Int) {
+                allPlanets(first: $first) {
+                    edges { node {
+                        name residentCount
+                        residents { edges { node { id name } } }
+                        films { edges { node { id title } } }
+                    } }
+                }
+            }
+        '''
+        response = self.post(query, first=100)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['extensions']['complexity']['cost'], 1 + 100 * 203)
+
+    @override_settings(GRAPHQL_MAX_COST=100)
+    def test_invalid_page_sizes_cannot_lower_the_cost(self):
+        query = '''
+            query ($first: Int, $big: Int) {
+                big: allPeople(first: $big) { edges { node { name homeworld { name } } } }
+                small: allPeople(first: $first) { edges { node { name homeworld { name } } } }
+            }
+        '''
+        response = self.post(query, big=100, first=-100000000)
+        self.assertEqual(response.json()['errors'][0]['extensions']['code'], 'QUERY_TOO_EXPENSIVE')
+
+        # Not an int: counted as a full page, and an error rather than a crash
+        response = self.post(self.query, first='20')
+        self.assertNotEqual(response.status_code, 500)
+        self.assertEqual(response.json()['errors'][0]['extensions']['code'], 'QUERY_TOO_EXPENSIVE')
+
+    @override_settings(GRAPHQL_MAX_DEPTH=3)
+    def test_deep_query_is_rejected(self):
+        fragment = '''
+            query {
+                allFilms { edges { node { ...Cast } } }
+            }
+            fragment Cast on FilmType {
+                characters { edges { node { films { edges { node { characters { edges { node { name } } } } } } } } }
+            }
+        '''
+        response = self.post(fragment)
+        self.assertEqual(response.json()['errors'][0]['extensions']['code'], 'QUERY_TOO_DEEP')
+
+
+class SwapiStandIn:
+    """Local HTTP server serving a small SWAPI-shaped dataset"""
+
+    def __init__(self, page_size=2):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}/api/'
+        self.hits = Counter()
+        self.routes = {}
+        # path -> HTTP status served instead of the payload
+        self.failures = {}
+        self.page_size = page_size
+        self.resources = self.dataset()
+        self.publish()
+
+    def url(self, resource, number):
+        return f'{self.base_url}{resource}/{number}/'
+
+    def dataset(self):
+        url = self.url
+        return {
+            'planets': [
+                {'name': 'Tatooine', 'climate': 'arid', 'terrain': 'desert', 'population': '200000', 'url': url('planets', 1)},
+                {'name': 'Alderaan', 'climate': 'temperate', 'terrain': 'mountains', 'population': '2000000000', 'url': url('planets', 2)},
+                {'name': 'Hoth', 'climate': 'frozen', 'terrain': 'tundra', 'population': 'unknown', 'url': url('planets', 3)},
+            ],
+            'films': [
+                {
+                    'title': 'A New Hope', 'episode_id': 4, 'opening_crawl': 'It is a period of civil war...',
+                    'director': 'George Lucas', 'producer': 'Gary Kurtz', 'release_date': '1977-05-25',
+                    'planets': [url('planets', 1), url('planets', 2)], 'url': url('films', 1),
+                },
+                {
+                    'title': 'The Empire Strikes Back', 'episode_id': 5, 'opening_crawl': 'It is a dark time...',
+                    'director': 'Irvin Kershner', 'producer': 'Gary Kurtz', 'release_date': '1980-05-17',
+                    'planets': [url('planets', 3)], 'url': url('films', 2),
+                },
+            ],
+            'people': [
+                {
+                    'name': 'Luke Skywalker', 'height': '172', 'mass': '77', 'gender': 'male', 'birth_year': '19BBY',
+                    'homeworld': url('planets', 1), 'films': [url('films', 1), url('films', 2)], 'url': url('people', 1),
+                },
+                {
+                    'name': 'Leia Organa', 'height': '150', 'mass': '49', 'gender': 'female', 'birth_year': '19BBY',
+                    'homeworld': url('planets', 2), 'films': [url('films', 1)], 'url': url('people', 2),
+                },
+                {
+                    'name': 'C-3PO', 'height': '167', 'mass': '75', 'gender': 'n/a', 'birth_year': '112BBY',
+                    'homeworld': url('planets', 1), 'films': [url('films', 1), url('films', 2)], 'url': url('people', 3),
+                },
+            ],
+            'species': [
+                {
+                    'name': 'Human', 'classification': 'mammal', 'language': 'Galactic Basic',
+                    'homeworld': None, 'people': [url('people', 1), url('people', 2)],
+                    'films': [url('films', 1), url('films', 2)], 'url': url('species', 1),
+                },
+                {
+                    'name': 'Droid', 'classification': 'artificial', 'language': 'n/a',
+                    'homeworld': None, 'people': [url('people', 3)], 'films': [url('films', 1)], 'url': url('species', 2),
+                },
+            ],
+        }
+
+    def publish(self):
+        """Serve every resource as pages and as individual records"""
+        self.routes.clear()
+        for resource, items in self.resources.items():
+            pages = range(0, len(items), self.page_size)
+            for number, start in enumerate(pages, 1):
+                path = f'/api/{resource}/' + (f'?page={number}' if number > 1 else '')
+                has_next = start + self.page_size < len(items)
+                self.routes[path] = {
+                    'count': len(items),
+                    'next': f'{self.base_url}{resource}/?page={number + 1}' if has_next else None,
+                    'results': items[start:start + self.page_size],
+                }
+            for item in items:
+                self.routes[item['url'].replace(self.base_url, '/api/')] = item
+
+    def handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.hits[self.path] += 1
+                payload = stand_in.routes.get(self.path)
+                status = stand_in.failures.get(self.path, 200 if payload is not None else 404)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class PopulateDataTestCase(TestCase):
+    def populate(self, stand_in, *args):
+        out = StringIO()
+        call_command('populate_data', *args, base_url=stand_in.base_url, stdout=out)
+        return out.getvalue()
+
+    def test_every_url_is_fetched_once(self):
+        with SwapiStandIn() as stand_in:
+            output = self.populate(stand_in)
+
+        self.assertIn('Successfully populated', output)
+        # Only list pages, once each: linked records come from the memoized pages
+        self.assertEqual(stand_in.hits, Counter({
+            '/api/planets/': 1, '/api/planets/?page=2': 1, '/api/films/': 1,
+            '/api/people/': 1, '/api/people/?page=2': 1, '/api/species/': 1,
+        }))
+
+        luke = Person.objects.get(name='Luke Skywalker')
+        self.assertEqual(luke.homeworld.name, 'Tatooine')
+        self.assertEqual(luke.film_count, 2)
+        self.assertEqual(Film.objects.get(episode_id=4).planet_count, 2)
+        self.assertEqual(Species.objects.get(name='Human').people_count, 2)
+
+    def test_links_are_written_in_bulk(self):
+        with SwapiStandIn() as stand_in, CaptureQueriesContext(connection) as queries:
+            self.populate(stand_in)
+
+        through_tables = {
+            descriptor.through._meta.db_table for relations in RELATIONS.values() for descriptor, _ in relations
+        }
+        inserts = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('INSERT') and any(f'"{table}"' in query['sql'] for table in through_tables)
+        ]
+        # One INSERT per relation, however many links it has
+        self.assertEqual(len(inserts), len(through_tables))
+        self.assertGreater(Person.films.through.objects.count(), 1)
+
+    def test_bulk_upsert_and_edges(self):
+        tatooine = Planet.objects.create(name='Tatooine', climate='unknown')
+        rows = [
+            {'name': 'Tatooine', 'climate': 'arid', 'swapi_url': 'https://swapi.dev/api/planets/1/'},
+            {'name': 'Hoth', 'climate': 'frozen', 'swapi_url': 'https://swapi.dev/api/planets/4/'},
+        ]
+        with self.assertNumQueries(1):
+            self.assertEqual(upsert(Planet, rows), 2)
+
+        tatooine.refresh_from_db()
+        self.assertEqual(tatooine.climate, 'arid')
+        self.assertEqual(Planet.objects.count(), 2)
+
+        film = Film.objects.create(
+            title="A New Hope", episode_id=4, opening_crawl="...",
+            director="George Lucas", producer="Gary Kurtz", release_date=date(1977, 5, 25)
+        )
+        edges = [(film.pk, pk) for pk in Planet.objects.values_list('pk', flat=True)]
+        with self.assertNumQueries(1):
+            insert_edges(Film.planets, edges)
+        # Existing edges are skipped
+        insert_edges(Film.planets, edges)
+        self.assertEqual(film.planets.count(), 2)
+
+    def test_delete_rows_applies_on_delete_without_signals(self):
+        hoth = Planet.objects.create(name='Hoth')
+        film = Film.objects.create(
+            title="The Empire Strikes Back", episode_id=5, opening_crawl="...",
+            director="Irvin Kershner", producer="Gary Kurtz", release_date=date(1980, 5, 17)
+        )
+        film.planets.add(hoth)
+        luke = Person.objects.create(name='Luke Skywalker', homeworld=hoth)
+        wampa = Species.objects.create(name='Wampa', homeworld=hoth)
+
+        # Film links, one SET_NULL per referencing model and the rows themselves
+        with self.assertNumQueries(4):
+            delete_rows(Planet, [hoth.pk])
+
+        self.assertFalse(Planet.objects.exists())
+        self.assertFalse(film.planets.exists())
+        luke.refresh_from_db()
+        wampa.refresh_from_db()
+        self.assertIsNone(luke.homeworld)
+        self.assertIsNone(wampa.homeworld)
+
+    def test_sync_applies_only_the_differences(self):
+        with SwapiStandIn() as stand_in:
+            self.populate(stand_in)
+            local = Person.objects.create(name="Local Hero")
+
+            # Nothing changed upstream: nothing is written or invalidated
+            version = data_version()
+            output = self.populate(stand_in, '--sync')
+            self.assertIn('Sync complete: 0 changes applied', output)
+            self.assertEqual(data_version(), version)
+
+            resources = stand_in.resources
+            resources['planets'][0]['climate'] = 'arid, windy'
+            resources['planets'].pop()  # Hoth
+            resources['films'][1]['planets'] = []
+            resources['people'].append({
+                'name': 'Han Solo', 'homeworld': None, 'films': [stand_in.url('films', 1)],
+                'url': stand_in.url('people', 4),
+            })
+            resources['species'][0]['people'] = [stand_in.url('people', 1)]
+            stand_in.publish()
+
+            output = self.populate(stand_in, '--sync')
+
+        self.assertIn('Planets: 0 created, 1 updated, 1 deleted, 1 unchanged', output)
+        self.assertIn('Persons: 1 created, 0 updated, 0 deleted, 3 unchanged', output)
+        self.assertIn('Species people: 0 added, 1 removed', output)
+        self.assertEqual(Planet.objects.get(name='Tatooine').climate, 'arid, windy')
+        self.assertFalse(Planet.objects.filter(name='Hoth').exists())
+        self.assertEqual(Film.objects.get(episode_id=5).planet_count, 0)
+        self.assertEqual(Person.objects.get(name='Han Solo').film_count, 1)
+        self.assertEqual(Species.objects.get(name='Human').people_count, 1)
+        # Rows that did not come from SWAPI are kept
+        self.assertTrue(Person.objects.filter(pk=local.pk).exists())
+
+    def test_sync_refuses_incomplete_listings(self):
+        with SwapiStandIn() as stand_in:
+            self.populate(stand_in)
+            counts = [model.objects.count() for model in (Planet, Film, Person, Species)]
+
+            # An empty page, and a listing that stops before its count
+            stand_in.routes['/api/species/'] = {'count': 1, 'next': None, 'results': []}
+            output = self.populate(stand_in, '--sync')
+            self.assertIn('Refusing to sync species: fetched 0 of 1 records', output)
+
+            stand_in.publish()
+            stand_in.routes['/api/planets/']['next'] = None
+            output = self.populate(stand_in, '--sync')
+            self.assertIn('Refusing to sync planets: fetched 2 of 3 records', output)
+
+        self.assertEqual([model.objects.count() for model in (Planet, Film, Person, Species)], counts)
+
+    def test_sync_uses_the_retries_option(self):
+        with mock.patch('starwars.management.commands.populate_data.SwapiClient') as client:
+            client.return_value.fetch_all.side_effect = OSError('offline')
+            call_command('populate_data', '--sync', '--retries=7', stdout=StringIO())
+        self.assertEqual(client.call_args.kwargs['retries'], 7)
+
+    def test_resume_continues_from_the_last_checkpoint(self):
+        with SwapiStandIn() as stand_in:
+            stand_in.failures['/api/people/?page=2'] = 500
+            output = self.populate(stand_in, '--retries=0')
+            self.assertIn('--resume', output)
+            # Planets, films and the first page of people were committed
+            self.assertEqual(Planet.objects.count(), 3)
+            self.assertEqual(Person.objects.count(), 2)
+            checkpoint = ImportCheckpoint.objects.get(stage='people')
+            self.assertEqual((checkpoint.page, checkpoint.completed), (1, False))
+
+            del stand_in.failures['/api/people/?page=2']
+            stand_in.hits.clear()
+            directory = tempfile.TemporaryDirectory()
+            self.addCleanup(directory.cleanup)
+            report_path = os.path.join(directory.name, 'report.json')
+            output = self.populate(stand_in, '--resume', f'--report={report_path}')
+
+        self.assertIn('Skipping planets', output)
+        self.assertIn('Populating people from page 2', output)
+        self.assertNotIn('/api/planets/?page=2', stand_in.hits)
+        self.assertEqual(Person.objects.count(), 3)
+        self.assertEqual(Person.objects.get(name='C-3PO').film_count, 2)
+
+        with open(report_path) as report:
+            report = json.load(report)
+        self.assertEqual(report['stages']['people']['rows'], 1)
+        self.assertNotIn('planets', report['stages'])
+        self.assertGreater(report['http']['requests'], 0)
+
+    def test_retries_with_backoff(self):
+        with SwapiStandIn() as stand_in, mock.patch('starwars.swapi.time.sleep') as sleep:
+            stand_in.failures['/api/films/'] = 503
+            client = SwapiClient(stand_in.base_url, retries=2)
+            with self.assertRaises(requests.HTTPError):
+                client.get(stand_in.base_url + 'films/')
+            client.close()
+
+        self.assertEqual(stand_in.hits['/api/films/'], 3)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0])
+
+
+class SnapshotTestCase(TestCase):
+    def setUp(self):
+        tatooine = Planet.objects.create(name="Tatooine", climate="arid")
+        film = Film.objects.create(
+            title="A New Hope", episode_id=4, opening_crawl="It is a period of civil war...",
+            director="George Lucas", producer="Gary Kurtz", release_date=date(1977, 5, 25)
+        )
+        film.planets.add(tatooine)
+        luke = Person.objects.create(name="Luke Skywalker", homeworld=tatooine, height="172")
+        luke.films.add(film)
+        human = Species.objects.create(name="Human", homeworld=tatooine)
+        human.people.add(luke)
+        human.films.add(film)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'starwars.ndjson.gz')
+
+    def test_round_trip(self):
+        call_command('export_snapshot', self.path, stdout=StringIO())
+        with gzip.open(self.path, 'rt') as snapshot:
+            header = json.loads(snapshot.readline())
+        self.assertEqual(header['version'], 1)
+        self.assertIn('homeworld', header['tables']['person'])
+
+        Person.objects.all().delete()
+        Film.objects.all().delete()
+        Planet.objects.all().delete()
+        Species.objects.all().delete()
+
+        out = StringIO()
+        call_command('import_snapshot', self.path, chunk_size=1, stdout=out)
+        self.assertIn('Snapshot imported successfully', out.getvalue())
+
+        luke = Person.objects.get(name="Luke Skywalker")
+        self.assertEqual(luke.homeworld.name, "Tatooine")
+        self.assertEqual(luke.height, "172")
+        self.assertEqual(luke.film_count, 1)
+        film = Film.objects.get(episode_id=4)
+        self.assertEqual(film.release_date, date(1977, 5, 25))
+        self.assertEqual(film.planet_count, 1)
+        self.assertEqual(Species.objects.get(name="Human").people_count, 1)
+
+    def test_populate_from_snapshot_merges(self):
+        call_command('export_snapshot', self.path, stdout=StringIO())
+        Planet.objects.filter(name="Tatooine").update(climate="unknown")
+
+        out = StringIO()
+        call_command('populate_data', force=False, from_snapshot=self.path, stdout=out)
+        # Already populated without --force: nothing happens
+        self.assertIn('already populated', out.getvalue())
+
+        call_command('populate_data', force=True, from_snapshot=self.path, stdout=StringIO())
+        self.assertEqual(Planet.objects.get(name="Tatooine").climate, "arid")
+        self.assertEqual(Person.objects.count(), 1)
+
+    def test_rejects_other_files(self):
+        with gzip.open(self.path, 'wt') as snapshot:
+            snapshot.write(json.dumps({'format': 'starwars-snapshot', 'version': 99}) + '\n')
+        with self.assertRaises(CommandError):
+            call_command('import_snapshot', self.path, stdout=StringIO())
+
+    def test_rejects_corrupt_lines(self):
+        call_command('export_snapshot', self.path, stdout=StringIO())
+        with gzip.open(self.path, 'rt') as snapshot:
+            lines = snapshot.readlines()
+        with gzip.open(self.path, 'wt') as snapshot:
+            snapshot.writelines(lines[:2] + ['["planet", {broken\n'] + lines[2:])
+        with self.assertRaisesMessage(CommandError, 'Corrupt snapshot line 3'):
+            call_command('import_snapshot', self.path, stdout=StringIO())
+
+    def test_rejects_truncated_files(self):
+        call_command('export_snapshot', self.path, stdout=StringIO())
+        with open(self.path, 'rb') as snapshot:
+            data = snapshot.read()
+        with open(self.path, 'wb') as snapshot:
+            snapshot.write(data[:len(data) // 2])
+        with self.assertRaisesMessage(CommandError, 'truncated'):
+            call_command('import_snapshot', self.path, stdout=StringIO())
+
+        out = StringIO()
+        call_command('populate_data', force=True, from_snapshot=self.path, stdout=out)
+        self.assertIn('Error populating data: Snapshot file is truncated', out.getvalue())
+        self.assertEqual(Person.objects.count(), 1)
+
+
+class SyntheticDataTestCase(TestCase):
+    def generate(self, **options):
+        call_command(
+            'generate_synthetic', people=300, films=12, planets=40, species=6,
+            stdout=StringIO(), **options
+        )
+        return list(Person.objects.order_by('name').values_list('name', 'homeworld__name'))
+
+    def test_volumes_and_fan_out(self):
+        self.generate()
+        self.assertEqual(Person.objects.count(), 300)
+        self.assertEqual(Film.objects.count(), 12)
+        self.assertEqual(Planet.objects.count(), 40)
+        self.assertEqual(Species.objects.count(), 6)
+
+        # Every person is in at least one film, and counters match the links
+        self.assertFalse(Person.objects.filter(film_count=0).exists())
+        self.assertEqual(
+            sum(Person.objects.values_list('film_count', flat=True)),
+            Person.films.through.objects.count()
+        )
+        # Popularity is skewed: the busiest planet has far more residents than the median
+        residents = sorted(Planet.objects.values_list('resident_count', flat=True))
+        self.assertGreater(residents[-1], 4 * residents[len(residents) // 2])
+
+    def test_same_seed_same_data(self):
+        first = self.generate(seed=7)
+        self.assertEqual(self.generate(seed=7, clear=True), first)
+        self.assertNotEqual(self.generate(seed=8, clear=True), first)
+
+    def test_rerun_needs_clear(self):
+        first = self.generate(seed=7)
+        with self.assertRaises(CommandError):
+            self.generate(seed=7)
+        self.assertEqual(self.generate(seed=7, clear=True), first)
+        # The bulk clear also empties the through tables
+        self.assertEqual(
+            Person.films.through.objects.count(),
+            sum(Person.objects.values_list('film_count', flat=True)),
+        )
+
+
+class BenchmarkTestCase(TestCase):
+    def test_query_budgets_hold_on_synthetic_data(self):
+        call_command(
+            'generate_synthetic', people=400, films=12, planets=40, species=6, stdout=StringIO()
+        )
+        budgets = load_budgets()
+        self.assertEqual({case.name for case in build_cases()}, set(budgets))
+
+        # Timing and memory depend on the machine; query counts must not
+        query_budgets = {name: {'queries': budget['queries']} for name, budget in budgets.items()}
+        results = run_benchmarks('small', query_budgets, repeat=1)
+        self.assertEqual([r for r in results if r['violations']], [])
+
+    def test_composite_indexes_change_plans(self):
+        call_command(
+            'generate_synthetic', people=400, films=12, planets=40, species=6, stdout=StringIO()
+        )
+        plans = compare_plans('small')
+        self.assertEqual(len(plans), 7)
+        for plan in plans:
+            self.assertTrue(plan['uses_index'], plan)
+            self.assertNotEqual(plan['before'], plan['after'])
+        # The dropped indexes are back
+        self.assertEqual(compare_plans('small'), plans)
+
+    def test_check_budget(self):
+        budget = {'queries': 2, 'peak_memory_kb': {'medium': 100}}
+        # Wall time has no absolute budget, only a baseline to compare with
+        self.assertEqual(check_budget(Measurement(500.0, 2, 10, 500), budget, 'small'), [])
+        self.assertEqual(check_budget(Measurement(14.0, 2, 10, 500), budget, 'small', 10.0), [])
+        self.assertEqual(
+            check_budget(Measurement(16.0, 3, 10, 500), budget, 'medium', 10.0),
+            ['3 queries > 2', 'peak_memory_kb 500 > 100', 'wall_ms 16 > baseline 10 + 50%'],
+        )
+
+
+@override_settings(PROFILING=False, PROFILING_ALLOW_HEADER=True, RESPONSE_CACHE_TIMEOUT=0)
+class ProfilingTestCase(TestCase):
+    query = 'query { allPeople { edges { node { name homeworld { name } films { edges { node { title } } } } } } }'
+
+    def setUp(self):
+        tatooine = Planet.objects.create(name="Tatooine", climate="arid", terrain="desert")
+        film = Film.objects.create(
+            title="A New Hope", episode_id=4, opening_crawl="...",
+            director="George Lucas", producer="Gary Kurtz", release_date=date(1977, 5, 25)
+        )
+        for name in ("Luke Skywalker", "Owen Lars", "Beru Whitesun lars"):
+            Person.objects.create(name=name, homeworld=tatooine).films.add(film)
+
+    def graphql(self, **headers):
+        return self.client.post(
+            '/graphql/', json.dumps({'query': self.query}), content_type='application/json', **headers
+        )
+
+    def test_disabled_without_the_header(self):
+        response = self.client.get('/api/starwars/characters/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('tracing', self.graphql().json().get('extensions', {}))
+
+        with override_settings(PROFILING_ALLOW_HEADER=False):
+            response = self.client.get('/api/starwars/characters/', HTTP_X_PROFILE='1')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_rest_server_timing(self):
+        response = self.client.get('/api/starwars/characters/', HTTP_X_PROFILE='1')
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="2 queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertNotIn('duplicates', timing)
+
+    def test_graphql_tracing_and_profile(self):
+        extensions = self.graphql(HTTP_X_PROFILE='1').json()['extensions']
+        resolvers = extensions['tracing']['execution']['resolvers']
+        self.assertIn(['allPeople'], [resolver['path'] for resolver in resolvers])
+        self.assertIn('complexity', extensions)
+
+        # Homeworlds are joined and films prefetched for the whole page
+        profile = extensions['profile']
+        self.assertEqual(profile['nPlusOne'], [])
+        self.assertEqual(profile['similarQueries'], [])
+        self.assertEqual(profile['queries'], 2)
+
+    def test_repeated_queries_are_flagged(self):
+        profile = Profile()
+        tracer = profile.resolver_middleware()
+        with connection.execute_wrapper(profile):
+            for index, person in enumerate(Person.objects.all()):
+                info = SimpleNamespace(
+                    path=SimpleNamespace(as_list=lambda index=index: ['people', index, 'films']),
+                    parent_type='PersonType', field_name='films', return_type='[FilmType]',
+                )
+                tracer.resolve(lambda root, info: list(root.films.all()), person, info)
+            Planet.objects.count()
+            Planet.objects.count()
+
+        extensions = profile.graphql_extensions()['profile']
+        self.assertEqual(extensions['nPlusOne'], [{'path': 'people.films', 'resolvers': 3, 'queries': 3}])
+        self.assertEqual(len(extensions['similarQueries']), 1)
+        self.assertEqual([d['count'] for d in extensions['duplicateQueries']], [2])
+        self.assertIn('duplicates;desc="1 repeated queries"', profile.server_timing())
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        metrics.flush()
+        cache.clear()
+        Person.objects.create(name="Luke Skywalker")
+
+    def scrape(self):
+        response = self.client.get('/api/starwars/metrics/')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_route_and_operation_histograms(self):
+        self.client.get('/api/starwars/characters/')
+        self.client.get('/api/starwars/characters/')
+        self.client.post(
+            '/graphql/',
+            json.dumps({'query': 'query GetAllPeople { allPeople { edges { node { name } } } }',
+                        'operationName': 'GetAllPeople'}),
+            content_type='application/json',
+        )
+        text = self.scrape()
+
+        route = 'method="GET",route="api/starwars/characters/"'
+        self.assertIn(f'starwars_http_request_duration_seconds_count{{{route}}} 2', text)
+        self.assertIn(f'starwars_http_request_duration_seconds_bucket{{{route},le="+Inf"}} 2', text)
+        # The page and its COUNT(*)
+        self.assertIn(f'starwars_http_request_sql_queries_bucket{{{route},le="1"}} 0', text)
+        self.assertIn(f'starwars_http_request_sql_queries_bucket{{{route},le="2"}} 2', text)
+        self.assertIn(f'starwars_http_requests_total{{{route},status="200"}} 2', text)
+        self.assertIn('starwars_graphql_operation_duration_seconds_count{operation="GetAllPeople"} 1', text)
+        self.assertIn('# TYPE starwars_cache_hits_total counter', text)
+
+    def test_view_errors(self):
+        with mock.patch.object(Person.objects, 'count', side_effect=RuntimeError('boom')):
+            response = self.client.get('/api/starwars/stats/')
+        self.assertEqual(response.status_code, 500)
+        self.assertIn(
+            'starwars_view_errors_total{exception="RuntimeError",view="stats"} 1', self.scrape()
+        )
+
+    def test_workers_share_counters(self):
+        first, second = Metrics(), Metrics()
+        first.inc('starwars_http_requests_total', {'status': '200'})
+        first.inc('starwars_http_requests_total', {'status': '404'})
+        second.inc('starwars_http_requests_total', {'status': '200'}, 2)
+        first.flush()
+        # A concurrent registry write from another worker drops first's series...
+        cache.set(REGISTRY_KEY, [])
+        second.flush()
+        self.assertEqual(len(cache.get(REGISTRY_KEY)), 1)
+        # ...which first re-adds on its next flush
+        first.flush()
+
+        values = shared_values()
+        self.assertEqual(values['starwars_http_requests_total', (('status', '200'),)], 3)
+        self.assertEqual(values['starwars_http_requests_total', (('status', '404'),)], 1)
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class SearchTestCase(TestCase):
+    def setUp(self):
+        tatooine = Planet.objects.create(name="Tatooine")
+        Planet.objects.create(name="Alderaan")
+        Person.objects.create(name="Luke Skywalker", homeworld=tatooine)
+        Person.objects.create(name="Anakin Skywalker", homeworld=tatooine)
+        Person.objects.create(name="R2-D2 (astromech)")
+        Film.objects.create(
+            title="A New Hope", episode_id=4, opening_crawl="...",
+            director="George Lucas", producer="Gary Kurtz", release_date=date(1977, 5, 25)
+        )
+        Species.objects.create(name="Wookie")
+
+    def test_ranked_across_kinds(self):
+        hits = search('sky')
+        self.assertEqual({(kind, obj.name) for kind, _, obj in hits}, {
+            ('person', 'Luke Skywalker'), ('person', 'Anakin Skywalker'),
+        })
+        # The name the text covers most ranks first
+        self.assertEqual([obj.name for _, _, obj in search('oo')], ['Wookie', 'Tatooine'])
+        self.assertEqual([obj.title for _, _, obj in search('hope', ['film'])], ['A New Hope'])
+        self.assertEqual(search('  '), [])
+
+    def test_index_friendly_filter_matches_literally(self):
+        with mock.patch('starwars.search.trigram_supported', return_value=True):
+            condition = contains_filter('name', 'r2-d2 (a')
+        self.assertEqual(condition.children, [('name__iregex', r'r2\-d2\ \(a')])
+        self.assertEqual(
+            list(Person.objects.filter(condition).values_list('name', flat=True)), ['R2-D2 (astromech)']
+        )
+
+    def test_rest_endpoint(self):
+        response = self.client.get('/api/starwars/search/', {'q': 'a', 'types': 'planet', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['type'], 'planet')
+
+        self.assertEqual(self.client.get('/api/starwars/search/').status_code, 400)
+        response = self.client.get('/api/starwars/search/', {'q': 'a', 'types': 'vehicle'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_graphql_search(self):
+        result = Client(schema).execute('''
+            query {
+              search(text: "tatoo") {
+                kind score
+                node { ... on PlanetType { name residentCount } }
+              }
+            }
+        ''')
+        self.assertIsNone(result.get('errors'))
+        self.assertEqual(result['data']['search'][0]['kind'], 'planet')
+        self.assertEqual(result['data']['search'][0]['node'], {'name': 'Tatooine', 'residentCount': 2})
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class AutocompleteTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete.clear()
+        tatooine = Planet.objects.create(name="Tatooine")
+        Person.objects.create(name="Luke Skywalker", homeworld=tatooine)
+        Person.objects.create(name="Anakin Skywalker", homeworld=tatooine)
+        Person.objects.create(name="Lobot")
+        Species.objects.create(name="Wookie")
+
+    def test_prefix_index(self):
+        index = PrefixIndex([(1, "Luke Skywalker"), (2, "Lobot"), (3, "Sly Moore"), (4, "Darth  Luke")])
+        # Whole names first, then names with a later word starting with the prefix
+        self.assertEqual(index.lookup('l', 10), [("Lobot", 2), ("Luke Skywalker", 1), ("Darth  Luke", 4)])
+        self.assertEqual(index.lookup('s', 10), [("Sly Moore", 3), ("Luke Skywalker", 1)])
+        self.assertEqual(index.lookup('luke s', 10), [("Luke Skywalker", 1)])
+        self.assertEqual(index.lookup('l', 1), [("Lobot", 2)])
+        self.assertEqual(index.lookup('x', 10), [])
+
+    def test_answers_without_queries_once_built(self):
+        self.assertEqual(
+            [name for _, name, _ in autocomplete.complete('sky')], ["Anakin Skywalker", "Luke Skywalker"]
+        )
+        with self.assertNumQueries(0):
+            hits = autocomplete.complete('L', ['person', 'planet'])
+        self.assertEqual([(kind, name) for kind, name, _ in hits], [('person', "Lobot"), ('person', "Luke Skywalker")])
+        self.assertEqual(autocomplete.complete('  '), [])
+        with self.assertRaises(ValueError):
+            autocomplete.complete('a', ['vehicle'])
+
+    def test_saves_invalidate_on_commit(self):
+        autocomplete.complete('w')
+        with self.captureOnCommitCallbacks() as callbacks:
+            Species.objects.create(name="Wampa")
+            self.assertEqual([name for _, name, _ in autocomplete.complete('w', ['species'])], ["Wookie"])
+        for callback in callbacks:
+            callback()
+        self.assertEqual([name for _, name, _ in autocomplete.complete('w', ['species'])], ["Wampa", "Wookie"])
+
+    @override_settings(AUTOCOMPLETE_VERSION_CHECK_INTERVAL=0)
+    def test_cache_outage_keeps_answering(self):
+        autocomplete.complete('l')
+        with mock.patch.object(cache, 'get_many', side_effect=ConnectionError), \
+                self.assertLogs('starwars.autocomplete', 'ERROR'):
+            # The built index keeps answering, a missing one is built from the database
+            self.assertEqual([name for _, name, _ in autocomplete.complete('l', ['person'])], ["Lobot", "Luke Skywalker"])
+            self.assertEqual([name for _, name, _ in autocomplete.complete('w', ['species'])], ["Wookie"])
+            response = self.client.get('/api/starwars/autocomplete/', {'q': 'sky'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_version_bump_from_another_worker_invalidates(self):
+        autocomplete.complete('t')
+        # A write in another worker only bumps the shared version
+        Planet.objects.filter(name="Tatooine").update(name="Tatooine II")
+        with override_settings(AUTOCOMPLETE_VERSION_CHECK_INTERVAL=60):
+            bump_versions(Planet)
+            self.assertEqual([name for _, name, _ in autocomplete.complete('t')], ["Tatooine"])
+        with override_settings(AUTOCOMPLETE_VERSION_CHECK_INTERVAL=0):
+            self.assertEqual([name for _, name, _ in autocomplete.complete('t')], ["Tatooine II"])
+
+    def test_endpoints(self):
+        response = self.client.get('/api/starwars/autocomplete/', {'q': 'sky', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['name'], "Anakin Skywalker")
+        self.assertEqual(self.client.get('/api/starwars/autocomplete/').status_code, 400)
+
+        luke = Person.objects.get(name="Luke Skywalker")
+        result = Client(schema).execute('{ autocomplete(prefix: "luke") { kind id name } }')
+        self.assertNotIn('errors', result)
+        self.assertEqual(result['data']['autocomplete'], [
+            {'kind': 'person', 'id': to_global_id('PersonType', luke.pk), 'name': "Luke Skywalker"},
+        ])
+
+
+class MeasurementTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tatooine = Planet.objects.create(
+            name="Tatooine", diameter="10465", population="200000", surface_water="1"
+        )
+        Planet.objects.create(name="Coruscant", diameter="12240", population="1,000,000,000,000")
+        Planet.objects.create(name="Hoth", diameter="7200", population="unknown")
+        for name, height, mass in [
+            ("Luke Skywalker", "172", "77"), ("Darth Vader", "202", "136"),
+            ("Jabba Desilijic Tiure", "175", "1,358"), ("Yoda", "66", "17"),
+            ("Arvel Crynyd", "unknown", "unknown"), ("Finis Valorum", "170", "unknown"),
+        ]:
+            Person.objects.create(name=name, height=height, mass=mass, homeworld=self.tatooine)
+
+    def names(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()['results']]
+
+    def test_parse_number(self):
+        self.assertEqual(parse_number("1,358"), 1358.0)
+        self.assertEqual(parse_number("78.2", int), 78)
+        self.assertEqual(parse_number(" 66 ", int), 66)
+        for text in ("unknown", "n/a", "", None, "nan"):
+            self.assertIsNone(parse_number(text))
+
+    def test_out_of_range_integers_are_null(self):
+        person = Person.objects.create(name="Giant", height="99999999999", mass="1e300")
+        person.refresh_from_db()
+        self.assertEqual((person.height_value, person.mass_value), (None, 1e300))
+
+        upsert(Planet, [
+            {'name': 'Coruscant', 'diameter': '1e300', 'population': '1000000000000'},
+        ])
+        planet = Planet.objects.get(name='Coruscant')
+        self.assertEqual((planet.diameter_value, planet.population_value), (None, 1000000000000))
+
+    def test_filled_on_save_and_import(self):
+        jabba = Person.objects.get(name="Jabba Desilijic Tiure")
+        self.assertEqual((jabba.height_value, jabba.mass_value), (175, 1358.0))
+        jabba.mass = "unknown"
+        jabba.save()
+        jabba.refresh_from_db()
+        self.assertIsNone(jabba.mass_value)
+
+        upsert(Planet, [{'name': "Hoth", 'diameter': "7,200", 'population': "12"}])
+        self.assertEqual(
+            Planet.objects.filter(name="Hoth").values_list('diameter_value', 'population_value').get(),
+            (7200, 12),
+        )
+
+    def test_backfill_migration(self):
+        Person.objects.update(height_value=None, mass_value=None)
+        migration = importlib.import_module('starwars.migrations.0006_numeric_measurements')
+        migration.backfill_values(apps, None)
+        self.assertEqual(Person.objects.get(name="Yoda").height_value, 66)
+        self.assertEqual(Person.objects.filter(mass_value__isnull=False).count(), 4)
+
+    def test_characters_range_and_order(self):
+        url = '/api/starwars/characters/'
+        self.assertEqual(
+            self.names(self.client.get(url, {'height_min': 150, 'height_max': 200, 'order': '-mass'})),
+            ["Jabba Desilijic Tiure", "Luke Skywalker", "Finis Valorum"],
+        )
+        # Unknown values sort last either way
+        self.assertEqual(self.names(self.client.get(url, {'order': 'height'}))[-1], "Arvel Crynyd")
+        self.assertEqual(self.names(self.client.get(url, {'order': '-height'}))[-1], "Arvel Crynyd")
+        self.assertEqual(self.client.get(url, {'mass_min': 'heavy'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'order': 'gender'}).status_code, 400)
+
+    def test_keyset_pages_cross_unknown_values(self):
+        expected = self.names(self.client.get('/api/starwars/characters/', {'order': '-mass'}))
+        seen, params = [], {'order': '-mass', 'pagination': 'keyset', 'page_size': 2}
+        while True:
+            data = self.client.get('/api/starwars/characters/', params).json()
+            seen += [row['name'] for row in data['results']]
+            if not data['next']:
+                break
+            params = {'order': '-mass', 'page_size': 2, 'cursor': data['next']}
+        self.assertEqual(seen, expected)
+        self.assertEqual(expected[-2:], ["Arvel Crynyd", "Finis Valorum"])
+
+        previous = self.client.get('/api/starwars/characters/', {**params, 'cursor': data['previous']}).json()
+        self.assertEqual([row['name'] for row in previous['results']], expected[2:4])
+
+    def test_planets_range_and_order(self):
+        url = '/api/starwars/planets/'
+        self.assertEqual(
+            self.names(self.client.get(url, {'population_min': 1000000})), ["Coruscant"]
+        )
+        self.assertEqual(
+            self.names(self.client.get(url, {'order': '-diameter'})), ["Coruscant", "Tatooine", "Hoth"]
+        )
+        self.assertEqual(self.names(self.client.get(url, {'order': 'population'})), ["Tatooine", "Coruscant", "Hoth"])
+
+    def test_graphql_connections(self):
+        query = '''
+            query ($after: String) {
+              allPeople(first: 3, order: "-mass", heightMin: 100, after: $after) {
+                edges { cursor node { name massValue } }
+                pageInfo { hasNextPage endCursor }
+              }
+            }
+        '''
+        client = Client(schema)
+        first = client.execute(query)
+        self.assertNotIn('errors', first)
+        page = first['data']['allPeople']
+        self.assertEqual(
+            [edge['node']['name'] for edge in page['edges']],
+            ["Jabba Desilijic Tiure", "Darth Vader", "Luke Skywalker"],
+        )
+        self.assertTrue(page['pageInfo']['hasNextPage'])
+        second = client.execute(query, variables={'after': page['pageInfo']['endCursor']})
+        self.assertEqual([edge['node']['name'] for edge in second['data']['allPeople']['edges']], ["Finis Valorum"])
+
+        result = client.execute('{ allPlanets(order: "diameter", diameterMax: 11000) { edges { node { name } } } }')
+        self.assertEqual([edge['node']['name'] for edge in result['data']['allPlanets']['edges']], ["Hoth", "Tatooine"])
+        self.assertIn('errors', client.execute('{ allPeople(order: "skin") { edges { node { name } } } }'))
+
+
+class TextSearchTestCase(TestCase):
+    def setUp(self):
+        Film.objects.create(
+            title="A New Hope", episode_id=4,
+            opening_crawl="Rebel spies managed to steal secret plans to the Empire's "
+                          "ultimate weapon, the DEATH STAR, an armored space station.",
+            director="George Lucas", producer="Gary Kurtz", release_date=date(1977, 5, 25)
+        )
+        for index, name in enumerate(["Tatooine", "Jakku", "Geonosis"]):
+            Planet.objects.create(name=name, climate="arid", terrain="desert" + ", desert" * index)
+        Species.objects.create(name="Wookie", classification="mammal", language="Shyriiwook")
+
+    def test_ranked_and_highlighted(self):
+        result = text_search('death star')
+        self.assertEqual(result.count, 1)
+        hit = result.hits[0]
+        self.assertEqual((hit.kind, hit.obj.title), ('film', 'A New Hope'))
+        self.assertIn('<mark>DEATH</mark> <mark>STAR</mark>', hit.headline)
+
+        # Every word must match, in any of the document's fields
+        self.assertEqual(text_search('death wookie').count, 0)
+        self.assertEqual(text_search('wookie mammal').hits[0].obj.name, 'Wookie')
+
+        # More (and heavier) occurrences rank higher
+        names = [hit.obj.name for hit in text_search('desert', ['planet']).hits]
+        self.assertEqual(names, ['Geonosis', 'Jakku', 'Tatooine'])
+
+        with self.assertRaises(ValueError):
+            text_search('desert', ['person'])
+
+    def test_rest_pagination(self):
+        response = self.client.get('/api/starwars/search/text/', {'q': 'desert', 'page_size': 2, 'page': 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['count'], data['page'], data['total_pages']), (3, 2, 2))
+        self.assertEqual([hit['name'] for hit in data['results']], ['Tatooine'])
+        self.assertFalse(data['has_next'])
+        self.assertTrue(data['has_previous'])
+
+        response = self.client.get('/api/starwars/search/text/', {'q': 'desert', 'types': 'person'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_graphql_text_search(self):
+        result = Client(schema).execute('''
+            query {
+              textSearch(text: "spies", pageSize: 5) {
+                totalCount page totalPages hasNext
+                hits { kind headline node { ... on FilmType { title episodeId } } }
+              }
+            }
+        ''')
+        self.assertIsNone(result.get('errors'))
+        page = result['data']['textSearch']
+        self.assertEqual((page['totalCount'], page['totalPages'], page['hasNext']), (1, 1, False))
+        self.assertEqual(page['hits'][0]['node'], {'title': 'A New Hope', 'episodeId': 4})
+        self.assertIn('<mark>spies</mark>', page['hits'][0]['headline'])
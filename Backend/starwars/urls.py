@@ -6,6 +6,8 @@ app_name = 'starwars'
 urlpatterns = [
     path('status/', views.status_view, name='status'),
     path('stats/', views.stats_view, name='stats'),
+    path('cache/stats/', views.cache_stats_view, name='cache-stats'),
+    path('metrics/', views.metrics_view, name='metrics'),
     
   
     path('characters/', views.characters_list_view, name='characters-list'),
@@ -15,4 +17,7 @@ urlpatterns = [
     
     path('films/', views.films_list_view, name='films-list'),
     path('planets/', views.planets_list_view, name='planets-list'),
+    path('search/', views.search_view, name='search'),
+    path('search/text/', views.text_search_view, name='text-search'),
+    path('autocomplete/', views.autocomplete_view, name='autocomplete'),
 ]
\ No newline at end of file
@@ -1,8 +1,20 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
 from django.db.models import Q
 from .models import Person, Film, Planet, Species
+from .autocomplete import (
+    DEFAULT_LIMIT as AUTOCOMPLETE_DEFAULT_LIMIT, MAX_LIMIT as AUTOCOMPLETE_MAX_LIMIT, autocomplete,
+)
+from .caching import cache_response, cache_stats
+from .measurements import NUMERIC_FIELDS, order_keys, range_filter
+from .metrics import count_error, render
+from .pagination import InvalidCursor, InvalidPage, KeysetPage, keyset_ordering, nullable_keys, page_params
+from .search import DEFAULT_LIMIT, MAX_LIMIT, SEARCH_MODELS, contains_filter, search, text_search
+from .serializers import (
+    character_values, serialize_characters, serialize_character_detail,
+    serialize_character_films, serialize_films, serialize_planets,
+)
 import json
 
 from rest_framework.decorators import api_view
@@ -40,6 +52,33 @@ page_size_param = openapi.Parameter(
     maximum=100
 )
 
+pagination_param = openapi.Parameter(
+    'pagination',
+    openapi.IN_QUERY,
+    description="Modo de paginación: `page` (por defecto, con OFFSET) o `keyset` (por cursor, coste constante en páginas profundas)",
+    type=openapi.TYPE_STRING,
+    required=False,
+    enum=['page', 'keyset'],
+    default='page'
+)
+
+cursor_param = openapi.Parameter(
+    'cursor',
+    openapi.IN_QUERY,
+    description="Cursor opaco devuelto en `next`/`previous` (implica paginación keyset)",
+    type=openapi.TYPE_STRING,
+    required=False
+)
+
+include_count_param = openapi.Parameter(
+    'include_count',
+    openapi.IN_QUERY,
+    description="En paginación keyset, incluir el total (`count`); requiere un COUNT(*) adicional",
+    type=openapi.TYPE_BOOLEAN,
+    required=False,
+    default=False
+)
+
 error_response = openapi.Response(
     description="Error en la operación",
     schema=openapi.Schema(
@@ -52,6 +91,40 @@ error_response = openapi.Response(
 )
 
 
+def measurement_params(model):
+    """Filtros `<campo>_min`/`<campo>_max` (inclusivos) sobre las medidas numéricas de `model`"""
+    return [
+        openapi.Parameter(
+            f'{field}_{suffix}',
+            openapi.IN_QUERY,
+            description=f"{label} de `{field}`; los valores desconocidos no coinciden",
+            type=openapi.TYPE_NUMBER,
+            required=False
+        )
+        for field in NUMERIC_FIELDS[model]
+        for suffix, label in (('min', 'Mínimo'), ('max', 'Máximo'))
+    ]
+
+
+def order_param(model):
+    choices = [*model._meta.ordering, *NUMERIC_FIELDS[model]]
+    return openapi.Parameter(
+        'order',
+        openapi.IN_QUERY,
+        description="Campo de ordenación; con `-` delante, descendente. Los valores desconocidos van al final",
+        type=openapi.TYPE_STRING,
+        required=False,
+        enum=[f'{sign}{choice}' for choice in choices for sign in ('', '-')],
+        default=model._meta.ordering[0]
+    )
+
+
+def measurement_ordering(model, queryset, order):
+    """`queryset` ordered by `order` (see measurements.order_keys) in SQL"""
+    keys = order_keys(model, order)
+    return queryset.order_by(*keyset_ordering(keys, True, nullable_keys(model, keys)))
+
+
 @swagger_auto_schema(
     method='get',
     operation_summary="Estado de la API",
@@ -105,6 +178,7 @@ def status_view(request):
 )
 @api_view(['GET'])
 @csrf_exempt
+@cache_response(Person, Film, Planet, Species)
 def stats_view(request):
     """API statistics endpoint"""
     try:
@@ -116,12 +190,67 @@ def stats_view(request):
         }
         return JsonResponse(stats)
     except Exception as e:
+        count_error('stats', e)
         return JsonResponse({
             'error': 'Failed to fetch statistics',
             'message': str(e)
         }, status=500)
 
 
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Estadísticas de la caché de respuestas",
+    operation_description="Aciertos y fallos acumulados de la caché de respuestas REST (Redis)",
+    responses={
+        200: openapi.Response(
+            description="Estadísticas de la caché",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'hits': openapi.Schema(type=openapi.TYPE_INTEGER, example=120),
+                    'misses': openapi.Schema(type=openapi.TYPE_INTEGER, example=8),
+                    'hit_rate': openapi.Schema(type=openapi.TYPE_NUMBER, example=0.94),
+                }
+            )
+        ),
+        500: error_response
+    },
+    tags=['System']
+)
+@api_view(['GET'])
+@csrf_exempt
+def cache_stats_view(request):
+    """Response cache hit/miss counters"""
+    try:
+        return JsonResponse(cache_stats())
+    except Exception as e:
+        count_error('cache_stats', e)
+        return JsonResponse({
+            'error': 'Failed to fetch cache statistics',
+            'message': str(e)
+        }, status=500)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Métricas en formato Prometheus",
+    operation_description=(
+        "Histogramas de latencia por ruta y por operación GraphQL, consultas SQL por petición, "
+        "errores de las vistas, aciertos y fallos de caché y conexiones a la base de datos. "
+        "Agregado entre todos los procesos worker."
+    ),
+    responses={
+        200: openapi.Response(description="Métricas en formato de texto de Prometheus"),
+    },
+    tags=['System']
+)
+@api_view(['GET'])
+@csrf_exempt
+def metrics_view(request):
+    """Prometheus scrape endpoint"""
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @swagger_auto_schema(
     method='get',
     operation_summary="Lista de personajes de Star Wars",
@@ -131,15 +260,23 @@ def stats_view(request):
     **Características:**
     - Paginación automática (20 elementos por página por defecto)
     - Filtro por nombre (búsqueda insensible a mayúsculas)
+    - Filtros por rango y ordenación por altura y peso, resueltos en SQL sobre columnas numéricas indexadas
     - Incluye información del planeta natal
-    - Optimizado con select_related y prefetch_related
+    - Optimizado con select_related y contadores almacenados
     
     **Ejemplos:**
     - `/api/starwars/characters/` - Todos los personajes
     - `/api/starwars/characters/?name=luke` - Personajes que contengan "luke"
     - `/api/starwars/characters/?page=2&page_size=10` - Segunda página con 10 elementos
+    - `/api/starwars/characters/?pagination=keyset` - Primera página con cursores `next`/`previous`
+    - `/api/starwars/characters/?cursor=<next>` - Página siguiente (sin OFFSET ni COUNT)
+    - `/api/starwars/characters/?height_min=150&order=-mass` - Desde 150 cm, del más pesado al más ligero
     """,
-    manual_parameters=[name_param, page_param, page_size_param],
+    manual_parameters=[
+        name_param, page_param, page_size_param,
+        pagination_param, cursor_param, include_count_param,
+        *measurement_params(Person), order_param(Person),
+    ],
     responses={
         200: openapi.Response(
             description="Lista de personajes obtenida exitosamente",
@@ -179,58 +316,57 @@ def stats_view(request):
                     'page': openapi.Schema(type=openapi.TYPE_INTEGER, description="Página actual"),
                     'total_pages': openapi.Schema(type=openapi.TYPE_INTEGER, description="Total de páginas"),
                     'has_next': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Hay página siguiente"),
-                    'has_previous': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Hay página anterior")
+                    'has_previous': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Hay página anterior"),
+                    'next': openapi.Schema(type=openapi.TYPE_STRING, description="Cursor de la página siguiente (solo keyset)"),
+                    'previous': openapi.Schema(type=openapi.TYPE_STRING, description="Cursor de la página anterior (solo keyset)")
                 }
             )
         ),
+        400: error_response,
         500: error_response
     },
     tags=['Characters']
 )
 @api_view(['GET'])
 @csrf_exempt
+@cache_response(Person, Planet)
 def characters_list_view(request):
     """
     Ver un listado de todos los personajes del universo Star Wars
     Con opción de filtrar por nombre (Requisito 1)
     GET /api/characters/?name=luke&page=1&page_size=10
+    GET /api/characters/?pagination=keyset&cursor=<next>
+    GET /api/characters/?height_min=150&order=-mass
     """
     try:
         
         name_filter = request.GET.get('name', '')
-        page = int(request.GET.get('page', 1))
-        page_size = min(int(request.GET.get('page_size', 20)), 100)
+        page, page_size = page_params(request.GET)
+        cursor = request.GET.get('cursor')
+        order = request.GET.get('order')
         
-        queryset = Person.objects.select_related('homeworld').prefetch_related('films')
+        queryset = character_values(Person.objects.filter(range_filter(Person, request.GET)))
         
         if name_filter:
-            queryset = queryset.filter(name__icontains=name_filter)
+            queryset = queryset.filter(contains_filter('name', name_filter))
+        
+        if cursor or request.GET.get('pagination') == 'keyset':
+            page_obj = KeysetPage(queryset, order_keys(Person, order), page_size, cursor)
+            data = {
+                'results': serialize_characters(page_obj),
+                'next': page_obj.next_cursor,
+                'previous': page_obj.previous_cursor,
+                'has_next': page_obj.has_next,
+                'has_previous': page_obj.has_previous,
+            }
+            if request.GET.get('include_count', '').lower() in ('1', 'true'):
+                data['count'] = queryset.count()
+            return JsonResponse(data)
         
-        paginator = Paginator(queryset, page_size)
+        paginator = Paginator(measurement_ordering(Person, queryset, order), page_size)
         page_obj = paginator.get_page(page)
         
-        characters = []
-        for character in page_obj:
-            characters.append({
-                'id': str(character.id),
-                'name': character.name,
-                'gender': character.gender,
-                'birth_year': character.birth_year,
-                'height': character.height,
-                'mass': character.mass,
-                'hair_color': character.hair_color,
-                'skin_color': character.skin_color,
-                'eye_color': character.eye_color,
-                'homeworld': {
-                    'id': str(character.homeworld.id) if character.homeworld else None,
-                    'name': character.homeworld.name if character.homeworld else None,
-                    'climate': character.homeworld.climate if character.homeworld else None,
-                    'terrain': character.homeworld.terrain if character.homeworld else None,
-                } if character.homeworld else None,
-                'films_count': character.films.count(),
-                'films_url': f'/api/characters/{character.id}/films/',
-                'created': character.created.isoformat(),
-            })
+        characters = serialize_characters(page_obj)
         
         return JsonResponse({
             'results': characters,
@@ -241,7 +377,23 @@ def characters_list_view(request):
             'has_previous': page_obj.has_previous(),
         })
         
+    except InvalidCursor as e:
+        return JsonResponse({
+            'error': 'Invalid cursor',
+            'message': str(e)
+        }, status=400)
+    except InvalidPage as e:
+        return JsonResponse({
+            'error': 'Invalid pagination',
+            'message': str(e)
+        }, status=400)
+    except ValueError as e:
+        return JsonResponse({
+            'error': 'Invalid filter',
+            'message': str(e)
+        }, status=400)
     except Exception as e:
+        count_error('characters_list', e)
         return JsonResponse({
             'error': 'Failed to fetch characters',
             'message': str(e)
@@ -347,6 +499,7 @@ def characters_list_view(request):
 )
 @api_view(['GET'])
 @csrf_exempt
+@cache_response(Person, Film, Planet)
 def character_films_view(request, character_id):
     """
     Para cada personaje, consultar las películas en las que aparece (Requisito principal)
@@ -354,50 +507,7 @@ def character_films_view(request, character_id):
     GET /api/characters/{id}/films/
     """
     try:
-        character = Person.objects.select_related('homeworld').prefetch_related(
-            'films__planets'
-        ).get(id=character_id)
-        
-        films = []
-        for film in character.films.all().order_by('episode_id'):
-            films.append({
-                'id': str(film.id),
-                'title': film.title,
-                'episode_id': film.episode_id,
-                'opening_crawl': film.opening_crawl,
-                'director': film.director,
-                'producer': film.producer,
-                'release_date': film.release_date.isoformat(),
-                'planets': [
-                    {
-                        'id': str(planet.id),
-                        'name': planet.name,
-                        'climate': planet.climate,
-                        'terrain': planet.terrain,
-                        'population': planet.population,
-                        'diameter': planet.diameter,
-                        'gravity': planet.gravity,
-                        'surface_water': planet.surface_water,
-                        'rotation_period': planet.rotation_period,
-                        'orbital_period': planet.orbital_period,
-                    } for planet in film.planets.all()
-                ],
-                'character_count': film.characters.count(),
-                'created': film.created.isoformat(),
-                'swapi_url': film.swapi_url,
-            })
-        
-        character_data = {
-            'character': {
-                'id': str(character.id),
-                'name': character.name,
-                'gender': character.gender,
-                'birth_year': character.birth_year,
-                'homeworld': character.homeworld.name if character.homeworld else None,
-            },
-            'films': films,
-            'total_films': len(films)
-        }
+        character_data = serialize_character_films(character_id)
         
         return JsonResponse(character_data)
         
@@ -406,6 +516,7 @@ def character_films_view(request, character_id):
             'error': 'Character not found'
         }, status=404)
     except Exception as e:
+        count_error('character_films', e)
         return JsonResponse({
             'error': 'Failed to fetch character films',
             'message': str(e)
@@ -480,37 +591,14 @@ def character_films_view(request, character_id):
 )
 @api_view(['GET'])
 @csrf_exempt 
+@cache_response(Person, Planet)
 def character_detail_view(request, character_id):
     """
     Detalle completo de un personaje
     GET /api/characters/{id}/
     """
     try:
-        character = Person.objects.select_related('homeworld').prefetch_related(
-            'films', 'species'
-        ).get(id=character_id)
-        
-        character_data = {
-            'id': str(character.id),
-            'name': character.name,
-            'gender': character.gender,
-            'birth_year': character.birth_year,
-            'height': character.height,
-            'mass': character.mass,
-            'hair_color': character.hair_color,
-            'skin_color': character.skin_color,
-            'eye_color': character.eye_color,
-            'homeworld': {
-                'id': str(character.homeworld.id),
-                'name': character.homeworld.name,
-                'climate': character.homeworld.climate,
-                'terrain': character.homeworld.terrain,
-                'population': character.homeworld.population,
-            } if character.homeworld else None,
-            'films_count': character.films.count(),
-            'films_url': f'/api/characters/{character.id}/films/',
-            'created': character.created.isoformat(),
-        }
+        character_data = serialize_character_detail(character_id)
         
         return JsonResponse(character_data)
         
@@ -519,6 +607,7 @@ def character_detail_view(request, character_id):
             'error': 'Character not found'
         }, status=404)
     except Exception as e:
+        count_error('character_detail', e)
         return JsonResponse({
             'error': 'Failed to fetch character details',
             'message': str(e)
@@ -569,23 +658,11 @@ def character_detail_view(request, character_id):
 )
 @api_view(['GET'])
 @csrf_exempt
+@cache_response(Film, Person)
 def films_list_view(request):
     """Lista todas las películas"""
     try:
-        films = Film.objects.prefetch_related('planets', 'characters').order_by('episode_id')
-        
-        films_data = []
-        for film in films:
-            films_data.append({
-                'id': str(film.id),
-                'title': film.title,
-                'episode_id': film.episode_id,
-                'director': film.director,
-                'producer': film.producer,
-                'release_date': film.release_date.isoformat(),
-                'character_count': film.characters.count(),
-                'planet_count': film.planets.count(),
-            })
+        films_data = serialize_films(Film.objects.order_by('episode_id'))
         
         return JsonResponse({
             'results': films_data,
@@ -593,6 +670,7 @@ def films_list_view(request):
         })
         
     except Exception as e:
+        count_error('films_list', e)
         return JsonResponse({
             'error': 'Failed to fetch films',
             'message': str(e)
@@ -610,7 +688,12 @@ def films_list_view(request):
     - Clima y terreno
     - Población
     - Conteo de residentes y películas donde aparece
+
+    **Filtros y ordenación** (en SQL, sobre columnas numéricas indexadas):
+    - `/api/starwars/planets/?population_min=1000000&order=-diameter` - Planetas poblados, del mayor al menor
+    - `/api/starwars/planets/?surface_water_max=0` - Planetas sin agua en superficie
     """,
+    manual_parameters=[*measurement_params(Planet), order_param(Planet)],
     responses={
         200: openapi.Response(
             description="Lista de planetas obtenida exitosamente",
@@ -636,39 +719,343 @@ def films_list_view(request):
                 }
             )
         ),
+        400: error_response,
         500: error_response
     },
     tags=['Planets']
 )
 @api_view(['GET'])
 @csrf_exempt
+@cache_response(Planet, Person, Film)
 def planets_list_view(request):
-    """Lista todos los planetas"""
+    """Lista todos los planetas, con filtros por rango y ordenación opcionales"""
     try:
-        planets = Planet.objects.prefetch_related('residents', 'films')
-        
-        planets_data = []
-        for planet in planets:
-            planets_data.append({
-                'id': str(planet.id),
-                'name': planet.name,
-                'climate': planet.climate,
-                'terrain': planet.terrain,
-                'population': planet.population,
-                'resident_count': planet.residents.count(),
-                'film_count': planet.films.count(),
-            })
-        
+        queryset = Planet.objects.filter(range_filter(Planet, request.GET))
+        planets_data = serialize_planets(measurement_ordering(Planet, queryset, request.GET.get('order')))
         
         return JsonResponse({
             'results': planets_data,
             'count': len(planets_data)
         })
         
+    except ValueError as e:
+        return JsonResponse({
+            'error': 'Invalid filter',
+            'message': str(e)
+        }, status=400)
     except Exception as e:
+        count_error('planets_list', e)
         return JsonResponse({
             'error': 'Failed to fetch planets',
             'message': str(e)
         }, status=500)
         
-        
\ No newline at end of file
+        
+
+
+search_query_param = openapi.Parameter(
+    'q',
+    openapi.IN_QUERY,
+    description="Texto a buscar; tolera errores tipográficos en PostgreSQL",
+    type=openapi.TYPE_STRING,
+    required=True,
+    example="skywaker"
+)
+
+search_types_param = openapi.Parameter(
+    'types',
+    openapi.IN_QUERY,
+    description="Tipos separados por comas (person, planet, film, species); por defecto todos",
+    type=openapi.TYPE_STRING,
+    required=False,
+    example="person,planet"
+)
+
+search_limit_param = openapi.Parameter(
+    'limit',
+    openapi.IN_QUERY,
+    description=f"Número máximo de resultados (máximo {MAX_LIMIT})",
+    type=openapi.TYPE_INTEGER,
+    required=False,
+    default=DEFAULT_LIMIT,
+    minimum=1,
+    maximum=MAX_LIMIT
+)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Búsqueda unificada por nombre",
+    operation_description="""
+    Busca personajes, planetas, películas (por título) y especies por nombre.
+
+    **Características:**
+    - Coincidencias por subcadena, insensibles a mayúsculas
+    - En PostgreSQL, tolerancia a errores tipográficos y ranking por similitud (índices `pg_trgm`)
+    - Resultados de todos los tipos ordenados por `score` (mayor es mejor)
+
+    **Ejemplos:**
+    - `/api/starwars/search/?q=skywaker` - Encuentra "Luke Skywalker" pese al error
+    - `/api/starwars/search/?q=tat&types=planet` - Solo planetas
+    """,
+    manual_parameters=[search_query_param, search_types_param, search_limit_param],
+    responses={
+        200: openapi.Response(
+            description="Resultados de la búsqueda",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'results': openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'type': openapi.Schema(type=openapi.TYPE_STRING, example="person"),
+                                'id': openapi.Schema(type=openapi.TYPE_STRING, format='uuid'),
+                                'name': openapi.Schema(type=openapi.TYPE_STRING, example="Luke Skywalker"),
+                                'score': openapi.Schema(type=openapi.TYPE_NUMBER, example=0.82),
+                            }
+                        )
+                    ),
+                }
+            )
+        ),
+        400: error_response,
+        500: error_response
+    },
+    tags=['Search']
+)
+@api_view(['GET'])
+@csrf_exempt
+@cache_response(Person, Film, Planet, Species)
+def search_view(request):
+    """
+    Búsqueda por nombre en personajes, planetas, películas y especies
+    GET /api/starwars/search/?q=skywaker&types=person,planet&limit=10
+    """
+    try:
+        text = request.GET.get('q', '').strip()
+        if not text:
+            raise ValueError("Parameter 'q' is required")
+        kinds = [kind for kind in request.GET.get('types', '').split(',') if kind]
+        hits = search(text, kinds, int(request.GET.get('limit', DEFAULT_LIMIT)))
+        return JsonResponse({
+            'results': [
+                {
+                    'type': kind,
+                    'id': str(obj.pk),
+                    'name': getattr(obj, SEARCH_MODELS[kind][1]),
+                    'score': round(score, 4),
+                }
+                for kind, score, obj in hits
+            ],
+        })
+    except ValueError as e:
+        return JsonResponse({
+            'error': 'Invalid search',
+            'message': str(e)
+        }, status=400)
+    except Exception as e:
+        count_error('search', e)
+        return JsonResponse({
+            'error': 'Failed to search',
+            'message': str(e)
+        }, status=500)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Búsqueda de texto completo",
+    operation_description="""
+    Busca palabras en películas (título, director, productor y texto de apertura),
+    planetas (nombre, clima y terreno) y especies (nombre, clasificación e idioma).
+
+    **Características:**
+    - Sintaxis de buscador web: `"frase exacta"`, `-excluir`, `or`
+    - En PostgreSQL, columnas `tsvector` mantenidas por trigger con índice GIN: no se leen los textos completos
+    - Resultados ordenados por relevancia (`rank`), con `headline` resaltado con `<mark>`
+    - Paginado (20 elementos por página por defecto)
+
+    **Ejemplos:**
+    - `/api/starwars/search/text/?q=death star` - Películas que mencionan la Estrella de la Muerte
+    - `/api/starwars/search/text/?q=desert&types=planet` - Planetas desérticos
+    """,
+    manual_parameters=[search_query_param, search_types_param, page_param, page_size_param],
+    responses={
+        200: openapi.Response(
+            description="Resultados de la búsqueda",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'results': openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'type': openapi.Schema(type=openapi.TYPE_STRING, example="film"),
+                                'id': openapi.Schema(type=openapi.TYPE_STRING, format='uuid'),
+                                'name': openapi.Schema(type=openapi.TYPE_STRING, example="A New Hope"),
+                                'rank': openapi.Schema(type=openapi.TYPE_NUMBER, example=0.61),
+                                'headline': openapi.Schema(
+                                    type=openapi.TYPE_STRING,
+                                    example="...the <mark>DEATH</mark> <mark>STAR</mark>, an armored space station..."
+                                ),
+                            }
+                        )
+                    ),
+                    'count': openapi.Schema(type=openapi.TYPE_INTEGER, description="Total de resultados"),
+                    'page': openapi.Schema(type=openapi.TYPE_INTEGER, description="Página actual"),
+                    'total_pages': openapi.Schema(type=openapi.TYPE_INTEGER, description="Total de páginas"),
+                    'has_next': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Hay página siguiente"),
+                    'has_previous': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Hay página anterior"),
+                }
+            )
+        ),
+        400: error_response,
+        500: error_response
+    },
+    tags=['Search']
+)
+@api_view(['GET'])
+@csrf_exempt
+@cache_response(Film, Planet, Species)
+def text_search_view(request):
+    """
+    Búsqueda de texto completo en películas, planetas y especies
+    GET /api/starwars/search/text/?q=death star&types=film&page=1&page_size=10
+    """
+    try:
+        text = request.GET.get('q', '').strip()
+        if not text:
+            raise ValueError("Parameter 'q' is required")
+        kinds = [kind for kind in request.GET.get('types', '').split(',') if kind]
+        page, page_size = page_params(request.GET, max_size=MAX_LIMIT)
+        result = text_search(text, kinds, page, page_size)
+        return JsonResponse({
+            'results': [
+                {
+                    'type': hit.kind,
+                    'id': str(hit.obj.pk),
+                    'name': getattr(hit.obj, SEARCH_MODELS[hit.kind][1]),
+                    'rank': round(hit.rank, 4),
+                    'headline': hit.headline,
+                }
+                for hit in result.hits
+            ],
+            'count': result.count,
+            'page': result.page,
+            'total_pages': result.total_pages,
+            'has_next': result.page < result.total_pages,
+            'has_previous': result.page > 1,
+        })
+    except InvalidPage as e:
+        return JsonResponse({
+            'error': 'Invalid pagination',
+            'message': str(e)
+        }, status=400)
+    except ValueError as e:
+        return JsonResponse({
+            'error': 'Invalid search',
+            'message': str(e)
+        }, status=400)
+    except Exception as e:
+        count_error('text_search', e)
+        return JsonResponse({
+            'error': 'Failed to search',
+            'message': str(e)
+        }, status=500)
+
+
+autocomplete_query_param = openapi.Parameter(
+    'q',
+    openapi.IN_QUERY,
+    description="Prefijo del nombre o de cualquiera de sus palabras",
+    type=openapi.TYPE_STRING,
+    required=True,
+    example="sky"
+)
+
+autocomplete_limit_param = openapi.Parameter(
+    'limit',
+    openapi.IN_QUERY,
+    description=f"Número máximo de sugerencias (máximo {AUTOCOMPLETE_MAX_LIMIT})",
+    type=openapi.TYPE_INTEGER,
+    required=False,
+    default=AUTOCOMPLETE_DEFAULT_LIMIT,
+    minimum=1,
+    maximum=AUTOCOMPLETE_MAX_LIMIT
+)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Autocompletado de nombres",
+    operation_description="""
+    Sugiere personajes, planetas, películas (por título) y especies cuyo nombre,
+    o alguna de sus palabras, empieza por el prefijo dado.
+
+    **Características:**
+    - Índice ordenado en memoria de cada proceso: no consulta la base de datos
+    - Se reconstruye al cambiar los datos (señales y versión en caché)
+    - Primero los nombres que empiezan por el prefijo, luego las coincidencias por palabra
+
+    **Ejemplos:**
+    - `/api/starwars/autocomplete/?q=sky` - "Luke Skywalker", "Anakin Skywalker"...
+    - `/api/starwars/autocomplete/?q=ta&types=planet&limit=5` - Solo planetas
+    """,
+    manual_parameters=[autocomplete_query_param, search_types_param, autocomplete_limit_param],
+    responses={
+        200: openapi.Response(
+            description="Sugerencias",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'results': openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'type': openapi.Schema(type=openapi.TYPE_STRING, example="person"),
+                                'id': openapi.Schema(type=openapi.TYPE_STRING, format='uuid'),
+                                'name': openapi.Schema(type=openapi.TYPE_STRING, example="Luke Skywalker"),
+                            }
+                        )
+                    ),
+                }
+            )
+        ),
+        400: error_response,
+        500: error_response
+    },
+    tags=['Search']
+)
+@api_view(['GET'])
+@csrf_exempt
+def autocomplete_view(request):
+    """
+    Sugerencias por prefijo desde el índice en memoria
+    GET /api/starwars/autocomplete/?q=sky&types=person&limit=10
+    """
+    try:
+        text = request.GET.get('q', '').strip()
+        if not text:
+            raise ValueError("Parameter 'q' is required")
+        kinds = [kind for kind in request.GET.get('types', '').split(',') if kind]
+        hits = autocomplete.complete(text, kinds, int(request.GET.get('limit', AUTOCOMPLETE_DEFAULT_LIMIT)))
+        return JsonResponse({
+            'results': [
+                {'type': kind, 'id': str(pk), 'name': name}
+                for kind, name, pk in hits
+            ],
+        })
+    except ValueError as e:
+        return JsonResponse({
+            'error': 'Invalid autocomplete',
+            'message': str(e)
+        }, status=400)
+    except Exception as e:
+        count_error('autocomplete', e)
+        return JsonResponse({
+            'error': 'Failed to autocomplete',
+            'message': str(e)
+        }, status=500)